@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""Benchmark the appcast sync against a local GitHub API stand-in.
+
+Starts an `http.server` that impersonates `GET /repos/{repo}/releases`
+(paginated, with `ETag`/`304`), the installer assets and their `.sha256`
+sidecars, then times each stage of `sync_appcast_from_releases.py`
+separately for N synthetic releases:
+
+- fetch         listing, cold (no validators)
+- fetch_304     listing again with the validators of the cold run
+- select        installer selection + sidecar downloads, cold asset cache
+- select_cached same, with the asset cache filled by the cold run
+- render        `render_appcast`
+- write         `write_appcast` into a temp dir
+
+Latency and error injection (first attempt of a request answers 503)
+are configurable. Each invocation is appended to a JSON history
+(`--output`) and compared with the previous run of the same config, so
+caching/concurrency work can be measured across commits.
+
+Usage:
+    python scripts/bench_appcast_sync.py
+    python scripts/bench_appcast_sync.py --releases 10,100,1000 --latency-ms 20 --error-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPTS_DIR.parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import sync_appcast_from_releases as sync  # noqa: E402
+
+BENCH_REPO = "bench/backup_database"
+DEFAULT_OUTPUT = "build/bench/appcast_sync.json"
+PHASES = ("fetch", "fetch_304", "select", "select_cached", "render", "write")
+
+
+class FakeReleasesServer:
+    """GitHub stand-in serving `count` synthetic releases."""
+
+    def __init__(
+        self,
+        count: int,
+        *,
+        latency_seconds: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        body_chars: int = 2000,
+    ) -> None:
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._attempted: set[str] = set()
+        self.request_count = 0
+        self.error_count = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self.sidecars: dict[str, bytes] = {}
+        self.releases = self._build_releases(count, body_chars)
+
+    def _build_releases(self, count: int, body_chars: int) -> list[dict]:
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        releases: list[dict] = []
+        for index in range(count):
+            version = f"{index // 100}.{(index // 10) % 10}.{index % 10}"
+            name = f"BackupDatabase-Setup-{version}.exe"
+            digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+            self.sidecars[f"/dl/{name}.sha256"] = f"{digest}  {name}\n".encode("utf-8")
+            published_at = (start + timedelta(days=index)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            releases.append(
+                {
+                    "tag_name": f"v{version}",
+                    "html_url": f"https://github.com/{BENCH_REPO}/releases/tag/v{version}",
+                    "published_at": published_at,
+                    "draft": False,
+                    "prerelease": False,
+                    "body": f"## {version}\n" + ("- change\n" * (body_chars // 9)),
+                    "assets": [
+                        {
+                            "id": 2 * index + 1,
+                            "name": name,
+                            "size": 40_000_000 + index,
+                            "updated_at": published_at,
+                            "browser_download_url": f"{self.base_url}/dl/{name}",
+                        },
+                        {
+                            "id": 2 * index + 2,
+                            "name": f"{name}.sha256",
+                            "size": 100,
+                            "updated_at": published_at,
+                            "browser_download_url": f"{self.base_url}/dl/{name}.sha256",
+                        },
+                    ],
+                }
+            )
+        releases.reverse()
+        return releases
+
+    def _should_fail(self, path: str) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            if path in self._attempted:
+                return False
+            self._attempted.add(path)
+            if self._rng.random() < self.error_rate:
+                self.error_count += 1
+                return True
+        return False
+
+    def _page(self, query: str) -> tuple[bytes, str | None]:
+        params = parse_qs(query)
+        per_page = int(params.get("per_page", ["30"])[0])
+        page = int(params.get("page", ["1"])[0])
+        start = (page - 1) * per_page
+        body = json.dumps(self.releases[start : start + per_page]).encode("utf-8")
+        link = None
+        if start + per_page < len(self.releases):
+            link = (
+                f"<{self.base_url}/repos/{BENCH_REPO}/releases?"
+                f'per_page={per_page}&page={page + 1}>; rel="next"'
+            )
+        return body, link
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Cabecalho e corpo saem em writes separados; com Nagle + ACK
+            # atrasado do cliente cada resposta keep-alive custaria ~40ms.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *_args) -> None:
+                pass
+
+            def _reply(self, status: int, body: bytes, headers: dict[str, str]) -> None:
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:  # noqa: N802
+                with server._lock:
+                    server.request_count += 1
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+                parsed = urlsplit(self.path)
+                if server._should_fail(self.path):
+                    self._reply(503, b"injected", {})
+                    return
+
+                if parsed.path == f"/repos/{BENCH_REPO}/releases":
+                    body, link = server._page(parsed.query)
+                    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self._reply(304, b"", {"ETag": etag})
+                        return
+                    headers = {"ETag": etag, "Content-Type": "application/json"}
+                    if link:
+                        headers["Link"] = link
+                    self._reply(200, body, headers)
+                    return
+
+                payload = server.sidecars.get(parsed.path)
+                if payload is None:
+                    self._reply(404, b"not found", {})
+                    return
+                self._reply(200, payload, {})
+
+        return Handler
+
+    def __enter__(self) -> "FakeReleasesServer":
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _timed(results: dict[str, float], phase: str, func, *args, **kwargs):
+    started = time.perf_counter()
+    value = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    results[phase] = min(results.get(phase, elapsed), elapsed)
+    return value
+
+
+def bench_once(
+    count: int,
+    args: argparse.Namespace,
+    results: dict[str, float],
+    output_dir: Path,
+) -> dict[str, int]:
+    options = sync.SidecarFetchOptions(
+        workers=args.sidecar_workers,
+        retries=args.retries,
+        backoff_seconds=0.0,
+    )
+    policy = sync._empty_policy()
+    with FakeReleasesServer(
+        count,
+        latency_seconds=args.latency_ms / 1000.0,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ) as server:
+        os.environ["GITHUB_API_URL"] = server.base_url
+        with sync.build_http_client(options) as client:
+            http_cache = sync.HttpCache()
+            fetched = _timed(
+                results, "fetch", sync.fetch_releases, BENCH_REPO, http_cache, client,
+            )
+            _timed(results, "fetch_304", sync.fetch_releases, BENCH_REPO, http_cache, client)
+
+            asset_cache = sync.AssetCache()
+            releases = _timed(
+                results,
+                "select",
+                sync.select_published_releases,
+                fetched.releases,
+                policy,
+                options,
+                asset_cache,
+                client,
+            )
+            _timed(
+                results,
+                "select_cached",
+                sync.select_published_releases,
+                fetched.releases,
+                policy,
+                options,
+                asset_cache,
+                client,
+            )
+
+        tree = _timed(results, "render", sync.render_appcast, BENCH_REPO, releases, policy)
+        _timed(results, "write", sync.write_appcast, output_dir / "appcast.xml", tree)
+        return {"requests": server.request_count, "injected_errors": server.error_count}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _load_history(path: Path) -> list[dict]:
+    if not path.is_file():
+        return []
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    runs = payload.get("runs") if isinstance(payload, dict) else None
+    return runs if isinstance(runs, list) else []
+
+
+def _print_table(run: dict, previous: dict | None) -> None:
+    previous_by_count = {
+        entry["releases"]: entry for entry in (previous or {}).get("results", [])
+    }
+    header = f"{'releases':>8} " + " ".join(f"{phase:>13}" for phase in PHASES) + f" {'requests':>9}"
+    print(header)
+    for entry in run["results"]:
+        cells = []
+        before = previous_by_count.get(entry["releases"], {}).get("seconds", {})
+        for phase in PHASES:
+            seconds = entry["seconds"][phase]
+            cell = f"{seconds * 1000:.1f}ms"
+            if phase in before and before[phase] > 0:
+                cell += f"({seconds / before[phase]:.2f}x)"
+            cells.append(f"{cell:>13}")
+        print(f"{entry['releases']:>8} " + " ".join(cells) + f" {entry['requests']:>9}")
+    if previous:
+        print(f"(ratios vs {previous.get('commit') or '?'} at {previous.get('timestamp')})")
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--releases",
+        default="10,100,1000",
+        help="Comma-separated synthetic release counts (default: 10,100,1000)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency per request")
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Probability that the first attempt of a request answers 503",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for error injection")
+    parser.add_argument(
+        "--sidecar-workers", type=int, default=sync.DEFAULT_SIDECAR_WORKERS,
+    )
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=1, help="Keep the best of N runs")
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT,
+        help=f"JSON history to append to (default: {DEFAULT_OUTPUT}); '' disables",
+    )
+    parser.add_argument("--label", default="", help="Free-form label stored with the run")
+    args = parser.parse_args(argv)
+    try:
+        args.release_counts = [int(item) for item in args.releases.split(",") if item.strip()]
+    except ValueError:
+        parser.error("--releases must be a comma-separated list of integers")
+    if not args.release_counts or min(args.release_counts) < 1:
+        parser.error("--releases needs positive counts")
+    if not 0.0 <= args.error_rate < 1.0:
+        parser.error("--error-rate must be in [0, 1)")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    # Nunca mandar token real para o stand-in local.
+    os.environ.pop("GITHUB_TOKEN", None)
+    os.environ.pop("GH_TOKEN", None)
+
+    config = {
+        "latency_ms": args.latency_ms,
+        "error_rate": args.error_rate,
+        "seed": args.seed,
+        "sidecar_workers": args.sidecar_workers,
+        "retries": args.retries,
+    }
+    run = {
+        "commit": _git_commit(),
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": config,
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.release_counts:
+            seconds: dict[str, float] = {}
+            counters: dict[str, int] = {}
+            for _ in range(max(1, args.repeat)):
+                try:
+                    counters = bench_once(count, args, seconds, Path(tmp))
+                except Exception as error:
+                    print(f"ERROR: {count} releases: {error}", file=sys.stderr)
+                    return 1
+            run["results"].append({"releases": count, "seconds": seconds, **counters})
+
+    history_path = Path(args.output) if args.output else None
+    history = _load_history(history_path) if history_path else []
+    previous = next(
+        (entry for entry in reversed(history) if entry.get("config") == config),
+        None,
+    )
+    _print_table(run, previous)
+
+    if history_path is not None:
+        history.append(run)
+        sync.write_files_atomically(
+            [
+                (
+                    history_path,
+                    json.dumps({"runs": history}, indent=2).encode("utf-8"),
+                )
+            ]
+        )
+        print(f"Results appended to {history_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
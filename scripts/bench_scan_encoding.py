@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the mojibake matcher of `scan_encoding.py`.
+
+Times `scan_encoding.scan_bytes` (one combined regex pass plus a bisect
+line index) against `legacy_scan_bytes`, the previous implementation
+kept here verbatim as the reference: one `re.finditer` per pattern, a
+`text[:start].count("\\n")` per hit and a regex per line for C1 controls.
+Both must return the same issues; the tool exits 1 otherwise.
+
+Synthetic corpora (built in memory, nothing touches the tree):
+
+- clean   Dart-like source without issues (the common case)
+- sparse  one mis-encoded PT word every ~200 lines
+- dense   mis-encoded text on every line (the quadratic case)
+
+Usage:
+    python scripts/bench_scan_encoding.py
+    python scripts/bench_scan_encoding.py --size-kb 4096 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from scan_encoding import MOJIBAKE_PATTERNS, scan_bytes  # noqa: E402
+
+CORPORA = ("clean", "sparse", "dense")
+_WORDS = ("configuração", "versão", "não", "operação", "atualização", "função")
+
+
+def legacy_scan_bytes(raw: bytes) -> list[tuple[str, str]]:
+    """`scan_file` body before the single-pass matcher (reference)."""
+    issues: list[tuple[str, str]] = []
+    if raw.startswith(b"\xef\xbb\xbf"):
+        issues.append(("utf8_bom", "UTF-8 BOM at start of file"))
+
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        issues.append(("invalid_utf8", str(exc)))
+        return issues
+
+    lines = text.splitlines()
+    if "\ufffd" in text:
+        for i, line in enumerate(lines, 1):
+            if "\ufffd" in line:
+                issues.append(("unicode_replacement", f"line {i}: {line[:120]}"))
+
+    for pattern, desc in MOJIBAKE_PATTERNS:
+        for match in re.finditer(pattern, text):
+            line_no = text[: match.start()].count("\n") + 1
+            snippet = lines[line_no - 1].strip()[:100] if line_no <= len(lines) else ""
+            issues.append(("mojibake", f"{desc} line {line_no}: {snippet}"))
+
+    if b"\r\n" in raw:
+        lone_lf = raw.replace(b"\r\n", b"").count(b"\n")
+        if lone_lf > 0:
+            issues.append(("mixed_eol", f"CRLF + {lone_lf} lone LF byte(s)"))
+
+    for i, line in enumerate(lines, 1):
+        if re.search(r"[\x80-\x9f]", line):
+            issues.append(("c1_control", f"line {i}: {line[:80]}"))
+
+    return issues
+
+
+def mojibake(text: str) -> str:
+    """UTF-8 bytes of `text` read back as CP1252."""
+    return text.encode("utf-8").decode("cp1252", errors="replace")
+
+
+def build_corpus(kind: str, size_bytes: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    lines: list[str] = []
+    size = 0
+    index = 0
+    while size < size_bytes:
+        word = rng.choice(_WORDS)
+        if kind == "dense" or (kind == "sparse" and index % 200 == 0):
+            word = mojibake(word)
+        line = f"  final value{index} = service.load('{word}', retries: {index % 7});"
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+        index += 1
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _throughput(func, raw: bytes, repeat: int) -> tuple[float, list[tuple[str, str]]]:
+    best = float("inf")
+    result: list[tuple[str, str]] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(raw)
+        best = min(best, time.perf_counter() - started)
+    return len(raw) / (1024 * 1024) / max(best, 1e-9), result
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--size-kb", type=int, default=1024, help="Corpus size (default: 1024)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, best kept (default: 3)")
+    parser.add_argument(
+        "--corpora",
+        default=",".join(CORPORA),
+        help=f"Comma-separated subset of {', '.join(CORPORA)}",
+    )
+    args = parser.parse_args(argv)
+    if args.size_kb < 1:
+        parser.error("--size-kb must be >= 1")
+    if args.repeat < 1:
+        parser.error("--repeat must be >= 1")
+    unknown = {kind.strip() for kind in args.corpora.split(",")} - set(CORPORA)
+    if unknown:
+        parser.error(f"unknown corpora: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    corpora = [kind.strip() for kind in args.corpora.split(",") if kind.strip()]
+    print(f"{'corpus':<8} {'issues':>7} {'legacy MB/s':>12} {'single-pass MB/s':>17} {'speedup':>8}")
+    mismatches = 0
+    for kind in corpora:
+        raw = build_corpus(kind, args.size_kb * 1024)
+        legacy_rate, legacy_issues = _throughput(legacy_scan_bytes, raw, args.repeat)
+        new_rate, new_issues = _throughput(scan_bytes, raw, args.repeat)
+        if new_issues != legacy_issues:
+            mismatches += 1
+            print(f"ERROR: {kind}: single-pass output differs from legacy", file=sys.stderr)
+        print(
+            f"{kind:<8} {len(new_issues):>7} {legacy_rate:>12.1f} {new_rate:>17.1f} "
+            f"{new_rate / legacy_rate:>7.1f}x"
+        )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
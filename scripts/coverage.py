@@ -4,10 +4,32 @@
 from __future__ import annotations
 
 import argparse
+import heapq
+import json
+import os
+import re
+import shutil
+import sqlite3
+import statistics
 import subprocess
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterable, Iterator, Sequence, TextIO
 
 
+SHARD_DIR = Path("coverage/shards")
+DURATIONS_PATH = Path("build/cache/test_durations.json")
+DURATIONS_SCHEMA_VERSION = 1
+IMPACT_INDEX_PATH = Path("build/cache/test_impact.json")
+IMPACT_SCHEMA_VERSION = 1
+HISTORY_PATH = Path("build/cache/coverage_history.sqlite3")
+REPORT_PATH = Path("coverage/report.json")
+# Com muitos shards (--per-file) so os que falharam sao listados.
+MAX_SHARD_LINES = 32
+
 IGNORE_PATTERNS = (
     "/test/",
     ".g.dart",
@@ -27,52 +49,913 @@ def is_ignored(path: str) -> bool:
     return any(pattern in normalized for pattern in IGNORE_PATTERNS)
 
 
-def filter_lcov(input_path: Path, output_path: Path) -> None:
-    lines = input_path.read_text(encoding="utf-8").splitlines()
-    result: list[str] = []
-    current_file: str | None = None
-    current_block: list[str] = []
+@dataclass
+class FileCoverage:
+    """`DA:` totals of one `SF:` record."""
+
+    path: str
+    lines_found: int = 0
+    lines_hit: int = 0
+
+    @property
+    def percent(self) -> float:
+        return _percent(self.lines_hit, self.lines_found)
+
+
+@dataclass
+class LcovSummary:
+    files: list[FileCoverage] = field(default_factory=list)
+
+    @property
+    def lines_found(self) -> int:
+        return sum(item.lines_found for item in self.files)
+
+    @property
+    def lines_hit(self) -> int:
+        return sum(item.lines_hit for item in self.files)
+
+    @property
+    def percent(self) -> float:
+        return _percent(self.lines_hit, self.lines_found)
+
+
+def _percent(hit: int, total: int) -> float:
+    if total == 0:
+        return 0.0
+    return round(hit * 100.0 / total, 2)
 
-    for line in lines:
-        if line.startswith("SF:"):
-            if current_block and current_file and not is_ignored(current_file):
-                result.extend(current_block)
-            current_file = line[3:]
-            current_block = [line]
-            continue
 
-        if current_block:
-            current_block.append(line)
+def _da_hits(line: str) -> int | None:
+    """Hit count of a `DA:<line>,<hits>[,<checksum>]` record, None if malformed."""
+    parts = line[3:].split(",")
+    if len(parts) < 2:
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return 0
+
+
+def _scan_lcov(input_path: Path, output: TextIO | None, *, filtered: bool) -> LcovSummary:
+    """Single streaming pass over an lcov file.
+
+    Records whose `SF:` matches `IGNORE_PATTERNS` are dropped when
+    `filtered`; kept records are written to `output` line by line and
+    their `DA:` lines counted on the way, so memory stays constant in the
+    size of the report. Lines outside a `SF:`..`end_of_record` block are
+    dropped.
+    """
+    summary = LcovSummary()
+    current: FileCoverage | None = None
+    with input_path.open(encoding="utf-8") as handle:
+        for raw_line in handle:
+            line = raw_line.rstrip("\r\n")
+            if line.startswith("SF:"):
+                source = line[3:]
+                current = None
+                if filtered and is_ignored(source):
+                    continue
+                current = FileCoverage(source)
+                summary.files.append(current)
+            elif current is None:
+                continue
+            elif line.startswith("DA:"):
+                hits = _da_hits(line)
+                if hits is not None:
+                    current.lines_found += 1
+                    if hits > 0:
+                        current.lines_hit += 1
+            if output is not None:
+                output.write(line + "\n")
             if line == "end_of_record":
-                if current_file and not is_ignored(current_file):
-                    result.extend(current_block)
-                current_block = []
-                current_file = None
+                current = None
+    return summary
+
+
+def filter_lcov(input_path: Path, output_path: Path) -> LcovSummary:
+    """Write `input_path` without ignored records and return its coverage."""
+    with output_path.open("w", encoding="utf-8", newline="\n") as output:
+        return _scan_lcov(input_path, output, filtered=True)
 
-    if current_block and current_file and not is_ignored(current_file):
-        result.extend(current_block)
 
-    output_path.write_text("\n".join(result) + ("\n" if result else ""), encoding="utf-8")
+def lcov_summary(lcov_path: Path) -> LcovSummary:
+    return _scan_lcov(lcov_path, None, filtered=False)
 
 
 def lcov_coverage(lcov_path: Path) -> float:
-    total = 0
-    hit = 0
-    for line in lcov_path.read_text(encoding="utf-8").splitlines():
-        if not line.startswith("DA:"):
+    return lcov_summary(lcov_path).percent
+
+
+def _merge_brda(current: str | None, taken: str) -> str:
+    """Sum BRDA `taken` fields; `-` (never evaluated) only when all are `-`."""
+    if current is None or current == "-":
+        return taken
+    if taken == "-":
+        return current
+    return str(int(current) + int(taken))
+
+
+@dataclass
+class _MergedFile:
+    lines: dict[int, int] = field(default_factory=dict)
+    branches: dict[tuple[int, str, str], str] = field(default_factory=dict)
+    functions: dict[str, int] = field(default_factory=dict)
+    function_hits: dict[str, int] = field(default_factory=dict)
+
+
+def merge_lcov(inputs: Sequence[Path], output_path: Path) -> None:
+    """Merge lcov files by summing `DA`/`BRDA`/`FNDA` hits per source line.
+
+    Source files keep the order in which they are first seen; lines,
+    branches and functions are sorted, and `LF`/`LH`/`BRF`/`BRH`/`FNF`/`FNH`
+    are recomputed from the merged data.
+    """
+    merged: dict[str, _MergedFile] = {}
+    for input_path in inputs:
+        current: _MergedFile | None = None
+        with input_path.open(encoding="utf-8") as handle:
+            for raw_line in handle:
+                line = raw_line.rstrip("\r\n")
+                if line.startswith("SF:"):
+                    current = merged.setdefault(line[3:], _MergedFile())
+                elif current is None:
+                    continue
+                elif line == "end_of_record":
+                    current = None
+                elif line.startswith("DA:"):
+                    parts = line[3:].split(",")
+                    if len(parts) >= 2:
+                        number = int(parts[0])
+                        current.lines[number] = current.lines.get(number, 0) + int(parts[1])
+                elif line.startswith("BRDA:"):
+                    number, block, branch, taken = line[5:].split(",", 3)
+                    key = (int(number), block, branch)
+                    current.branches[key] = _merge_brda(current.branches.get(key), taken)
+                elif line.startswith("FN:"):
+                    number, name = line[3:].split(",", 1)
+                    current.functions.setdefault(name, int(number))
+                elif line.startswith("FNDA:"):
+                    hits, name = line[5:].split(",", 1)
+                    current.function_hits[name] = current.function_hits.get(name, 0) + int(hits)
+
+    with output_path.open("w", encoding="utf-8", newline="\n") as output:
+        for source, data in merged.items():
+            output.write(f"SF:{source}\n")
+            for name, number in sorted(data.functions.items(), key=lambda item: (item[1], item[0])):
+                output.write(f"FN:{number},{name}\n")
+            for name, hits in sorted(data.function_hits.items()):
+                output.write(f"FNDA:{hits},{name}\n")
+            if data.functions or data.function_hits:
+                output.write(f"FNF:{len(data.functions)}\n")
+                output.write(f"FNH:{sum(1 for hits in data.function_hits.values() if hits > 0)}\n")
+            for (number, block, branch), taken in sorted(
+                data.branches.items(), key=lambda item: (item[0][0], item[0][1], item[0][2]),
+            ):
+                output.write(f"BRDA:{number},{block},{branch},{taken}\n")
+            if data.branches:
+                output.write(f"BRF:{len(data.branches)}\n")
+                output.write(
+                    f"BRH:{sum(1 for taken in data.branches.values() if taken not in ('-', '0'))}\n"
+                )
+            for number, hits in sorted(data.lines.items()):
+                output.write(f"DA:{number},{hits}\n")
+            output.write(f"LF:{len(data.lines)}\n")
+            output.write(f"LH:{sum(1 for hits in data.lines.values() if hits > 0)}\n")
+            output.write("end_of_record\n")
+
+
+def discover_test_files(targets: Sequence[str]) -> list[str]:
+    """`*_test.dart` files under `targets` (default `test/`), like `flutter test`."""
+    found: set[str] = set()
+    for target in targets or ["test"]:
+        path = Path(target)
+        if path.is_dir():
+            found.update(child.as_posix() for child in path.rglob("*_test.dart"))
+        else:
+            found.add(path.as_posix())
+    return sorted(found)
+
+
+def load_durations(path: Path) -> dict[str, float]:
+    """Seconds per test file from previous runs ({} when missing or stale)."""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(payload, dict) or payload.get("schema_version") != DURATIONS_SCHEMA_VERSION:
+        return {}
+    durations = payload.get("durations")
+    return dict(durations) if isinstance(durations, dict) else {}
+
+
+def save_durations(path: Path, durations: dict[str, float]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {"schema_version": DURATIONS_SCHEMA_VERSION, "durations": durations},
+            indent=2,
+            sort_keys=True,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, path)
+
+
+def reporter_durations(report_path: Path, root: Path | None = None) -> dict[str, float]:
+    """Seconds per test file from a `flutter test` JSON reporter file.
+
+    Sums `testStart` -> `testDone` of every test of a suite, including the
+    synthetic "loading" test that covers compilation.
+    """
+    root = (root or Path.cwd()).resolve()
+    suites: dict[int, str] = {}
+    starts: dict[int, tuple[int, int]] = {}
+    totals: dict[str, float] = {}
+    try:
+        handle = report_path.open(encoding="utf-8")
+    except OSError:
+        return {}
+    with handle:
+        for raw_line in handle:
+            try:
+                event = json.loads(raw_line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict):
+                continue
+            kind = event.get("type")
+            if kind == "suite":
+                suite = event.get("suite") or {}
+                path = suite.get("path")
+                if path:
+                    try:
+                        path = Path(path).resolve().relative_to(root).as_posix()
+                    except ValueError:
+                        path = Path(path).as_posix()
+                    suites[suite["id"]] = path
+            elif kind == "testStart":
+                test = event.get("test") or {}
+                starts[test.get("id")] = (test.get("suiteID"), event.get("time", 0))
+            elif kind == "testDone" and event.get("testID") in starts:
+                suite_id, started = starts.pop(event["testID"])
+                path = suites.get(suite_id)
+                if path is not None:
+                    elapsed = max(0, event.get("time", started) - started) / 1000
+                    totals[path] = totals.get(path, 0.0) + elapsed
+    return totals
+
+
+def partition_by_duration(
+    files: Sequence[str],
+    durations: dict[str, float],
+    shards: int,
+) -> list[list[str]]:
+    """Longest-processing-time-first split of `files` into `shards` buckets.
+
+    Files without history weigh the mean known duration; with no history
+    at all the file size is the proxy.
+    """
+    known = [durations[name] for name in files if name in durations]
+    fallback = sum(known) / len(known) if known else None
+
+    def weight(name: str) -> float:
+        if name in durations:
+            return durations[name]
+        if fallback is not None:
+            return fallback
+        try:
+            return float(Path(name).stat().st_size)
+        except OSError:
+            return 1.0
+
+    heap = [(0.0, index) for index in range(max(1, min(shards, len(files))))]
+    buckets: list[list[str]] = [[] for _ in heap]
+    for name in sorted(files, key=lambda item: (-weight(item), item)):
+        load, index = heapq.heappop(heap)
+        buckets[index].append(name)
+        heapq.heappush(heap, (load + weight(name), index))
+    return [sorted(bucket) for bucket in buckets]
+
+
+@dataclass
+class ShardResult:
+    files: list[str]
+    exit_code: int
+    seconds: float
+    lcov_path: Path
+    report_path: Path
+    log_path: Path
+
+
+def _run_shard(index: int, files: list[str], shard_dir: Path) -> ShardResult:
+    directory = shard_dir / f"shard_{index}"
+    directory.mkdir(parents=True)
+    result = ShardResult(
+        files=files,
+        exit_code=0,
+        seconds=0.0,
+        lcov_path=directory / "lcov.info",
+        report_path=directory / "report.json",
+        log_path=directory / "output.log",
+    )
+    cmd = [
+        "flutter",
+        "test",
+        "--no-pub",
+        "--coverage",
+        f"--coverage-path={result.lcov_path.as_posix()}",
+        f"--file-reporter=json:{result.report_path.as_posix()}",
+        *files,
+    ]
+    started = time.monotonic()
+    with result.log_path.open("w", encoding="utf-8") as log:
+        try:
+            result.exit_code = subprocess.run(
+                cmd, stdout=log, stderr=subprocess.STDOUT, check=False,
+            ).returncode
+        except FileNotFoundError as exc:
+            log.write(f"{exc}\n")
+            result.exit_code = 127
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def run_shards(
+    buckets: Sequence[Sequence[str]],
+    shard_dir: Path,
+    *,
+    jobs: int | None = None,
+) -> list[ShardResult]:
+    """Run one `flutter test --coverage` per bucket, `jobs` at a time.
+
+    Each shard writes `lcov.info`, `report.json` (JSON reporter) and
+    `output.log` under `shard_dir/shard_<i>`. Results keep bucket order.
+    """
+    if shard_dir.exists():
+        shutil.rmtree(shard_dir)
+    with ThreadPoolExecutor(max_workers=jobs or len(buckets) or 1) as executor:
+        results = list(
+            executor.map(
+                lambda item: _run_shard(item[0], list(item[1]), shard_dir),
+                enumerate(buckets),
+            )
+        )
+    for index, result in enumerate(results):
+        if len(results) <= MAX_SHARD_LINES or result.exit_code != 0:
+            print(
+                f"    shard {index}: exit {result.exit_code} in {result.seconds:.1f}s "
+                f"({result.log_path})"
+            )
+        if result.exit_code != 0:
+            tail = result.log_path.read_text(encoding="utf-8", errors="replace").splitlines()[-20:]
+            print("\n".join(f"      {line}" for line in tail))
+    return results
+
+
+def run_sharded_tests(
+    targets: Sequence[str],
+    shards: int,
+    lcov_path: Path,
+    *,
+    per_file: bool = False,
+) -> tuple[int, dict[str, float]]:
+    """Shard the suite by historical duration and merge the lcov outputs.
+
+    With `per_file` every test file runs in its own process (`shards` at
+    a time) and the per-file lcov refreshes the test-impact index.
+    Returns the exit code and the seconds per test file of this run.
+    """
+    files = discover_test_files(targets)
+    if not files:
+        print("ERROR: no *_test.dart files found")
+        return 1, {}
+    durations = load_durations(DURATIONS_PATH)
+    if per_file:
+        buckets = [[name] for name in sorted(files, key=lambda name: -durations.get(name, 0.0))]
+        print(f"    {len(buckets)} file(s), {shards} at a time")
+    else:
+        buckets = partition_by_duration(files, durations, shards)
+        for index, bucket in enumerate(buckets):
+            estimate = sum(durations.get(name, 0.0) for name in bucket)
+            print(f"    shard {index}: {len(bucket)} file(s), ~{estimate:.1f}s by history")
+
+    exit_code = run(["flutter", "pub", "get"])
+    if exit_code != 0:
+        return exit_code, {}
+    results = run_shards(buckets, SHARD_DIR, jobs=shards)
+
+    measured: dict[str, float] = {}
+    for result in results:
+        measured.update(reporter_durations(result.report_path))
+    durations.update(measured)
+    save_durations(DURATIONS_PATH, durations)
+    if per_file:
+        update_impact_index(IMPACT_INDEX_PATH, results)
+
+    present = [result.lcov_path for result in results if result.lcov_path.exists()]
+    if present:
+        lcov_path.parent.mkdir(parents=True, exist_ok=True)
+        merge_lcov(present, lcov_path)
+    exit_code = next((result.exit_code for result in results if result.exit_code != 0), 0)
+    if exit_code == 0 and len(present) != len(results):
+        print("ERROR: some shards produced no lcov.info")
+        return 1, measured
+    return exit_code, measured
+
+
+def run_tests(targets: Sequence[str], lcov_path: Path) -> tuple[int, dict[str, float]]:
+    """Single `flutter test --coverage` run that also records per-file durations."""
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    exit_code = run(
+        [
+            "flutter", "test", "--coverage", f"--coverage-path={lcov_path}",
+            f"--file-reporter=json:{REPORT_PATH}", *targets,
+        ]
+    )
+    measured = reporter_durations(REPORT_PATH)
+    if measured:
+        durations = load_durations(DURATIONS_PATH)
+        durations.update(measured)
+        save_durations(DURATIONS_PATH, durations)
+    return exit_code, measured
+
+
+def _git_lines(*args: str) -> list[str]:
+    try:
+        completed = subprocess.run(
+            ["git", *args], capture_output=True, text=True, encoding="utf-8", check=False,
+        )
+    except FileNotFoundError as exc:
+        raise RuntimeError(f"git not available: {exc}") from None
+    if completed.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {completed.stderr.strip()}")
+    return [line for line in completed.stdout.splitlines() if line]
+
+
+def _relative_source(source: str, root: Path) -> str:
+    path = Path(source)
+    if not path.is_absolute():
+        return path.as_posix()
+    try:
+        return path.resolve().relative_to(root).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def load_impact_index(path: Path) -> dict | None:
+    """`{"commit", "tests": {test file: [sources]}}`, None when missing/stale schema."""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(payload, dict)
+        or payload.get("schema_version") != IMPACT_SCHEMA_VERSION
+        or not isinstance(payload.get("tests"), dict)
+    ):
+        return None
+    return payload
+
+
+def update_impact_index(path: Path, results: Sequence[ShardResult]) -> None:
+    """Record, for every single-file shard that passed, the sources it hit."""
+    index = load_impact_index(path) or {"tests": {}}
+    root = Path.cwd().resolve()
+    for result in results:
+        if len(result.files) != 1 or result.exit_code != 0 or not result.lcov_path.exists():
             continue
-        parts = line[3:].split(",", 1)
-        if len(parts) != 2:
+        index["tests"][result.files[0]] = sorted(
+            _relative_source(item.path, root)
+            for item in lcov_summary(result.lcov_path).files
+            if item.lines_hit > 0
+        )
+    try:
+        (commit,) = _git_lines("rev-parse", "HEAD")
+    except (RuntimeError, ValueError):
+        commit = None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {"schema_version": IMPACT_SCHEMA_VERSION, "commit": commit, "tests": index["tests"]},
+            indent=2,
+            sort_keys=True,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, path)
+
+
+def _is_full_suite_trigger(path: str) -> bool:
+    """Changes no source mapping can scope: helpers, assets, dependencies."""
+    return (
+        path in ("pubspec.yaml", "pubspec.lock")
+        or path.startswith(("lib/", "test/", "assets/"))
+    )
+
+
+def affected_tests(changed: Sequence[str], index: dict | None) -> tuple[list[str] | None, str]:
+    """Minimal test targets for `changed`, or None (full suite) and why.
+
+    Changed `*_test.dart` files run themselves, `lib/**.dart` files run
+    every test that hit them; anything else under `lib/`, `test/`,
+    `assets/` or the pubspec, and any `lib/` file the index has never seen,
+    falls back to the full suite. Other paths (docs, scripts, CI) are
+    ignored.
+    """
+    if index is None:
+        return None, "no test-impact index (run --per-file once)"
+    by_source: dict[str, set[str]] = {}
+    for test, sources in index["tests"].items():
+        for source in sources:
+            by_source.setdefault(source, set()).add(test)
+
+    selected: set[str] = set()
+    for path in changed:
+        if path.endswith("_test.dart") and path.startswith("test/"):
+            selected.add(path)
+        elif path.startswith("lib/") and path.endswith(".dart"):
+            tests = by_source.get(path)
+            if not tests:
+                return None, f"{path} has no coverage mapping"
+            selected.update(tests)
+        elif _is_full_suite_trigger(path):
+            return None, f"{path} is not mapped to tests"
+    return sorted(test for test in selected if Path(test).is_file()), ""
+
+
+def resolve_affected_targets(ref: str) -> list[str] | None:
+    """Test targets affected since the merge-base with `ref`; None = full suite."""
+    index = load_impact_index(IMPACT_INDEX_PATH)
+    commit = index.get("commit") if index else None
+    if index is not None and commit:
+        completed = subprocess.run(
+            ["git", "merge-base", "--is-ancestor", commit, "HEAD"],
+            capture_output=True,
+            check=False,
+        )
+        if completed.returncode != 0:
+            print(f"    test-impact index built at {commit[:12]} is not in HEAD's history")
+            index = None
+    (base,) = _git_lines("merge-base", ref, "HEAD")
+    changed = sorted(
+        {*_git_lines("diff", "--name-only", base), *_git_lines("ls-files", "--others", "--exclude-standard")}
+    )
+    targets, reason = affected_tests(changed, index)
+    if targets is None:
+        print(f"    full suite: {reason}")
+    else:
+        print(f"    {len(changed)} changed file(s) -> {len(targets)} test file(s)")
+    return targets
+
+
+_HUNK_PATTERN = re.compile(r"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class LineRanges:
+    """Sorted, merged `[start, end]` line intervals with bisect lookups."""
+
+    def __init__(self, ranges: Iterable[tuple[int, int]]) -> None:
+        merged: list[list[int]] = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _end in merged]
+        self.ends = [end for _start, end in merged]
+
+    def __contains__(self, line: int) -> bool:
+        index = bisect_right(self.starts, line) - 1
+        return index >= 0 and line <= self.ends[index]
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in zip(self.starts, self.ends):
+            yield from range(start, end + 1)
+
+
+def parse_diff_ranges(diff: Iterable[str]) -> dict[str, LineRanges]:
+    """Added/changed new-side lines per file from `git diff -U0` output.
+
+    Hunk bodies are skipped by their old/new line counts, so an added
+    line that reads `++ ...` is not taken for a `+++` file header.
+    """
+    ranges: dict[str, list[tuple[int, int]]] = {}
+    current: list[tuple[int, int]] | None = None
+    old_left = new_left = 0
+    for line in diff:
+        if (old_left > 0 or new_left > 0) and line[:1] in ("-", "+", " ", "\\"):
+            if line.startswith("-"):
+                old_left -= 1
+            elif line.startswith("+"):
+                new_left -= 1
+            elif line.startswith(" "):
+                old_left -= 1
+                new_left -= 1
+            continue
+        old_left = new_left = 0
+        if line.startswith("+++ "):
+            target = line[4:].rstrip("\r\n")
+            current = ranges.setdefault(target[2:], []) if target.startswith("b/") else None
+            continue
+        match = _HUNK_PATTERN.match(line)
+        if match:
+            old_left = 1 if match.group(1) is None else int(match.group(1))
+            start = int(match.group(2))
+            count = 1 if match.group(3) is None else int(match.group(3))
+            new_left = count
+            if count and current is not None:
+                current.append((start, start + count - 1))
+    return {path: LineRanges(items) for path, items in ranges.items() if items}
+
+
+def changed_lib_lines(ref: str) -> dict[str, LineRanges]:
+    """Changed lines of `lib/**.dart` since the merge-base with `ref` (working tree)."""
+    (base,) = _git_lines("merge-base", ref, "HEAD")
+    diff = _git_lines(
+        "diff", "-U0", "--no-color", "--no-ext-diff",
+        "--src-prefix=a/", "--dst-prefix=b/", base, "--", "lib",
+    )
+    return {
+        path: lines
+        for path, lines in parse_diff_ranges(diff).items()
+        if path.endswith(".dart") and not is_ignored(path)
+    }
+
+
+@dataclass
+class DiffFileCoverage:
+    path: str
+    covered: list[int] = field(default_factory=list)
+    uncovered: list[int] = field(default_factory=list)
+    # False quando nenhum teste carregou o arquivo (nao esta no lcov).
+    in_report: bool = True
+
+    @property
+    def percent(self) -> float:
+        return _percent(len(self.covered), len(self.covered) + len(self.uncovered))
+
+
+def diff_coverage(
+    lcov_path: Path,
+    changed: dict[str, LineRanges],
+    root: Path | None = None,
+) -> list[DiffFileCoverage]:
+    """Intersect changed lines with the `DA:` records of `lcov_path`.
+
+    Changed lines without a `DA:` record are not executable and do not
+    count. Changed files missing from the report were never loaded by a
+    test: their non-blank, non-comment changed lines count as uncovered.
+    """
+    root = (root or Path.cwd()).resolve()
+    results: dict[str, DiffFileCoverage] = {}
+    current: tuple[DiffFileCoverage, LineRanges] | None = None
+    with lcov_path.open(encoding="utf-8") as handle:
+        for raw_line in handle:
+            line = raw_line.rstrip("\r\n")
+            if line.startswith("SF:"):
+                path = _relative_source(line[3:], root)
+                ranges = changed.get(path)
+                current = None
+                if ranges is not None:
+                    current = (results.setdefault(path, DiffFileCoverage(path)), ranges)
+            elif current is not None and line.startswith("DA:"):
+                hits = _da_hits(line)
+                number = int(line[3:].split(",", 1)[0])
+                item, ranges = current
+                if hits is not None and number in ranges:
+                    (item.covered if hits > 0 else item.uncovered).append(number)
+            elif line == "end_of_record":
+                current = None
+
+    for path, ranges in changed.items():
+        if path in results:
             continue
-        total += 1
         try:
-            if int(parts[1]) > 0:
-                hit += 1
-        except ValueError:
-            pass
+            source = (root / path).read_text(encoding="utf-8").splitlines()
+        except OSError:
+            continue
+        results[path] = DiffFileCoverage(
+            path,
+            uncovered=[
+                number
+                for number in ranges
+                if number <= len(source)
+                and source[number - 1].strip()
+                and not source[number - 1].lstrip().startswith("//")
+            ],
+            in_report=False,
+        )
+    for item in results.values():
+        item.covered.sort()
+        item.uncovered.sort()
+    return sorted(results.values(), key=lambda item: item.path)
+
+
+def _format_lines(numbers: Sequence[int]) -> str:
+    spans: list[str] = []
+    for number in numbers:
+        if spans and number == last + 1:
+            spans[-1] = f"{spans[-1].split('-')[0]}-{number}"
+        else:
+            spans.append(str(number))
+        last = number
+    return ", ".join(spans)
+
+
+def report_diff_coverage(items: Sequence[DiffFileCoverage]) -> float | None:
+    """Print the per-file table; returns the total percent (None = nothing to gate)."""
+    covered = sum(len(item.covered) for item in items)
+    total = covered + sum(len(item.uncovered) for item in items)
+    for item in items:
+        lines = len(item.covered) + len(item.uncovered)
+        if not lines:
+            continue
+        note = "" if item.in_report else " (not loaded by any test)"
+        print(f"    {item.path}: {len(item.covered)}/{lines} ({item.percent}%){note}")
+        if item.uncovered:
+            print(f"      uncovered: {_format_lines(item.uncovered)}")
     if total == 0:
-        return 0.0
-    return round(hit * 100.0 / total, 2)
+        print("Diff coverage: no executable changed lines")
+        return None
+    percent = _percent(covered, total)
+    print(f"Diff coverage: {covered}/{total} changed line(s) ({percent}%)")
+    return percent
+
+
+_HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    commit_sha TEXT,
+    created_at TEXT NOT NULL,
+    full_suite INTEGER NOT NULL,
+    lines_found INTEGER NOT NULL,
+    lines_hit INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_coverage (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    lines_found INTEGER NOT NULL,
+    lines_hit INTEGER NOT NULL,
+    PRIMARY KEY (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS test_durations (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (run_id, path)
+);
+CREATE INDEX IF NOT EXISTS file_coverage_path ON file_coverage(path, run_id);
+CREATE INDEX IF NOT EXISTS test_durations_path ON test_durations(path, run_id);
+"""
+
+
+def open_history(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(_HISTORY_SCHEMA)
+    return connection
+
+
+def record_run(
+    path: Path,
+    summary: LcovSummary,
+    durations: dict[str, float],
+    *,
+    full_suite: bool,
+    commit: str | None = None,
+    root: Path | None = None,
+) -> int:
+    """Append one run (per-file coverage + per-test-file seconds); returns its id.
+
+    Only full-suite runs are used as the coverage baseline: a subset run
+    (`--test-targets`, `--affected-since`) under-reports every other file.
+    """
+    root = (root or Path.cwd()).resolve()
+    if commit is None:
+        try:
+            commit = _git_lines("rev-parse", "HEAD")[0]
+        except (RuntimeError, IndexError):
+            commit = None
+    files: dict[str, FileCoverage] = {}
+    for item in summary.files:
+        rel = _relative_source(item.path, root)
+        merged = files.setdefault(rel, FileCoverage(rel))
+        merged.lines_found += item.lines_found
+        merged.lines_hit += item.lines_hit
+    connection = open_history(path)
+    try:
+        with connection:
+            run_id = connection.execute(
+                "INSERT INTO runs (commit_sha, created_at, full_suite, lines_found, lines_hit) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    commit,
+                    time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    int(full_suite),
+                    summary.lines_found,
+                    summary.lines_hit,
+                ),
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO file_coverage (run_id, path, lines_found, lines_hit) VALUES (?, ?, ?, ?)",
+                [(run_id, item.path, item.lines_found, item.lines_hit) for item in files.values()],
+            )
+            connection.executemany(
+                "INSERT INTO test_durations (run_id, path, seconds) VALUES (?, ?, ?)",
+                [(run_id, name, seconds) for name, seconds in sorted(durations.items())],
+            )
+    finally:
+        connection.close()
+    return run_id
+
+
+@dataclass
+class Regression:
+    kind: str  # "coverage" ou "duration"
+    path: str
+    baseline: float
+    current: float
+
+
+def _baseline(rows: Sequence[tuple[int, float]], latest: int, window: int) -> float | None:
+    """Median of the `window` values recorded before run `latest`."""
+    previous = [value for run_id, value in rows if run_id < latest][-window:]
+    return statistics.median(previous) if previous else None
+
+
+def find_regressions(
+    path: Path,
+    *,
+    window: int = 5,
+    coverage_drop: float = 1.0,
+    slowdown: float = 1.5,
+    min_seconds: float = 1.0,
+) -> list[Regression]:
+    """Compare the latest run against the median of the previous `window` runs.
+
+    A file regresses when its coverage fell more than `coverage_drop`
+    points (full-suite runs only). A test file regresses when it took
+    more than `slowdown` times its baseline and at least `min_seconds`
+    longer, which keeps sub-second noise out.
+    """
+    if not path.exists():
+        return []
+    connection = sqlite3.connect(path)
+    try:
+        regressions: list[Regression] = []
+        latest_full = connection.execute(
+            "SELECT MAX(id) FROM runs WHERE full_suite = 1",
+        ).fetchone()[0]
+        if latest_full is not None:
+            history: dict[str, list[tuple[int, float]]] = {}
+            for run_id, name, found, hit in connection.execute(
+                "SELECT f.run_id, f.path, f.lines_found, f.lines_hit FROM file_coverage f "
+                "JOIN runs r ON r.id = f.run_id WHERE r.full_suite = 1 ORDER BY f.run_id",
+            ):
+                history.setdefault(name, []).append((run_id, _percent(hit, found)))
+            for name, rows in sorted(history.items()):
+                if rows[-1][0] != latest_full:
+                    continue
+                baseline = _baseline(rows, latest_full, window)
+                current = rows[-1][1]
+                if baseline is not None and baseline - current > coverage_drop:
+                    regressions.append(Regression("coverage", name, baseline, current))
+
+        latest = connection.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+        durations: dict[str, list[tuple[int, float]]] = {}
+        for run_id, name, seconds in connection.execute(
+            "SELECT run_id, path, seconds FROM test_durations ORDER BY run_id",
+        ):
+            durations.setdefault(name, []).append((run_id, seconds))
+        for name, rows in sorted(durations.items()):
+            if rows[-1][0] != latest:
+                continue
+            baseline = _baseline(rows, latest, window)
+            current = rows[-1][1]
+            if (
+                baseline is not None
+                and current > baseline * slowdown
+                and current - baseline >= min_seconds
+            ):
+                regressions.append(Regression("duration", name, baseline, current))
+        return regressions
+    finally:
+        connection.close()
+
+
+def report_regressions(regressions: Sequence[Regression]) -> None:
+    if not regressions:
+        print("No coverage or duration regressions against the baseline.")
+        return
+    for item in regressions:
+        if item.kind == "coverage":
+            print(f"    coverage  {item.path}: {item.baseline:.2f}% -> {item.current:.2f}%")
+        else:
+            print(f"    duration  {item.path}: {item.baseline:.1f}s -> {item.current:.1f}s")
+    print(f"{len(regressions)} regression(s) against the baseline.")
 
 
 def run(cmd: list[str]) -> int:
@@ -83,7 +966,51 @@ def run(cmd: list[str]) -> int:
         return 127
 
 
-def main() -> int:
+def report_coverage(
+    lcov_path: Path,
+    args: argparse.Namespace,
+    *,
+    durations: dict[str, float] | None = None,
+    full_suite: bool = True,
+) -> int:
+    """Filter `lcov_path`, record the run, print line (and diff) coverage and apply the gates."""
+    filtered_lcov_path = lcov_path.with_name("lcov.filtered.info")
+    if not lcov_path.exists():
+        print(f"ERROR: coverage file not found: {lcov_path}")
+        return 1
+
+    step("Filtering generated/test files from lcov")
+    summary = filter_lcov(lcov_path, filtered_lcov_path)
+    coverage = summary.percent
+    print(f"Line coverage (filtered): {coverage}%")
+    print(f"Filtered report: {filtered_lcov_path}")
+    if not args.no_history:
+        run_id = record_run(HISTORY_PATH, summary, durations or {}, full_suite=full_suite)
+        print(f"History: run {run_id} recorded in {HISTORY_PATH}")
+
+    if args.fail_under > 0 and coverage < args.fail_under:
+        print(f"ERROR: coverage {coverage}% is below threshold {args.fail_under}%.")
+        return 1
+
+    if args.diff_base:
+        step(f"Diff coverage against {args.diff_base}")
+        try:
+            changed = changed_lib_lines(args.diff_base)
+        except RuntimeError as exc:
+            print(f"ERROR: {exc}")
+            return 1
+        diff_percent = report_diff_coverage(diff_coverage(filtered_lcov_path, changed))
+        if diff_percent is not None and args.fail_under_diff > 0 and diff_percent < args.fail_under_diff:
+            print(
+                f"ERROR: diff coverage {diff_percent}% is below threshold {args.fail_under_diff}%."
+            )
+            return 1
+
+    step("Coverage completed")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--dart-mode", action="store_true", help="Use dart coverage:test_with_coverage")
     parser.add_argument(
@@ -91,13 +1018,114 @@ def main() -> int:
         action="store_true",
         help="Skip test run; filter existing coverage/lcov.info (e.g. after CI flutter test --coverage)",
     )
+    parser.add_argument(
+        "--full-suite",
+        action="store_true",
+        help=(
+            "With --filter-only: record the lcov as a full-suite run (a coverage "
+            "baseline for --regressions); otherwise it is recorded as partial"
+        ),
+    )
     parser.add_argument("--fail-under", type=int, default=0, help="Fail if coverage is below this value")
     parser.add_argument(
         "--test-targets",
         default="",
         help="Comma-separated list of test files for flutter test --coverage",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help=(
+            "Run N flutter test processes in parallel, split by historical "
+            f"duration ({DURATIONS_PATH}), and merge their lcov"
+        ),
+    )
+    parser.add_argument(
+        "--per-file",
+        action="store_true",
+        help=(
+            "Run every test file in its own process (--shards at a time) and "
+            f"refresh the test-impact index ({IMPACT_INDEX_PATH})"
+        ),
+    )
+    parser.add_argument(
+        "--affected-since",
+        metavar="REF",
+        help=(
+            "Only run the tests that hit files changed since the merge-base with "
+            "REF, using the test-impact index; falls back to the full suite"
+        ),
+    )
+    parser.add_argument(
+        "--diff-base",
+        metavar="REF",
+        help="Report coverage of the lib/ lines changed since the merge-base with REF",
+    )
+    parser.add_argument(
+        "--fail-under-diff",
+        type=float,
+        default=0,
+        help="Fail if diff coverage (needs --diff-base) is below this value",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help=f"Do not append this run to the history database ({HISTORY_PATH})",
+    )
+    parser.add_argument(
+        "--regressions",
+        action="store_true",
+        help=(
+            "Only query the history: flag files whose coverage dropped and test "
+            "files that got slower than the rolling baseline (exit 1 if any)"
+        ),
+    )
+    parser.add_argument(
+        "--baseline-runs",
+        type=int,
+        default=5,
+        help="Runs in the rolling baseline, compared by median (default: 5)",
+    )
+    parser.add_argument(
+        "--coverage-drop",
+        type=float,
+        default=1.0,
+        help="Percentage points a file may lose before it is flagged (default: 1.0)",
+    )
+    parser.add_argument(
+        "--slowdown",
+        type=float,
+        default=1.5,
+        help="Duration ratio over the baseline that flags a test file (default: 1.5)",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=1.0,
+        help="Minimum absolute slowdown in seconds to flag a test file (default: 1.0)",
+    )
+    args = parser.parse_args(argv)
+    if args.baseline_runs < 1:
+        parser.error("--baseline-runs must be >= 1")
+    if args.fail_under_diff and not args.diff_base:
+        parser.error("--fail-under-diff requires --diff-base")
+    if args.shards < 1:
+        parser.error("--shards must be >= 1")
+    if args.affected_since and args.test_targets:
+        parser.error("--affected-since and --test-targets are mutually exclusive")
+
+    if args.regressions:
+        step(f"Comparing the latest run with the previous {args.baseline_runs}")
+        regressions = find_regressions(
+            HISTORY_PATH,
+            window=args.baseline_runs,
+            coverage_drop=args.coverage_drop,
+            slowdown=args.slowdown,
+            min_seconds=args.min_seconds,
+        )
+        report_regressions(regressions)
+        return 1 if regressions else 0
 
     if args.dart_mode:
         step("Running Dart coverage with package:coverage")
@@ -107,49 +1135,34 @@ def main() -> int:
         return run(cmd)
 
     if args.filter_only:
-        lcov_path = Path("coverage/lcov.info")
-        filtered_lcov_path = Path("coverage/lcov.filtered.info")
-        if not lcov_path.exists():
-            print(f"ERROR: coverage file not found: {lcov_path}")
-            return 1
-        step("Filtering generated/test files from lcov")
-        filter_lcov(lcov_path, filtered_lcov_path)
-        coverage = lcov_coverage(filtered_lcov_path)
-        print(f"Line coverage (filtered): {coverage}%")
-        print(f"Filtered report: {filtered_lcov_path}")
-        if args.fail_under > 0 and coverage < args.fail_under:
-            print(f"ERROR: coverage {coverage}% is below threshold {args.fail_under}%.")
-            return 1
-        step("Coverage completed")
-        return 0
+        return report_coverage(Path("coverage/lcov.info"), args, full_suite=args.full_suite)
 
-    step("Running Flutter tests with coverage")
-    cmd = ["flutter", "test", "--coverage"]
     targets = [target.strip() for target in args.test_targets.split(",") if target.strip()]
-    cmd.extend(targets)
-    exit_code = run(cmd)
+    if args.affected_since:
+        step(f"Selecting tests affected since {args.affected_since}")
+        try:
+            affected = resolve_affected_targets(args.affected_since)
+        except RuntimeError as exc:
+            print(f"ERROR: {exc}")
+            return 1
+        if affected == []:
+            print("No affected tests.")
+            step("Coverage completed")
+            return 0
+        targets = affected or []
+    lcov_path = Path("coverage/lcov.info")
+    if args.per_file:
+        step(f"Running Flutter tests with coverage per file, {args.shards} at a time")
+        exit_code, durations = run_sharded_tests(targets, args.shards, lcov_path, per_file=True)
+    elif args.shards > 1:
+        step(f"Running Flutter tests with coverage in {args.shards} shards")
+        exit_code, durations = run_sharded_tests(targets, args.shards, lcov_path)
+    else:
+        step("Running Flutter tests with coverage")
+        exit_code, durations = run_tests(targets, lcov_path)
     if exit_code != 0:
         return exit_code
-
-    lcov_path = Path("coverage/lcov.info")
-    filtered_lcov_path = Path("coverage/lcov.filtered.info")
-    if not lcov_path.exists():
-        print(f"ERROR: coverage file not found: {lcov_path}")
-        return 1
-
-    step("Filtering generated/test files from lcov")
-    filter_lcov(lcov_path, filtered_lcov_path)
-
-    coverage = lcov_coverage(filtered_lcov_path)
-    print(f"Line coverage (filtered): {coverage}%")
-    print(f"Filtered report: {filtered_lcov_path}")
-
-    if args.fail_under > 0 and coverage < args.fail_under:
-        print(f"ERROR: coverage {coverage}% is below threshold {args.fail_under}%.")
-        return 1
-
-    step("Coverage completed")
-    return 0
+    return report_coverage(lcov_path, args, durations=durations, full_suite=not targets)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,1527 @@
+#!/usr/bin/env python3
+"""Streaming FTP metrics engine, a Python port of `FtpMetricsParser`.
+
+Reproduces `lib/scripts/ftp_metrics_parser.dart` and the summary/export
+of `scripts/parse_ftp_metrics.dart` byte for byte, without the Dart VM:
+
+- the same five message regexes (success with optional `hash <n>ms`,
+  resume offset, fallback, error, integrity), including JavaScript-style
+  `\\s`/`\\d`/`.` classes and Dart `String.trim` whitespace
+- timestamps parsed like `DateTime.tryParse` (overflowing fields roll
+  over, an offset turns the value into UTC) and printed like
+  `toIso8601String`
+- error messages cut at 200 UTF-16 code units, like `substring(0, 200)`
+
+Files (plain or `.gz`) are read lazily in 1 MiB blocks through a
+generator pipeline; only running aggregates stay in memory. Every event
+needs one of a few ASCII keywords, so each block is lowercased and
+searched with `bytes.find`, and only the lines around a hit are decoded
+and parsed.
+
+Each file becomes a mergeable `FtpMetricsPartial` (counters plus its
+export rows spooled to a temporary file); with `--jobs N` the files are
+parsed on a process pool and the partials reduced in input order, so the
+output is the same as a sequential run. Memory stays constant for GBs of
+logs.
+
+`--checkpoint` keeps, per log, its identity, the byte offset after the
+last complete line and the running totals, so the next run only reads
+appended bytes; rotation (rename, copytruncate, gzip) and truncation are
+detected from the file's first bytes. `--follow` tails the logs and
+prints rolling metrics at an interval.
+
+`--since`/`--until` keep Dart's per-line filter but, since lines start
+with an append-ordered `[timestamp]`, binary-search each plain log for
+the byte range of the window and read only that; a log last written
+before `--since` (mtime) or starting after `--until` (first line) is
+skipped. `.gz` cannot seek, so it is read forward up to the first line
+past `--until`, with the same bounds as a plain log.
+
+`--percentiles` and `--buckets csv|json|sqlite` add p50/p90/p99 of hash
+time, upload duration and MB/s (from the orchestrator's `Upload FTP
+concluido com sucesso: <path> (<size> em <n>s)` line), overall and per
+hour and remote directory. Each series is a log-bucketed histogram
+(`QuantileSketch`, 1% relative error) instead of a list of values, so it
+merges exactly across files and workers.
+
+Usage:
+    python scripts/ftp_metrics.py logs/app.log logs/app.log.1.gz
+    python scripts/ftp_metrics.py --export json logs/*.log
+    type logs\\app.log | python scripts/ftp_metrics.py
+    python scripts/ftp_metrics.py --checkpoint logs/*.log
+    python scripts/ftp_metrics.py --follow --interval 30 logs/app.log
+    python scripts/ftp_metrics.py --since 2026-03-01 --until 2026-03-01T23:59:59.999 logs/*.log
+    python scripts/ftp_metrics.py --percentiles --buckets sqlite logs/*.log
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import posixpath
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import IO, BinaryIO, Callable, Iterable, Iterator, Sequence, TextIO
+
+# `\s` de RegExp (JavaScript) e os espacos removidos por String.trim (Dart).
+_JS_SPACE = "\t\n\x0b\x0c\r \xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+_DART_TRIM = "\t\n\x0b\x0c\r \x85\xa0\u1680" + "".join(
+    map(chr, range(0x2000, 0x200B))
+) + "\u2028\u2029\u202f\u205f\u3000\ufeff"
+_S = f"[{_JS_SPACE}]"
+_ANY = "[^\n\r\u2028\u2029]"  # `.` do JavaScript
+
+# re.ASCII: como no JavaScript sem a flag `u`, so letras ASCII variam de
+# caixa (nada de `\u017f` casando com "s"); acentos vao como classes.
+_FLAGS = re.ASCII | re.IGNORECASE
+_SUCCESS = re.compile(
+    rf"Upload FTP conclu[\u00ed\u00cd]do:{_S}*({_ANY}+?)"
+    rf"(?:{_S}+\(SHA-256:{_S}*[^,{_JS_SPACE}]+,{_S}*hash{_S}+([0-9]+)ms\))?{_S}*\Z",
+    _FLAGS,
+)
+_RESUME = re.compile(
+    rf"Retomando upload de {_ANY}+?{_S}+a partir do byte{_S}+([0-9]+)", _FLAGS,
+)
+_FALLBACK = re.compile("fallback para upload completo|REST STREAM n[\u00e3\u00c3]o suportado", _FLAGS)
+_ERROR = re.compile("Upload FTP falhou|Erro no upload FTP", _FLAGS)
+_INTEGRITY = re.compile("Erro de integridade|SIZE retornou -1", _FLAGS)
+# Linha do orquestrador (ByteFormat.format + Duration.inSeconds); o parser
+# Dart nao a conta como evento.
+_UPLOAD_DONE = re.compile(
+    rf"Upload FTP conclu[\u00ed\u00cd]do com sucesso:{_S}*({_ANY}+?){_S}+"
+    rf"\(([0-9]+(?:\.[0-9]+)?) (B|KB|MB|GB) em ([0-9]+)s\)",
+    _FLAGS,
+)
+_BYTE_UNITS = {"b": 1, "kb": 1 << 10, "mb": 1 << 20, "gb": 1 << 30}
+_TIMESTAMP = re.compile(r"\[([0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9:.+-]+)\]")
+# O mesmo prefixo em bytes, no inicio de qualquer linha de um bloco.
+_LINE_TIMESTAMP = re.compile(rb"(?<=[\r\n])\[([0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9:.+-]+)\]")
+_TERMINATOR = re.compile(rb"\r\n?|\n")
+_LEVEL = re.compile(rf"\[{_S}*([A-Za-z0-9_]+){_S}*\]")
+# Todo evento exige um destes trechos ASCII (em minusculas): as demais
+# linhas sao descartadas com bytes.find, sem decodificar nem aplicar regex.
+CANDIDATE_KEYWORDS = (
+    b"upload ftp",
+    b"retomando upload de ",
+    b"fallback para upload completo",
+    b"rest stream n",
+    b"erro de integridade",
+    b"size retornou -1",
+)
+READ_BLOCK = 1 << 20
+SEEK_PROBE = 1 << 13
+HEAD_BYTES = 1024
+CHECKPOINT_SCHEMA_VERSION = 1
+DEFAULT_CHECKPOINT = Path("build/cache/ftp_metrics_checkpoint.json")
+# Gramatica de DateTime.parse (sdk/lib/core/date_time.dart).
+_DART_DATE = re.compile(
+    r"([+-]?[0-9]{4,6})-?([0-9]{2})-?([0-9]{2})"
+    r"(?:[ T]([0-9]{2})(?::?([0-9]{2})(?::?([0-9]{2})(?:[.,]([0-9]+))?)?)?"
+    r"( ?[zZ]| ?([-+])([0-9]{2})(?::?([0-9]{2}))?)?)?"
+)
+
+ERROR_MESSAGE_LIMIT = 200
+DART_INT_MAX = 2**63 - 1
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EXPORT_NAMES = {"csv": "ftp_metrics_export.csv", "json": "ftp_metrics_export.json"}
+BUCKET_NAMES = {
+    "csv": "ftp_metrics_buckets.csv",
+    "json": "ftp_metrics_buckets.json",
+    "sqlite": "ftp_metrics_buckets.sqlite3",
+}
+SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+QUANTILES = (0.5, 0.9, 0.99)
+ALL_DIRS = "*"
+CSV_HEADER = "timestamp,type,remote_path,hash_duration_ms,resume_offset,error_message\n"
+
+
+@dataclass(frozen=True)
+class DartDateTime:
+    """A parsed timestamp: wall-clock fields plus Dart's `isUtc` flag."""
+
+    value: datetime
+    is_utc: bool
+
+    def iso8601(self) -> str:
+        """`DateTime.toIso8601String()`."""
+        v = self.value
+        micros = v.microsecond % 1000
+        text = (
+            f"{v.year:04d}-{v.month:02d}-{v.day:02d}T{v.hour:02d}:{v.minute:02d}:"
+            f"{v.second:02d}.{v.microsecond // 1000:03d}{f'{micros:03d}' if micros else ''}"
+        )
+        return f"{text}Z" if self.is_utc else text
+
+    def instant(self) -> int:
+        """Microseconds since the epoch; wall-clock values are local time, as in Dart."""
+        if self.is_utc:
+            value = self.value.replace(tzinfo=timezone.utc)
+        else:
+            try:
+                value = self.value.astimezone(timezone.utc)
+            except (OverflowError, ValueError, OSError):
+                value = self.value.replace(tzinfo=timezone.utc)
+        return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def parse_dart_datetime(text: str) -> DartDateTime | None:
+    """`DateTime.tryParse(text)`; None where Dart returns null (or outside years 1-9999)."""
+    match = _DART_DATE.fullmatch(text)
+    if match is None:
+        return None
+    year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    hour, minute, second = (int(match.group(i) or 0) for i in (4, 5, 6))
+    # So os 6 primeiros digitos da fracao contam (sem arredondar).
+    micros = int(((match.group(7) or "") + "000000")[:6])
+    is_utc = match.group(8) is not None
+    if match.group(9) is not None:
+        sign = -1 if match.group(9) == "-" else 1
+        minute -= sign * (int(match.group(10)) * 60 + int(match.group(11) or 0))
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    try:
+        value = datetime(year, month, 1) + timedelta(
+            days=day - 1, hours=hour, minutes=minute, seconds=second, microseconds=micros,
+        )
+    except (ValueError, OverflowError):
+        return None
+    return DartDateTime(value, is_utc)
+
+
+def _dart_int(digits: str) -> int | None:
+    """`int.tryParse` for an ASCII digit run (null past 64 bits)."""
+    value = int(digits)
+    return value if value <= DART_INT_MAX else None
+
+
+def _utf16_truncate(text: str, limit: int = ERROR_MESSAGE_LIMIT) -> str:
+    """`length > limit ? '${substring(0, limit)}...' : text` over UTF-16 code units.
+
+    A pair cut in half leaves its high surrogate, as in Dart; the exporters
+    deal with it the way Dart's encoders do.
+    """
+    if len(text) + sum(1 for char in text if char > "\uffff") <= limit:
+        return text
+    units = 0
+    for index, char in enumerate(text):
+        width = 2 if char > "\uffff" else 1
+        if units + width > limit:
+            head = text[:index]
+            if units < limit:
+                head += chr(0xD800 + ((ord(char) - 0x10000) >> 10))
+            return f"{head}..."
+        units += width
+    return text
+
+
+@dataclass(frozen=True)
+class FtpMetricEvent:
+    timestamp: DartDateTime | None
+    type: str
+    remote_path: str | None = None
+    hash_duration_ms: int | None = None
+    resume_offset: int | None = None
+    error_message: str | None = None
+
+
+def extract_message(line: str) -> tuple[str, DartDateTime | None]:
+    """`_extractMessage` and `_extractTimestamp` in one pass."""
+    match = _TIMESTAMP.match(line)
+    if match is None:
+        return line.strip(_DART_TRIM), None
+    rest = line[match.end():]
+    level = _LEVEL.search(rest)
+    message = rest[level.end():] if level else rest
+    return message.strip(_DART_TRIM), parse_dart_datetime(match.group(1))
+
+
+def parse_line(line: str) -> FtpMetricEvent | None:
+    """The event of one log line, or None (same precedence as the Dart parser)."""
+    message, timestamp = extract_message(line)
+    if not message:
+        return None
+    match = _SUCCESS.search(message)
+    if match:
+        return FtpMetricEvent(
+            timestamp,
+            "success",
+            remote_path=match.group(1).strip(_DART_TRIM),
+            hash_duration_ms=_dart_int(match.group(2)) if match.group(2) else None,
+        )
+    match = _RESUME.search(message)
+    if match:
+        return FtpMetricEvent(timestamp, "resume", resume_offset=_dart_int(match.group(1)))
+    if _FALLBACK.search(message):
+        return FtpMetricEvent(timestamp, "fallback")
+    if _ERROR.search(message):
+        return FtpMetricEvent(timestamp, "error", error_message=_utf16_truncate(message))
+    if _INTEGRITY.search(message):
+        return FtpMetricEvent(timestamp, "integrity", error_message=_utf16_truncate(message))
+    return None
+
+
+def open_log(path: Path) -> BinaryIO:
+    """Byte stream of a log; `.gz` is decompressed on the fly."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _candidate_lines(block: bytes) -> Iterator[str]:
+    """Decoded lines of `block` holding a candidate keyword, in order.
+
+    Lines end at `\n`, `\r\n` or `\r` like Dart's `LineSplitter`; bytes
+    that are not UTF-8 become U+FFFD instead of aborting.
+    """
+    lowered = block.lower()  # so ASCII: os offsets nao mudam
+    starts: set[int] = set()
+    for keyword in CANDIDATE_KEYWORDS:
+        index = lowered.find(keyword)
+        while index >= 0:
+            starts.add(index)
+            index = lowered.find(keyword, index + len(keyword))
+    # Buscas limitadas a linha atual: um terminador ausente no bloco nao
+    # pode custar uma varredura ate o fim a cada candidato.
+    terminators = [char for char in (b"\n", b"\r") if char in block]
+    done = 0
+    for index in sorted(starts):
+        if index < done:
+            continue
+        start = max([block.rfind(char, done, index) for char in terminators], default=-1) + 1
+        end = len(block)
+        for char in terminators:
+            found = block.find(char, index, end)
+            if found >= 0:
+                end = found
+        done = end
+        yield block[start:end].decode("utf-8", errors="replace")
+
+
+def iter_candidate_lines(
+    stream: BinaryIO,
+    tail: list[bytes] | None = None,
+    limit: int | None = None,
+) -> Iterator[str]:
+    """Candidate lines of a byte stream, read in `READ_BLOCK` blocks.
+
+    With `tail`, an unterminated last line is appended to it instead of
+    being parsed (it may still be growing). With `limit`, at most that
+    many bytes are read.
+    """
+    carry = b""
+    while block := stream.read(READ_BLOCK if limit is None else min(READ_BLOCK, limit)):
+        if limit is not None:
+            limit -= len(block)
+        block = carry + block
+        cut = max(block.rfind(b"\n"), block.rfind(b"\r")) + 1
+        carry = block[cut:]
+        yield from _candidate_lines(block[:cut])
+    if tail is not None:
+        tail.append(carry)
+    elif carry:
+        yield from _candidate_lines(carry)
+
+
+def iter_lines(paths: Sequence[Path]) -> Iterator[str]:
+    """Candidate lines of every file in order (stdin when `paths` is empty)."""
+    if not paths:
+        yield from iter_candidate_lines(sys.stdin.buffer)
+        return
+    for path in paths:
+        with open_log(path) as handle:
+            yield from iter_candidate_lines(handle)
+
+
+def iter_events(lines: Iterable[str], window: TimeWindow | None = None) -> Iterator[FtpMetricEvent]:
+    for line in lines:
+        event = parse_line(line)
+        if event is not None and (window is None or window.admits(event.timestamp)):
+            yield event
+
+
+@dataclass(frozen=True)
+class TimeWindow:
+    """`--since`/`--until` as epoch microseconds; either end may be open."""
+
+    since: int | None = None
+    until: int | None = None
+
+    @classmethod
+    def parse(cls, since: str | None, until: str | None) -> TimeWindow:
+        """Bounds parsed like `DateTime.tryParse`; ValueError for what Dart rejects."""
+        bounds = []
+        for flag, text in (("--since", since), ("--until", until)):
+            stamp = parse_dart_datetime(text) if text else None
+            if text and stamp is None:
+                raise ValueError(f"{flag}: data inválida: {text}")
+            bounds.append(stamp.instant() if stamp else None)
+        return cls(*bounds)
+
+    def admits(self, stamp: DartDateTime | None) -> bool:
+        """The Dart filter: lines without a timestamp always pass."""
+        if stamp is None:
+            return True
+        instant = stamp.instant()
+        if self.since is not None and instant < self.since:
+            return False
+        return self.until is None or instant <= self.until
+
+
+def _line_stop(handle: BinaryIO, pos: int, end: int) -> int:
+    """Offset just past the terminator of the line holding `pos` (`end` if none)."""
+    handle.seek(pos)
+    while pos < end:
+        block = handle.read(min(SEEK_PROBE, end - pos))
+        if not block:
+            break
+        match = _TERMINATOR.search(block)
+        if match:
+            stop = pos + match.end()
+            if match.group() == b"\r" and match.end() == len(block) and stop < end:
+                stop += handle.read(1) == b"\n"
+            return stop
+        pos += len(block)
+    return end
+
+
+def _stamped_line(handle: BinaryIO, pos: int, end: int) -> tuple[int, int, int] | None:
+    """First line starting at or after `pos` whose timestamp Dart parses.
+
+    Returns (start, stop, instant), `stop` being the offset after the
+    line's terminator; a `pos` inside a line moves on to the next one.
+    """
+    # O byte anterior decide se `pos` ja e inicio de linha.
+    base, buffer = (pos - 1, b"") if pos else (-1, b"\n")
+    handle.seek(max(base, 0))
+    while chunk := handle.read(min(SEEK_PROBE, end - base - len(buffer))):
+        buffer += chunk
+        for match in _LINE_TIMESTAMP.finditer(buffer):
+            stamp = parse_dart_datetime(match.group(1).decode("ascii"))
+            if stamp is not None:
+                start = base + match.start()
+                return start, _line_stop(handle, start, end), stamp.instant()
+        # Sobreposicao para um prefixo cortado entre dois blocos.
+        keep = min(len(buffer), 128)
+        base += len(buffer) - keep
+        buffer = buffer[-keep:]
+    return None
+
+
+def _bisect(handle: BinaryIO, lo: int, end: int, before: Callable[[int], bool]) -> int:
+    """Start of the first timestamped line from `lo` whose instant is not `before`.
+
+    Timestamps are assumed not to go back, so `before` holds for a prefix
+    of the lines; `end` when it holds for all of them.
+    """
+    hi = end
+    while lo < hi:
+        mid = (lo + hi) // 2
+        found = _stamped_line(handle, mid, end)
+        if found is None or not before(found[2]):
+            hi = mid
+        else:
+            lo = found[1]
+    # Rede de seguranca para logs fora de ordem: avanca linha a linha.
+    found = _stamped_line(handle, lo, end)
+    while found is not None and before(found[2]):
+        found = _stamped_line(handle, found[1], end)
+    return end if found is None else found[0]
+
+
+def window_range(handle: BinaryIO, size: int, window: TimeWindow) -> tuple[int, int]:
+    """Byte range `[start, end)` of a time-ordered log that `window` can touch.
+
+    Lines without a timestamp go with the timestamped line before them;
+    a log with no timestamp at all is read whole, as Dart keeps every line.
+    """
+    first = _stamped_line(handle, 0, size)
+    if first is None:
+        return 0, size
+    start = 0
+    if window.since is not None and first[2] < window.since:
+        start = _bisect(handle, first[1], size, lambda instant: instant < window.since)
+    end = size
+    if window.until is not None:
+        end = _bisect(handle, start, size, lambda instant: instant <= window.until)
+    return start, max(start, end)
+
+
+def _line_instant(line: str) -> int | None:
+    match = _TIMESTAMP.match(line)
+    stamp = parse_dart_datetime(match.group(1)) if match else None
+    return stamp.instant() if stamp else None
+
+
+def _head_lines(path: Path, length: int) -> Iterator[str]:
+    with open_log(path) as handle:
+        yield from iter_candidate_lines(handle, limit=length)
+
+
+def _forward_window_lines(path: Path, window: TimeWindow) -> Iterator[str]:
+    """Candidate lines inside the bounds `window_range` would pick, in one forward pass.
+
+    For `.gz`, which cannot seek cheaply: timestamps are read from the
+    line starts of every decompressed block, so the window starts at the
+    first timestamped line at or after `since` (the file start when that
+    is the first one, the whole file when none has a timestamp) and stops
+    before the first one after `until`, as for plain logs. The bytes before
+    the first timestamped line are only re-read when they belong in.
+    """
+    since, until = window.since, window.until
+    started = since is None
+    stamped = False
+    offset = 0
+    carry = b""
+    with open_log(path) as handle:
+        while True:
+            block = handle.read(READ_BLOCK)
+            data = carry + block
+            cut = max(data.rfind(b"\n"), data.rfind(b"\r")) + 1 if block else len(data)
+            data, carry = data[:cut], data[cut:]
+            begin = 0
+            for match in _LINE_TIMESTAMP.finditer(b"\n" + data):
+                stamp = parse_dart_datetime(match.group(1).decode("ascii"))
+                if stamp is None:
+                    continue
+                instant = stamp.instant()
+                pos = match.start() - 1
+                if not started:
+                    if instant < since:
+                        stamped = True
+                        continue
+                    started = True
+                    if not stamped:
+                        yield from _head_lines(path, offset + pos)
+                    begin = pos
+                stamped = True
+                if until is not None and instant > until:
+                    yield from _candidate_lines(data[begin:pos])
+                    return
+            if started:
+                yield from _candidate_lines(data[begin:])
+            offset += len(data)
+            if not block:
+                break
+    if not started and not stamped:
+        yield from _head_lines(path, offset)
+
+
+def iter_window_lines(path: Path, window: TimeWindow) -> Iterator[str]:
+    """Candidate lines of `path` that `window` can admit, reading as little as possible.
+
+    Plain logs are read only inside `window_range`; `.gz` logs are read
+    forward up to the same upper bound (`_forward_window_lines`).
+    """
+    stat = path.stat()
+    if window.since is not None and stat.st_mtime_ns // 1000 < window.since:
+        return
+    with open_log(path) as handle:
+        first = _line_instant(handle.read(SEEK_PROBE).decode("ascii", errors="replace"))
+        if window.until is not None and first is not None and first > window.until:
+            return
+        if path.suffix != ".gz":
+            start, end = window_range(handle, stat.st_size, window)
+            handle.seek(start)
+            yield from iter_candidate_lines(handle, limit=end - start)
+            return
+    yield from _forward_window_lines(path, window)
+
+
+@dataclass
+class FtpMetricsSummary:
+    """Running aggregates of `FtpMetricsResult` (no event list)."""
+
+    success_count: int = 0
+    error_count: int = 0
+    resume_count: int = 0
+    fallback_count: int = 0
+    integrity_error_count: int = 0
+    hash_count: int = 0
+    hash_total: int = 0
+    hash_max: int | None = None
+
+    def add(self, event: FtpMetricEvent) -> None:
+        kind = event.type
+        if kind == "success":
+            self.success_count += 1
+            if event.hash_duration_ms is not None:
+                self.hash_count += 1
+                self.hash_total += event.hash_duration_ms
+                if self.hash_max is None or event.hash_duration_ms > self.hash_max:
+                    self.hash_max = event.hash_duration_ms
+        elif kind == "resume":
+            self.resume_count += 1
+        elif kind == "fallback":
+            self.fallback_count += 1
+        elif kind == "error":
+            self.error_count += 1
+        elif kind == "integrity":
+            self.integrity_error_count += 1
+
+    def merge(self, other: FtpMetricsSummary) -> None:
+        """Fold in the aggregate of a later slice of the input."""
+        self.success_count += other.success_count
+        self.error_count += other.error_count
+        self.resume_count += other.resume_count
+        self.fallback_count += other.fallback_count
+        self.integrity_error_count += other.integrity_error_count
+        self.hash_count += other.hash_count
+        self.hash_total += other.hash_total
+        if other.hash_max is not None and (self.hash_max is None or other.hash_max > self.hash_max):
+            self.hash_max = other.hash_max
+
+
+@dataclass
+class QuantileSketch:
+    """Streaming quantiles of non-negative values, HDR-histogram style.
+
+    Values are counted in logarithmic buckets `(gamma^(i-1), gamma^i]`, so
+    any quantile comes back within `SKETCH_ACCURACY` relative error from a
+    few hundred counters; merging adds the counters, which is exact and
+    independent of the order of the inputs.
+    """
+
+    buckets: dict[int, int] = field(default_factory=dict)
+    zeros: int = 0
+    count: int = 0
+    low: float | None = None
+    high: float | None = None
+
+    def add(self, value: float) -> None:
+        if value <= 0:
+            self.zeros += 1
+            value = 0
+        else:
+            index = math.ceil(math.log(value) / _LOG_GAMMA)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.low = value if self.low is None else min(self.low, value)
+        self.high = value if self.high is None else max(self.high, value)
+
+    def merge(self, other: QuantileSketch) -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        if other.low is not None:
+            self.low = other.low if self.low is None else min(self.low, other.low)
+            self.high = other.high if self.high is None else max(self.high, other.high)
+
+    def quantile(self, q: float) -> float | None:
+        """Value at rank `q * (count - 1)`, clamped to the exact min/max."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                value = 2 * _GAMMA**index / (_GAMMA + 1)
+                return min(max(value, self.low), self.high)
+        return self.high
+
+
+@dataclass(frozen=True)
+class UploadSample:
+    """One `Upload FTP concluido com sucesso` line of the orchestrator."""
+
+    timestamp: DartDateTime | None
+    remote_path: str
+    size_bytes: float
+    seconds: int
+
+
+def parse_upload_line(line: str) -> UploadSample | None:
+    message, timestamp = extract_message(line)
+    match = _UPLOAD_DONE.search(message)
+    if match is None:
+        return None
+    size = float(match.group(2)) * _BYTE_UNITS[match.group(3).lower()]
+    return UploadSample(timestamp, match.group(1).strip(_DART_TRIM), size, int(match.group(4)))
+
+
+@dataclass
+class FtpBucket:
+    """Counters and sketches of one hour/remote directory (or of everything)."""
+
+    success_count: int = 0
+    error_count: int = 0
+    hash_ms: QuantileSketch = field(default_factory=QuantileSketch)
+    upload_seconds: QuantileSketch = field(default_factory=QuantileSketch)
+    mb_per_s: QuantileSketch = field(default_factory=QuantileSketch)
+
+    def merge(self, other: FtpBucket) -> None:
+        self.success_count += other.success_count
+        self.error_count += other.error_count
+        self.hash_ms.merge(other.hash_ms)
+        self.upload_seconds.merge(other.upload_seconds)
+        self.mb_per_s.merge(other.mb_per_s)
+
+
+def _hour(stamp: DartDateTime | None) -> str:
+    """Bucket label: the timestamp's own hour (`...Z` when UTC), '' without one."""
+    if stamp is None:
+        return ""
+    return DartDateTime(stamp.value.replace(minute=0, second=0, microsecond=0), stamp.is_utc).iso8601()
+
+
+def _remote_dir(remote_path: str) -> str:
+    return posixpath.dirname(remote_path) or "/"
+
+
+@dataclass
+class FtpMetricsStats:
+    """Percentile sketches overall and per (hour, remote directory)."""
+
+    overall: FtpBucket = field(default_factory=FtpBucket)
+    buckets: dict[tuple[str, str], FtpBucket] = field(default_factory=dict)
+
+    def _targets(self, stamp: DartDateTime | None, remote_path: str | None) -> tuple[FtpBucket, ...]:
+        """Overall, the hour's `ALL_DIRS` row and, with a path, its directory row."""
+        hour = _hour(stamp)
+        keys = [(hour, ALL_DIRS)]
+        if remote_path:
+            keys.append((hour, _remote_dir(remote_path)))
+        for key in keys:
+            if key not in self.buckets:
+                self.buckets[key] = FtpBucket()
+        return self.overall, *(self.buckets[key] for key in keys)
+
+    def add_event(self, event: FtpMetricEvent) -> None:
+        if event.type == "error":
+            # O erro nao traz caminho remoto: so conta no total da hora.
+            for bucket in self._targets(event.timestamp, None):
+                bucket.error_count += 1
+            return
+        if event.type != "success":
+            return
+        for bucket in self._targets(event.timestamp, event.remote_path):
+            bucket.success_count += 1
+            if event.hash_duration_ms is not None:
+                bucket.hash_ms.add(event.hash_duration_ms)
+
+    def add_upload(self, sample: UploadSample) -> None:
+        for bucket in self._targets(sample.timestamp, sample.remote_path):
+            bucket.upload_seconds.add(sample.seconds)
+            # ByteFormat.speedMbPerSec: sem vazao para uploads de 0s.
+            if sample.seconds > 0:
+                bucket.mb_per_s.add(sample.size_bytes / (1 << 20) / sample.seconds)
+
+    def merge(self, other: FtpMetricsStats) -> None:
+        self.overall.merge(other.overall)
+        for key, bucket in other.buckets.items():
+            if key in self.buckets:
+                self.buckets[key].merge(bucket)
+            else:
+                self.buckets[key] = bucket
+
+
+def _to_fixed(value: float, digits: int) -> str:
+    """`double.toStringAsFixed`: exact binary value, ties rounded away from zero."""
+    return str(Decimal(value).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+
+def format_summary(summary: FtpMetricsSummary) -> str:
+    """Text printed by `_printSummary` in `parse_ftp_metrics.dart`."""
+    total = summary.success_count + summary.error_count
+    success_rate = _to_fixed(float(summary.success_count) / total * 100, 1) if total else "-"
+    error_rate = _to_fixed(float(summary.error_count) / total * 100, 1) if total else "-"
+    resume_rate = (
+        _to_fixed(float(summary.resume_count) / summary.success_count * 100, 1)
+        if summary.success_count
+        else "-"
+    )
+    lines = [
+        "",
+        "=== Métricas FTP ===",
+        "",
+        f"Sucessos:     {summary.success_count}",
+        f"Erros:        {summary.error_count}",
+        f"Retomadas:    {summary.resume_count}",
+        f"Fallbacks:    {summary.fallback_count}",
+        f"Integridade:  {summary.integrity_error_count}",
+        "",
+        f"Taxa de sucesso:  {success_rate}%",
+        f"Taxa de erro:    {error_rate}%",
+        f"% com retomada:  {resume_rate}%",
+    ]
+    if summary.hash_count:
+        average = _to_fixed(float(summary.hash_total) / float(summary.hash_count), 0)
+        lines += ["", f"Hash SHA-256 (amostra): média {average}ms, max {summary.hash_max}ms"]
+    return "\n".join(lines) + "\n\n"
+
+
+def format_percentiles(stats: FtpMetricsStats) -> str:
+    """p50/p90/p99 block printed after the summary with `--percentiles`."""
+    lines = ["Percentis p50 / p90 / p99 (erro relativo <= 1%):"]
+    for label, sketch, unit, digits in (
+        ("Hash SHA-256", stats.overall.hash_ms, "ms", 0),
+        ("Upload", stats.overall.upload_seconds, "s", 0),
+        ("Vazão", stats.overall.mb_per_s, "MB/s", 2),
+    ):
+        if not sketch.count:
+            lines.append(f"  {label + ':':<14}-")
+            continue
+        values = " / ".join(_to_fixed(sketch.quantile(q), digits) for q in QUANTILES)
+        lines.append(f"  {label + ':':<14}{values} {unit} (n={sketch.count})")
+    return "\n".join(lines) + "\n\n"
+
+
+BUCKET_COLUMNS = (
+    "hour",
+    "remote_dir",
+    "success_count",
+    "error_count",
+    "hash_count",
+    "hash_p50_ms",
+    "hash_p90_ms",
+    "hash_p99_ms",
+    "upload_count",
+    "upload_p50_s",
+    "upload_p90_s",
+    "upload_p99_s",
+    "mb_per_s_p50",
+    "mb_per_s_p90",
+    "mb_per_s_p99",
+)
+
+
+_BUCKET_TYPES = {
+    "hour": "TEXT",
+    "remote_dir": "TEXT",
+    "success_count": "INTEGER",
+    "error_count": "INTEGER",
+    "hash_count": "INTEGER",
+    "upload_count": "INTEGER",
+}
+
+
+def bucket_rows(stats: FtpMetricsStats) -> list[tuple]:
+    """One row per (hour, remote directory) in `BUCKET_COLUMNS` order, sorted.
+
+    Each hour starts with its `ALL_DIRS` row; errors name no remote path,
+    so `error_count` is only set there and is None on directory rows.
+    """
+    rows = []
+    for (hour, remote_dir), bucket in sorted(stats.buckets.items()):
+        errors = bucket.error_count if remote_dir == ALL_DIRS else None
+        row: list = [hour, remote_dir, bucket.success_count, errors]
+        for sketch in (bucket.hash_ms, bucket.upload_seconds, bucket.mb_per_s):
+            if sketch is not bucket.mb_per_s:
+                row.append(sketch.count)
+            for q in QUANTILES:
+                value = sketch.quantile(q)
+                row.append(None if value is None else round(value, 3))
+        rows.append(tuple(row))
+    return rows
+
+
+def write_buckets(path: Path, fmt: str, stats: FtpMetricsStats) -> None:
+    """Time-bucketed export (`BUCKET_COLUMNS`), replaced atomically."""
+    rows = bucket_rows(stats)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        if fmt == "sqlite":
+            columns = ", ".join(
+                f"{column} {_BUCKET_TYPES.get(column, 'REAL')}" for column in BUCKET_COLUMNS
+            )
+            db = sqlite3.connect(tmp_path)
+            try:
+                with db:
+                    db.execute(f"CREATE TABLE buckets ({columns}, PRIMARY KEY (hour, remote_dir))")
+                    db.executemany(
+                        f"INSERT INTO buckets VALUES ({', '.join('?' * len(BUCKET_COLUMNS))})", rows,
+                    )
+            finally:
+                db.close()
+        elif fmt == "csv":
+            with open(tmp_path, "w", encoding="utf-8", newline="") as handle:
+                handle.write(",".join(BUCKET_COLUMNS) + "\n")
+                for row in rows:
+                    fields = ("" if value is None else _csv_field(str(value)) for value in row)
+                    handle.write(",".join(fields) + "\n")
+        else:
+            payload = {"buckets": [dict(zip(BUCKET_COLUMNS, row)) for row in rows]}
+            tmp_path.write_text(_json_dumps(payload, indent=2), encoding="utf-8")
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+
+
+_SURROGATE = re.compile("[\ud800-\udfff]")
+
+
+def _csv_field(text: str | None) -> str:
+    """`_escapeCsv`; a lone surrogate becomes U+FFFD like Dart's UTF-8 encoder."""
+    if not text:
+        return ""
+    text = _SURROGATE.sub("\ufffd", text)
+    if "," in text or '"' in text or "\n" in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _json_dumps(value: object, indent: int | None = None) -> str:
+    """`JsonEncoder.withIndent`: raw non-ASCII, lone surrogates as `\\udxxx`."""
+    text = json.dumps(value, ensure_ascii=False, indent=indent)
+    return _SURROGATE.sub(lambda match: f"\\u{ord(match.group()):04x}", text)
+
+
+def _csv_row(event: FtpMetricEvent) -> str:
+    """One `toCsv` row."""
+    return (
+        f"{event.timestamp.iso8601() if event.timestamp else ''},"
+        f"{event.type},"
+        f"{_csv_field(event.remote_path)},"
+        f"{'' if event.hash_duration_ms is None else event.hash_duration_ms},"
+        f"{'' if event.resume_offset is None else event.resume_offset},"
+        f"{_csv_field(event.error_message)}\n"
+    )
+
+
+def _json_event(event: FtpMetricEvent) -> str:
+    """One element of `toJson`'s `events`, indented as inside the document."""
+    item = {
+        "timestamp": event.timestamp.iso8601() if event.timestamp else None,
+        "type": event.type,
+        "remotePath": event.remote_path,
+        "hashDurationMs": event.hash_duration_ms,
+        "resumeOffset": event.resume_offset,
+        "errorMessage": event.error_message,
+    }
+    return "\n    " + _json_dumps(item, indent=2).replace("\n", "\n    ")
+
+
+@dataclass
+class ExportFragment:
+    """Export output of one input, spooled to disk in input order.
+
+    CSV rows, or JSON event elements and hash durations, each list
+    comma-separated inside the fragment; `write_export` stitches the
+    fragments together after the merged summary.
+    """
+
+    events_path: Path
+    hashes_path: Path | None
+    events: int = 0
+    hashes: int = 0
+
+
+class _FragmentWriter:
+    def __init__(self, export: str, spool_dir: Path) -> None:
+        self.export = export
+        self.fragment = ExportFragment(
+            Path(tempfile.mkstemp(suffix=".events", dir=spool_dir)[1]),
+            Path(tempfile.mkstemp(suffix=".hashes", dir=spool_dir)[1]) if export == "json" else None,
+        )
+        self.events = open(self.fragment.events_path, "w", encoding="utf-8", newline="")
+        self.hashes = (
+            open(self.fragment.hashes_path, "w", encoding="utf-8", newline="")
+            if self.fragment.hashes_path
+            else None
+        )
+
+    def add(self, event: FtpMetricEvent) -> None:
+        fragment = self.fragment
+        if self.export == "csv":
+            self.events.write(_csv_row(event))
+        else:
+            self.events.write(f"{',' if fragment.events else ''}{_json_event(event)}")
+            if event.hash_duration_ms is not None:
+                self.hashes.write(f"{',' if fragment.hashes else ''}\n      {event.hash_duration_ms}")
+                fragment.hashes += 1
+        fragment.events += 1
+
+    def close(self) -> ExportFragment:
+        self.events.close()
+        if self.hashes is not None:
+            self.hashes.close()
+        return self.fragment
+
+
+@dataclass
+class FtpMetricsPartial:
+    """Mergeable result of one input: aggregates plus its export fragment."""
+
+    summary: FtpMetricsSummary
+    fragment: ExportFragment | None = None
+    stats: FtpMetricsStats | None = None
+
+
+def aggregate(
+    path: Path | None,
+    export: str | None = None,
+    spool_dir: Path | None = None,
+    window: TimeWindow | None = None,
+    stats: bool = False,
+) -> FtpMetricsPartial:
+    """Parse one file (stdin for None) into a partial; runs in worker processes."""
+    if path is None:
+        lines = iter_candidate_lines(sys.stdin.buffer)
+    elif window is not None:
+        lines = iter_window_lines(path, window)
+    else:
+        lines = iter_lines([path])
+    return _consume(lines, export, spool_dir, window, stats)
+
+
+def _consume(
+    lines: Iterable[str],
+    export: str | None,
+    spool_dir: Path | None,
+    window: TimeWindow | None = None,
+    stats: bool = False,
+) -> FtpMetricsPartial:
+    summary = FtpMetricsSummary()
+    writer = _FragmentWriter(export, spool_dir) if export else None
+    sketches = FtpMetricsStats() if stats else None
+    try:
+        for line in lines:
+            event = parse_line(line)
+            if event is None:
+                if sketches is not None:
+                    sample = parse_upload_line(line)
+                    if sample is not None and (window is None or window.admits(sample.timestamp)):
+                        sketches.add_upload(sample)
+                continue
+            if window is not None and not window.admits(event.timestamp):
+                continue
+            summary.add(event)
+            if writer is not None:
+                writer.add(event)
+            if sketches is not None:
+                sketches.add_event(event)
+    finally:
+        fragment = writer.close() if writer is not None else None
+    return FtpMetricsPartial(summary, fragment, sketches)
+
+
+def aggregate_all(
+    paths: Sequence[Path],
+    export: str | None = None,
+    spool_dir: Path | None = None,
+    jobs: int = 1,
+    window: TimeWindow | None = None,
+    stats: bool = False,
+) -> list[FtpMetricsPartial]:
+    """Partials of `paths` in input order; `jobs > 1` spreads files over processes.
+
+    Files are submitted largest first so one big log does not end up as a
+    serial tail behind the small ones.
+    """
+    if not paths:
+        return [aggregate(None, export, spool_dir, window, stats)]
+    if jobs <= 1 or len(paths) == 1:
+        return [aggregate(path, export, spool_dir, window, stats) for path in paths]
+    order = sorted(range(len(paths)), key=lambda index: -paths[index].stat().st_size)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+        futures = {
+            index: executor.submit(aggregate, paths[index], export, spool_dir, window, stats)
+            for index in order
+        }
+        return [futures[index].result() for index in range(len(paths))]
+
+
+def _copy_list(out: IO[str], paths: Iterable[Path]) -> bool:
+    """Concatenate comma-separated fragments with a comma between them."""
+    wrote = False
+    for path in paths:
+        with open(path, encoding="utf-8", newline="") as spool:
+            if wrote:
+                out.write(",")
+            shutil.copyfileobj(spool, out, 1 << 16)
+        wrote = True
+    return wrote
+
+
+def write_export(
+    out: IO[str],
+    export: str,
+    summary: FtpMetricsSummary,
+    fragments: Sequence[ExportFragment],
+) -> None:
+    """`toCsv` / `toJson` of the merged input from the per-input fragments."""
+    if export == "csv":
+        out.write(CSV_HEADER)
+        for fragment in fragments:
+            with open(fragment.events_path, encoding="utf-8", newline="") as spool:
+                shutil.copyfileobj(spool, out, 1 << 16)
+        return
+    out.write(
+        "{\n"
+        '  "summary": {\n'
+        f'    "successCount": {summary.success_count},\n'
+        f'    "errorCount": {summary.error_count},\n'
+        f'    "resumeCount": {summary.resume_count},\n'
+        f'    "fallbackCount": {summary.fallback_count},\n'
+        f'    "integrityErrorCount": {summary.integrity_error_count},\n'
+        '    "hashDurationsMs": ['
+    )
+    hashes = [fragment.hashes_path for fragment in fragments if fragment.hashes]
+    out.write("\n    ]" if _copy_list(out, hashes) else "]")
+    out.write('\n  },\n  "events": [')
+    events = [fragment.events_path for fragment in fragments if fragment.events]
+    out.write("\n  ]" if _copy_list(out, events) else "]")
+    out.write("\n}")
+
+
+def run_metrics(
+    paths: Sequence[Path],
+    export: str | None = None,
+    export_dir: Path | None = None,
+    out: TextIO | None = None,
+    jobs: int = 1,
+    window: TimeWindow | None = None,
+    percentiles: bool = False,
+    buckets: str | None = None,
+) -> int:
+    """Parse `paths` (stdin when empty), print the summary and export; exit code."""
+    out = out or sys.stdout
+    for path in paths:
+        if not path.is_file():
+            print(f"Arquivo não encontrado: {path}", file=out)
+            return 1
+
+    with tempfile.TemporaryDirectory(prefix="ftp_metrics_") as spool_dir:
+        partials = aggregate_all(
+            paths, export, Path(spool_dir), jobs, window, stats=percentiles or bool(buckets),
+        )
+        summary = FtpMetricsSummary()
+        stats = FtpMetricsStats()
+        for partial in partials:
+            summary.merge(partial.summary)
+            if partial.stats is not None:
+                stats.merge(partial.stats)
+        if export:
+            export_path = (export_dir or Path.cwd()) / EXPORT_NAMES[export]
+            tmp_path = export_path.with_name(f"{export_path.name}.tmp")
+            try:
+                with open(tmp_path, "w", encoding="utf-8", newline="") as handle:
+                    write_export(handle, export, summary, [partial.fragment for partial in partials])
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+
+    out.write(format_summary(summary))
+    if percentiles:
+        out.write(format_percentiles(stats))
+    if export:
+        os.replace(tmp_path, export_path)
+        print(f"\nExportado para: {EXPORT_NAMES[export]}", file=out)
+    if buckets:
+        write_buckets((export_dir or Path.cwd()) / BUCKET_NAMES[buckets], buckets, stats)
+        print(f"\nBuckets por hora exportados para: {BUCKET_NAMES[buckets]}", file=out)
+    return 0
+
+
+@dataclass
+class FileCheckpoint:
+    """Where the previous run stopped in one log, and what it had counted.
+
+    A log is recognised by the SHA-256 of its first `head_len` bytes
+    (decompressed for `.gz`), so a rename or a copy into a rotated/gzipped
+    file resumes at `offset` instead of counting the same lines twice.
+    `offset` stops after the last complete line; the unterminated rest
+    only feeds `tail`, which is recomputed on the next read.
+    """
+
+    path: str
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+    head_len: int
+    head_sha: str
+    offset: int = 0
+    summary: FtpMetricsSummary = field(default_factory=FtpMetricsSummary)
+    tail: FtpMetricsSummary = field(default_factory=FtpMetricsSummary)
+
+    def unchanged(self, path: Path, stat: os.stat_result) -> bool:
+        return (
+            self.path == str(path)
+            and (self.device, self.inode, self.size, self.mtime_ns)
+            == (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        )
+
+    def to_json(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_json(cls, payload: dict) -> FileCheckpoint:
+        payload = dict(payload)
+        payload["summary"] = FtpMetricsSummary(**payload["summary"])
+        payload["tail"] = FtpMetricsSummary(**payload["tail"])
+        return cls(**payload)
+
+
+def load_checkpoint(path: Path) -> list[FileCheckpoint]:
+    """Entries of a checkpoint file ([] when missing, corrupt or stale)."""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    if not isinstance(payload, dict) or payload.get("schema_version") != CHECKPOINT_SCHEMA_VERSION:
+        return []
+    try:
+        return [FileCheckpoint.from_json(item) for item in payload.get("files", [])]
+    except (TypeError, KeyError):
+        return []
+
+
+def save_checkpoint(path: Path, entries: Sequence[FileCheckpoint]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {
+                "schema_version": CHECKPOINT_SCHEMA_VERSION,
+                "files": [entry.to_json() for entry in entries],
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, path)
+
+
+def _head(path: Path, length: int = HEAD_BYTES) -> bytes:
+    with open_log(path) as handle:
+        return handle.read(length)
+
+
+def match_checkpoints(
+    paths: Sequence[Path],
+    entries: Sequence[FileCheckpoint],
+) -> list[FileCheckpoint | None]:
+    """The previous entry of every path, or None for a log never seen.
+
+    Same path, identity, size and mtime wins outright; otherwise the first
+    unclaimed entry whose head bytes match the file's current beginning.
+    Each entry is claimed once, so after a copytruncate the rotated copy
+    resumes and the emptied log starts over.
+    """
+    matched: list[FileCheckpoint | None] = [None] * len(paths)
+    claimed: set[int] = set()
+    stats = [path.stat() for path in paths]
+    for index, (path, stat) in enumerate(zip(paths, stats)):
+        for number, entry in enumerate(entries):
+            if number not in claimed and entry.unchanged(path, stat):
+                matched[index] = entry
+                claimed.add(number)
+                break
+    heads: dict[tuple[int, int], bytes] = {}
+    for index, path in enumerate(paths):
+        if matched[index] is not None:
+            continue
+        # Mesmo caminho/inode primeiro: um log que so cresceu continua de onde parou.
+        candidates = sorted(
+            (number for number in range(len(entries)) if number not in claimed),
+            key=lambda number: entries[number].path != str(path),
+        )
+        for number in candidates:
+            entry = entries[number]
+            key = (index, entry.head_len)
+            if key not in heads:
+                heads[key] = _head(path, entry.head_len)
+            head = heads[key]
+            if len(head) == entry.head_len and hashlib.sha256(head).hexdigest() == entry.head_sha:
+                matched[index] = entry
+                claimed.add(number)
+                break
+    return matched
+
+
+def update_file(
+    path: Path,
+    previous: FileCheckpoint | None,
+    export: str | None = None,
+    spool_dir: Path | None = None,
+) -> tuple[FileCheckpoint, FtpMetricsPartial]:
+    """Parse only what `path` gained since `previous`; runs in worker processes.
+
+    Returns the new entry and a partial with the events of the complete
+    lines read now (the delta that gets exported).
+    """
+    stat = path.stat()
+    if previous is not None and previous.unchanged(path, stat):
+        return previous, FtpMetricsPartial(FtpMetricsSummary(), None)
+    with open_log(path) as handle:
+        head = handle.read(HEAD_BYTES)
+        start = previous.offset if previous is not None else 0
+        summary = FtpMetricsSummary()
+        if previous is not None:
+            summary.merge(previous.summary)
+        handle.seek(start)
+        if handle.tell() != start or (path.suffix != ".gz" and stat.st_size < start):
+            # Truncado desde a ultima leitura: recomeca do zero.
+            start = 0
+            summary = FtpMetricsSummary()
+            handle.seek(0)
+        tail: list[bytes] = []
+        delta = _consume(iter_candidate_lines(handle, tail), export, spool_dir)
+        offset = handle.tell() - len(tail[0])
+    summary.merge(delta.summary)
+    tail_summary = _consume(_candidate_lines(tail[0]), None, None).summary
+    entry = FileCheckpoint(
+        path=str(path),
+        device=stat.st_dev,
+        inode=stat.st_ino,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        head_len=len(head),
+        head_sha=hashlib.sha256(head).hexdigest(),
+        offset=offset,
+        summary=summary,
+        tail=tail_summary,
+    )
+    return entry, delta
+
+
+@dataclass
+class IncrementalResult:
+    entries: list[FileCheckpoint]
+    total: FtpMetricsSummary
+    delta: FtpMetricsSummary
+    fragments: list[ExportFragment]
+    read: int
+    skipped: int
+
+
+def update_all(
+    paths: Sequence[Path],
+    entries: Sequence[FileCheckpoint],
+    export: str | None = None,
+    spool_dir: Path | None = None,
+    jobs: int = 1,
+) -> IncrementalResult:
+    """Bring every log up to date; the totals equal a full parse of `paths`."""
+    previous = match_checkpoints(paths, entries)
+    work = [
+        (path, entry)
+        for path, entry in zip(paths, previous)
+        if entry is None or not entry.unchanged(path, path.stat())
+    ]
+    if jobs > 1 and len(work) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(work))) as executor:
+            futures = [executor.submit(update_file, path, entry, export, spool_dir) for path, entry in work]
+            updated = {str(path): future.result() for (path, _entry), future in zip(work, futures)}
+    else:
+        updated = {str(path): update_file(path, entry, export, spool_dir) for path, entry in work}
+
+    result = IncrementalResult([], FtpMetricsSummary(), FtpMetricsSummary(), [], len(work), 0)
+    for path, entry in zip(paths, previous):
+        if str(path) in updated:
+            entry, partial = updated[str(path)]
+            result.delta.merge(partial.summary)
+            if partial.fragment is not None:
+                result.fragments.append(partial.fragment)
+        else:
+            result.skipped += 1
+        result.entries.append(entry)
+        result.total.merge(entry.summary)
+        result.total.merge(entry.tail)
+    return result
+
+
+def _event_count(summary: FtpMetricsSummary) -> int:
+    return (
+        summary.success_count
+        + summary.error_count
+        + summary.resume_count
+        + summary.fallback_count
+        + summary.integrity_error_count
+    )
+
+
+def run_incremental(
+    resolve_paths: Callable[[], Sequence[Path]],
+    checkpoint_path: Path | None,
+    export: str | None = None,
+    export_dir: Path | None = None,
+    out: TextIO | None = None,
+    jobs: int = 1,
+    follow: bool = False,
+    interval: float = 60.0,
+    max_ticks: int | None = None,
+) -> int:
+    """Checkpointed run: parse only appended bytes, optionally tailing the logs.
+
+    Without `follow` this prints the cumulative summary and exports the
+    new events only. With `follow` it repeats every `interval` seconds
+    (re-listing the logs to pick up rotations) and prints one rolling line
+    per tick until interrupted.
+    """
+    out = out or sys.stdout
+    entries = load_checkpoint(checkpoint_path) if checkpoint_path else []
+    ticks = 0
+    try:
+        while True:
+            paths = list(resolve_paths())
+            missing = [path for path in paths if not path.is_file()]
+            if missing:
+                print(f"Arquivo não encontrado: {missing[0]}", file=out)
+                return 1
+            with tempfile.TemporaryDirectory(prefix="ftp_metrics_") as spool_dir:
+                result = update_all(paths, entries, export, Path(spool_dir), jobs)
+                if export and not follow:
+                    export_path = (export_dir or Path.cwd()) / EXPORT_NAMES[export]
+                    tmp_path = export_path.with_name(f"{export_path.name}.tmp")
+                    with open(tmp_path, "w", encoding="utf-8", newline="") as handle:
+                        write_export(handle, export, result.delta, result.fragments)
+                    os.replace(tmp_path, export_path)
+            entries = result.entries
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, entries)
+
+            if not follow:
+                out.write(format_summary(result.total))
+                print(
+                    f"Incremental: {result.read} arquivo(s) lido(s), {result.skipped} sem mudança, "
+                    f"{_event_count(result.delta)} evento(s) novo(s)",
+                    file=out,
+                )
+                if export:
+                    print(f"\nExportado para: {EXPORT_NAMES[export]}", file=out)
+                return 0
+
+            total, delta = result.total, result.delta
+            print(
+                f"[{datetime.now().isoformat(timespec='seconds')}] "
+                f"+{delta.success_count} sucesso(s), +{delta.error_count} erro(s), "
+                f"+{delta.resume_count} retomada(s), +{delta.fallback_count} fallback(s), "
+                f"+{delta.integrity_error_count} integridade | total: {total.success_count} "
+                f"sucesso(s), {total.error_count} erro(s)",
+                file=out,
+                flush=True,
+            )
+            ticks += 1
+            if max_ticks is not None and ticks >= max_ticks:
+                return 0
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+def add_incremental_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--checkpoint",
+        nargs="?",
+        const=DEFAULT_CHECKPOINT,
+        type=Path,
+        help=(
+            "Incremental mode: resume from the offsets and totals saved in this "
+            f"file (default when given without a value: {DEFAULT_CHECKPOINT})"
+        ),
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep tailing the logs and print rolling metrics every --interval seconds",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60.0,
+        help="Seconds between --follow updates (default: 60)",
+    )
+
+
+def add_window_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--since",
+        help="Only lines at or after this DateTime.parse date (e.g. 2026-03-01 = local midnight)",
+    )
+    parser.add_argument("--until", help="Only lines at or before this date (inclusive instant)")
+
+
+def add_percentile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--percentiles",
+        action="store_true",
+        help="Also print p50/p90/p99 of hash time, upload duration and MB/s",
+    )
+    parser.add_argument(
+        "--buckets",
+        choices=sorted(BUCKET_NAMES),
+        help="Export percentiles per hour and remote directory (csv, json or sqlite)",
+    )
+
+
+def parse_window(parser: argparse.ArgumentParser, args: argparse.Namespace) -> TimeWindow | None:
+    """The `--since`/`--until` window, or None; exits through `parser` on a bad date."""
+    if not args.since and not args.until:
+        return None
+    if args.checkpoint or args.follow:
+        parser.error("--since/--until cannot be combined with --checkpoint/--follow")
+    try:
+        return TimeWindow.parse(args.since, args.until)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("paths", nargs="*", type=Path, help="Log files (.log or .gz); stdin if none")
+    parser.add_argument("--export", choices=sorted(EXPORT_NAMES), help="Export events too")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes, one file each (default: CPU count; 1 parses sequentially)",
+    )
+    add_incremental_arguments(parser)
+    add_window_arguments(parser)
+    add_percentile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    window = parse_window(parser, args)
+    if args.checkpoint or args.follow:
+        if args.percentiles or args.buckets:
+            parser.error("--percentiles/--buckets cannot be combined with --checkpoint/--follow")
+        if not args.paths:
+            parser.error("--checkpoint/--follow need log files (not stdin)")
+        if args.follow and args.export:
+            parser.error("--follow does not export; run --checkpoint --export for the delta")
+        return run_incremental(
+            lambda: args.paths,
+            args.checkpoint,
+            args.export,
+            jobs=args.jobs,
+            follow=args.follow,
+            interval=args.interval,
+        )
+    return run_metrics(
+        args.paths,
+        args.export,
+        jobs=args.jobs,
+        window=window,
+        percentiles=args.percentiles,
+        buckets=args.buckets,
+    )
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
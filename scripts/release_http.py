@@ -0,0 +1,459 @@
+"""Shared HTTP client for the release tooling.
+
+Used by `scripts/sync_appcast_from_releases.py` (and its benchmark) to
+talk to the GitHub API and to download release assets. Compared to a
+bare `urllib.request.urlopen` per call it:
+
+- keeps one keep-alive connection per host (per thread, because
+  `http.client` connections are not thread-safe);
+- tracks `X-RateLimit-Remaining` / `X-RateLimit-Reset` per host and
+  defers requests until the window resets instead of burning the last
+  ones on a `403`;
+- honours `Retry-After` on secondary rate limits (`403`/`429`);
+- retries `5xx` and connection resets with exponential backoff;
+- follows redirects, dropping `Authorization` when the host changes
+  (release downloads redirect to a storage host);
+- streams large downloads in fixed-size chunks and resumes them with
+  `Range` after a dropped connection (`download`).
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Protocol
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_TIMEOUT_SECONDS = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+# Quantas requisicoes deixar sobrando na janela antes de adiar as proximas.
+DEFAULT_MIN_REMAINING = 0
+# Acima disso preferimos falhar a deixar o job parado esperando a janela.
+DEFAULT_MAX_WAIT_SECONDS = 900.0
+MAX_REDIRECTS = 5
+# Mesmo bloco de `windows_icon_utils.sha256_file`.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+_TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    socket.timeout,
+    http.client.HTTPException,
+)
+
+
+class HttpError(RuntimeError):
+    def __init__(self, url: str, status: int, reason: str, body: bytes = b"") -> None:
+        super().__init__(f"HTTP {status} {reason} for {url}")
+        self.url = url
+        self.status = status
+        self.body = body
+
+
+class RateLimitError(HttpError):
+    """Quota exhausted and the reset is further away than `max_wait_seconds`."""
+
+
+@dataclass(frozen=True)
+class HttpResponse:
+    url: str
+    status: int
+    reason: str
+    # Chaves em minusculas.
+    headers: dict[str, str]
+    body: bytes
+
+    def header(self, name: str) -> str | None:
+        return self.headers.get(name.lower())
+
+    def json(self) -> object:
+        return json.loads(self.body.decode("utf-8"))
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+class DownloadSink(Protocol):
+    def write(self, chunk: bytes) -> None: ...
+
+    def restart(self) -> None:
+        """Discard everything written so far (server ignored `Range`)."""
+
+
+@dataclass
+class _Quota:
+    remaining: int | None = None
+    reset_at: float | None = None
+    blocked_until: float = 0.0
+
+
+class ReleaseHttpClient:
+    """Rate-limit aware GET client with per-host keep-alive connections."""
+
+    def __init__(
+        self,
+        *,
+        headers: dict[str, str] | None = None,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        retries: int = DEFAULT_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        min_remaining: int = DEFAULT_MIN_REMAINING,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._headers = dict(headers or {})
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff_seconds = backoff_seconds
+        self._min_remaining = min_remaining
+        self._max_wait_seconds = max_wait_seconds
+        self._sleep = sleep
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._quotas: dict[str, _Quota] = {}
+        self._connections: list[http.client.HTTPConnection] = []
+        self.request_count = 0
+        self.connection_count = 0
+
+    def __enter__(self) -> "ReleaseHttpClient":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+    def quota(self, host: str) -> tuple[int | None, float | None]:
+        """Last known `(remaining, reset epoch)` for `host` (netloc)."""
+        with self._lock:
+            quota = self._quotas.get(host, _Quota())
+            return quota.remaining, quota.reset_at
+
+    def get(self, url: str, headers: dict[str, str] | None = None) -> HttpResponse:
+        """GET `url`; 2xx and 304 are returned, anything else raises `HttpError`."""
+        request_headers = {**self._headers, **(headers or {})}
+        current = url
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request_with_retries(current, request_headers)
+            location = response.header("location")
+            if response.status in REDIRECT_STATUSES and location:
+                target = urljoin(current, location)
+                if urlsplit(target).netloc != urlsplit(current).netloc:
+                    request_headers = {
+                        key: value
+                        for key, value in request_headers.items()
+                        if key.lower() != "authorization"
+                    }
+                current = target
+                continue
+            if response.status == 304 or 200 <= response.status < 300:
+                return response
+            raise HttpError(current, response.status, response.reason, response.body)
+        raise HttpError(url, 0, f"more than {MAX_REDIRECTS} redirects")
+
+    def download(
+        self,
+        url: str,
+        sink: DownloadSink,
+        *,
+        headers: dict[str, str] | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> int:
+        """Stream `url` into `sink` chunk by chunk; return the bytes received.
+
+        Nothing is buffered beyond one chunk. When the connection drops
+        mid-body the request is retried with `Range: bytes=<received>-`;
+        a server that answers `200` instead of `206` makes the sink
+        `restart()` from zero.
+        """
+        request_headers = {**self._headers, **(headers or {})}
+        current = url
+        received = 0
+        attempt = 0
+        redirects = 0
+        while True:
+            parts = urlsplit(current)
+            target = parts.path or "/"
+            if parts.query:
+                target = f"{target}?{parts.query}"
+            send_headers = dict(request_headers)
+            if received:
+                send_headers["Range"] = f"bytes={received}-"
+
+            self._wait_for_quota(parts.netloc)
+            connection, _ = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", target, headers=send_headers)
+                raw = connection.getresponse()
+                with self._lock:
+                    self.request_count += 1
+
+                location = raw.getheader("location")
+                if raw.status in REDIRECT_STATUSES and location:
+                    raw.read()
+                    redirects += 1
+                    if redirects > MAX_REDIRECTS:
+                        raise HttpError(url, raw.status, f"more than {MAX_REDIRECTS} redirects")
+                    next_url = urljoin(current, location)
+                    if urlsplit(next_url).netloc != parts.netloc:
+                        request_headers = {
+                            key: value
+                            for key, value in request_headers.items()
+                            if key.lower() != "authorization"
+                        }
+                    current = next_url
+                    continue
+
+                if raw.status not in (200, 206):
+                    response = HttpResponse(
+                        url=current,
+                        status=raw.status,
+                        reason=raw.reason,
+                        headers={key.lower(): value for key, value in raw.getheaders()},
+                        body=raw.read(),
+                    )
+                    self._record_quota(parts.netloc, response)
+                    delay = self._retry_delay(response, attempt)
+                    if delay is None or attempt >= self._retries:
+                        raise HttpError(current, raw.status, raw.reason, response.body)
+                    self._sleep(delay)
+                    attempt += 1
+                    continue
+
+                if received and (
+                    raw.status == 200
+                    or _content_range_start(raw.getheader("content-range")) != received
+                ):
+                    sink.restart()
+                    received = 0
+                    if raw.status == 206:
+                        # Faixa inesperada: descarta e pede o arquivo inteiro.
+                        raw.read()
+                        continue
+
+                while True:
+                    chunk = raw.read(chunk_size)
+                    if not chunk:
+                        break
+                    sink.write(chunk)
+                    received += len(chunk)
+                if raw.length:
+                    # read(amt) nao acusa corpo curto; `length` e o que faltou.
+                    raise http.client.IncompleteRead(b"", raw.length)
+            except _TRANSIENT_ERRORS:
+                self._drop_connection(parts.scheme, parts.netloc)
+                if attempt >= self._retries:
+                    raise
+                self._sleep(self._backoff_seconds * (2 ** attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self._drop_connection(parts.scheme, parts.netloc)
+                raise
+
+            if raw.will_close:
+                self._drop_connection(parts.scheme, parts.netloc)
+            return received
+
+    def _request_with_retries(self, url: str, headers: dict[str, str]) -> HttpResponse:
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            self._wait_for_quota(host)
+            try:
+                response = self._send(url, headers)
+            except _TRANSIENT_ERRORS:
+                if attempt >= self._retries:
+                    raise
+                self._sleep(self._backoff_seconds * (2 ** attempt))
+                attempt += 1
+                continue
+
+            self._record_quota(host, response)
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt >= self._retries:
+                return response
+            self._sleep(delay)
+            attempt += 1
+
+    def _retry_delay(self, response: HttpResponse, attempt: int) -> float | None:
+        if response.status >= 500:
+            return self._backoff_seconds * (2 ** attempt)
+        if response.status not in (403, 429):
+            return None
+
+        retry_after = _parse_retry_after(response.header("retry-after"), self._clock())
+        if retry_after is not None:
+            delay = retry_after
+        elif response.header("x-ratelimit-remaining") == "0":
+            reset = _parse_int(response.header("x-ratelimit-reset"))
+            if reset is None:
+                return None
+            delay = max(0.0, reset - self._clock()) + 1.0
+        else:
+            # 403 sem sinal de rate limit e permissao negada: nao insiste.
+            return None
+
+        if delay > self._max_wait_seconds:
+            raise RateLimitError(
+                response.url,
+                response.status,
+                f"rate limited for {delay:.0f}s (max wait {self._max_wait_seconds:.0f}s)",
+                response.body,
+            )
+        return delay
+
+    def _wait_for_quota(self, host: str) -> None:
+        with self._lock:
+            quota = self._quotas.setdefault(host, _Quota())
+            now = self._clock()
+            wait = max(0.0, quota.blocked_until - now)
+            window_exhausted = (
+                quota.remaining is not None
+                and quota.remaining <= self._min_remaining
+                and quota.reset_at is not None
+                and quota.reset_at > now
+            )
+            if window_exhausted:
+                wait = max(wait, quota.reset_at - now + 1.0)
+            if wait > self._max_wait_seconds:
+                raise RateLimitError(
+                    host,
+                    403,
+                    f"quota exhausted for {wait:.0f}s (max wait {self._max_wait_seconds:.0f}s)",
+                )
+            if wait > 0:
+                # Demais threads esperam a mesma janela em vez de disparar.
+                quota.blocked_until = now + wait
+                quota.remaining = None
+            elif quota.remaining is not None:
+                # Reserva a requisicao antes de enviar para threads paralelas
+                # nao ultrapassarem a cota juntas.
+                quota.remaining -= 1
+        if wait > 0:
+            self._sleep(wait)
+
+    def _record_quota(self, host: str, response: HttpResponse) -> None:
+        remaining = _parse_int(response.header("x-ratelimit-remaining"))
+        reset = _parse_int(response.header("x-ratelimit-reset"))
+        if remaining is None and reset is None:
+            return
+        with self._lock:
+            quota = self._quotas.setdefault(host, _Quota())
+            if remaining is not None:
+                quota.remaining = remaining
+            if reset is not None:
+                quota.reset_at = float(reset)
+
+    def _connection(self, scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+        """Return this thread's connection to `netloc` and whether it is reused."""
+        pool: dict[tuple[str, str], http.client.HTTPConnection] | None = getattr(
+            self._local, "connections", None,
+        )
+        if pool is None:
+            pool = {}
+            self._local.connections = pool
+        key = (scheme, netloc)
+        connection = pool.get(key)
+        if connection is not None:
+            return connection, True
+
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(netloc, timeout=self._timeout)
+        elif scheme == "http":
+            connection = http.client.HTTPConnection(netloc, timeout=self._timeout)
+        else:
+            raise ValueError(f"unsupported URL scheme: {scheme}")
+        pool[key] = connection
+        with self._lock:
+            self._connections.append(connection)
+            self.connection_count += 1
+        return connection, False
+
+    def _drop_connection(self, scheme: str, netloc: str) -> None:
+        pool = getattr(self._local, "connections", {})
+        connection = pool.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def _send(self, url: str, headers: dict[str, str]) -> HttpResponse:
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        while True:
+            connection, reused = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", target, headers=headers)
+                raw = connection.getresponse()
+                body = raw.read()
+            except _STALE_CONNECTION_ERRORS:
+                self._drop_connection(parts.scheme, parts.netloc)
+                if reused:
+                    # Servidor fechou a conexao ociosa; tenta de novo numa
+                    # conexao nova sem gastar uma tentativa de retry.
+                    continue
+                raise
+            except BaseException:
+                self._drop_connection(parts.scheme, parts.netloc)
+                raise
+            break
+
+        with self._lock:
+            self.request_count += 1
+        if raw.will_close:
+            self._drop_connection(parts.scheme, parts.netloc)
+        return HttpResponse(
+            url=url,
+            status=raw.status,
+            reason=raw.reason,
+            headers={key.lower(): value for key, value in raw.getheaders()},
+            body=body,
+        )
+
+
+def _parse_int(value: str | None) -> int | None:
+    if value is None:
+        return None
+    try:
+        return int(value.strip())
+    except ValueError:
+        return None
+
+
+def _content_range_start(value: str | None) -> int | None:
+    """Start offset of `Content-Range: bytes START-END/TOTAL`."""
+    if not value or not value.startswith("bytes "):
+        return None
+    return _parse_int(value[len("bytes ") :].split("-", 1)[0])
+
+
+def _parse_retry_after(value: str | None, now: float) -> float | None:
+    """`Retry-After` as seconds: either delta-seconds or an HTTP-date."""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
@@ -1,38 +1,131 @@
 #!/usr/bin/env python3
-"""Wrapper for scripts/parse_ftp_metrics.dart."""
+"""FTP metrics from server logs.
+
+Runs the streaming Python engine (`scripts/ftp_metrics.py`) by default;
+`--engine dart` shells out to `scripts/parse_ftp_metrics.dart` instead.
+Both print the same summary and write the same export to the project root.
+`--since`/`--until` go to either engine; the Python one seeks straight to
+the window in each log instead of reading it whole, so event lines without
+a timestamp just outside the window (which Dart keeps) are left out and
+the counts can differ from the Dart engine. `--percentiles` and
+`--buckets csv|json|sqlite` (Python engine only) add p50/p90/p99 of hash
+time, upload duration and MB/s, per hour and remote directory.
+"""
 
 from __future__ import annotations
 
 import argparse
+import os
 import subprocess
+import sys
 from pathlib import Path
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from ftp_metrics import (  # noqa: E402
+    add_incremental_arguments,
+    add_percentile_arguments,
+    add_window_arguments,
+    parse_window,
+    run_incremental,
+    run_metrics,
+)
+
+LOG_PATTERNS = ("*.log", "*.log*.gz")
+
+
+def resolve_log_paths(log_path: str, patterns: tuple[str, ...] = LOG_PATTERNS) -> list[str]:
+    """Files for `--log-path`: a directory expands to its (rotated) logs."""
+    if not log_path:
+        return []
+    target = Path(log_path)
+    if target.is_dir():
+        log_files = sorted({path for pattern in patterns for path in target.glob(pattern)})
+        if log_files:
+            return [str(path) for path in log_files]
+    return [log_path]
 
-def main() -> int:
+
+def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("--log-path", default="", help="Log file or directory with *.log files")
+    parser.add_argument(
+        "--log-path", default="", help="Log file or directory with *.log / *.log*.gz files",
+    )
     parser.add_argument("--export", choices=["csv", "json"], default="", help="Optional export format")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--engine",
+        choices=["python", "dart"],
+        default="python",
+        help="Parser implementation (default: python)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Python engine: files parsed in parallel (default: CPU count; 1 is sequential)",
+    )
+    add_incremental_arguments(parser)
+    add_window_arguments(parser)
+    add_percentile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    window = parse_window(parser, args)
+    if args.percentiles or args.buckets:
+        if args.engine != "python":
+            parser.error("--percentiles/--buckets need the python engine")
+        if args.checkpoint or args.follow:
+            parser.error("--percentiles/--buckets cannot be combined with --checkpoint/--follow")
+    if args.checkpoint or args.follow:
+        if args.engine != "python":
+            parser.error("--checkpoint/--follow need the python engine")
+        if not args.log_path:
+            parser.error("--checkpoint/--follow need --log-path")
+        if args.follow and args.export:
+            parser.error("--follow does not export; run --checkpoint --export for the delta")
+        # Como as exportacoes, o checkpoint relativo fica na raiz do projeto.
+        checkpoint = args.checkpoint
+        if checkpoint is not None and not checkpoint.is_absolute():
+            checkpoint = PROJECT_ROOT / checkpoint
+        # Relistado a cada rodada: logs rotacionados entram sozinhos no --follow.
+        return run_incremental(
+            lambda: [Path(path) for path in resolve_log_paths(args.log_path)],
+            checkpoint,
+            args.export or None,
+            PROJECT_ROOT,
+            jobs=args.jobs,
+            follow=args.follow,
+            interval=args.interval,
+        )
 
-    project_root = Path(__file__).resolve().parents[1]
-    command = ["dart", "run", "scripts/parse_ftp_metrics.dart"]
+    if args.engine == "python":
+        log_files = resolve_log_paths(args.log_path)
+        return run_metrics(
+            [Path(path) for path in log_files],
+            args.export or None,
+            PROJECT_ROOT,
+            jobs=args.jobs,
+            window=window,
+            percentiles=args.percentiles,
+            buckets=args.buckets,
+        )
 
+    # O parser Dart nao le .gz.
+    log_files = resolve_log_paths(args.log_path, ("*.log",))
+    command = ["dart", "run", "scripts/parse_ftp_metrics.dart"]
     if args.export:
         command.extend(["--export", args.export])
-
-    if args.log_path:
-        target = Path(args.log_path)
-        if target.exists() and target.is_dir():
-            log_files = sorted(target.glob("*.log"))
-            if log_files:
-                command.extend(str(path) for path in log_files)
-            else:
-                command.append(args.log_path)
-        else:
-            command.append(args.log_path)
+    for flag in ("since", "until"):
+        if getattr(args, flag):
+            command.extend([f"--{flag}", getattr(args, flag)])
+    command.extend(log_files)
 
     try:
-        return subprocess.run(command, cwd=project_root, check=False).returncode
+        return subprocess.run(command, cwd=PROJECT_ROOT, check=False).returncode
     except FileNotFoundError as exc:
         print(f"ERROR: {exc}")
         return 127
@@ -1,14 +1,60 @@
 #!/usr/bin/env python3
-"""Scan repository for common UTF-8 / mojibake encoding issues."""
+"""Scan repository for common UTF-8 / mojibake encoding issues.
+
+Files are scanned on a process pool (`--jobs`, default: CPU count) in
+batches of `--batch-size`; per-file results are printed in sorted path
+order as they arrive, so output and exit code match a sequential run.
+
+Results are cached per file (`--cache`, default
+`build/cache/scan_encoding.json`) keyed by size + `mtime_ns`, with a
+SHA-256 of the content as fallback when only the mtime moved; unchanged
+files reuse their previous issue list. `--staged`, `--changed-since REF`
+and `--paths` restrict the scan to a delta for pre-commit and PR jobs.
+
+Unknown binaries are skipped by sniffing the first KiBs; files from
+`MMAP_THRESHOLD` up are scanned through `mmap` with flat memory.
+
+Usage:
+    python scripts/scan_encoding.py
+    python scripts/scan_encoding.py --staged
+    python scripts/scan_encoding.py --changed-since origin/main
+    python scripts/scan_encoding.py --paths lib/main.dart scripts
+"""
 
 from __future__ import annotations
 
+import argparse
+import codecs
+import hashlib
+import json
+import mmap
+import os
 import re
+import subprocess
 import sys
+from bisect import bisect_left, bisect_right
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import BinaryIO, Iterator, Sequence
 
 ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_CACHE_PATH = "build/cache/scan_encoding.json"
+CACHE_SCHEMA_VERSION = 1
+# Deteccao de binario por conteudo: NUL ou mais de 30% de bytes de controle
+# nos primeiros 8 KiB (heuristica do `file`/grep).
+SNIFF_BYTES = 8 * 1024
+BINARY_CONTROL_RATIO = 0.30
+_TEXT_BYTES = bytes({7, 8, 9, 10, 11, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+UTF8_BOM = b"\xef\xbb\xbf"
+_UTF16_BOMS = (b"\xff\xfe", b"\xfe\xff")
+# A partir daqui o arquivo e lido via mmap, em pedacos de CHUNK_BYTES.
+MMAP_THRESHOLD = 4 * 1024 * 1024
+CHUNK_BYTES = 1024 * 1024
+MAX_ISSUES_SHOWN = 8
+FAILING_KINDS = ("invalid_utf8", "mojibake", "unicode_replacement")
 SKIP_DIRS = {
     ".git",
     ".dart_tool",
@@ -77,24 +123,329 @@ MOJIBAKE_PATTERNS: list[tuple[str, str]] = [
 ]
 
 
+# Entradas de um segmento valem em qualquer nivel; as de varios segmentos
+# sao prefixos relativos a raiz do repositorio.
+_SKIP_DIR_NAMES = frozenset(entry for entry in SKIP_DIRS if "/" not in entry)
+_SKIP_DIR_PREFIXES = tuple(
+    tuple(entry.split("/")) for entry in sorted(SKIP_DIRS) if "/" in entry
+)
+
+
+def _is_skipped_dir(parts: tuple[str, ...]) -> bool:
+    """`parts` is a directory path relative to the root."""
+    if parts and parts[-1] in _SKIP_DIR_NAMES:
+        return True
+    return any(parts[: len(prefix)] == prefix for prefix in _SKIP_DIR_PREFIXES)
+
+
 def should_scan(path: Path) -> bool:
+    """`path` is relative to the root."""
     if path.name in SKIP_FILES:
         return False
     if path.suffix.lower() in SKIP_EXT:
         return False
-    if SKIP_DIRS & set(path.parts):
+    parts = path.parts[:-1]
+    if _SKIP_DIR_NAMES.intersection(parts):
         return False
-    return True
+    return not any(parts[: len(prefix)] == prefix for prefix in _SKIP_DIR_PREFIXES)
 
 
-def scan_file(path: Path) -> list[tuple[str, str]]:
-    issues: list[tuple[str, str]] = []
-    try:
-        raw = path.read_bytes()
-    except OSError as exc:
-        return [("read_error", str(exc))]
+def _gitignore_regex(pattern: str) -> str:
+    """Regex body for one `.gitignore` glob (`*`, `?`, `[...]`, `**`)."""
+    out: list[str] = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            out.append("(?:.*/)?")
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            out.append(".*")
+            index += 2
+            continue
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            close = pattern.find("]", index + 2)
+            if close == -1:
+                out.append(re.escape(char))
+            else:
+                body = pattern[index + 1 : close]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                index = close
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            out.append(re.escape(pattern[index]))
+        else:
+            out.append(re.escape(char))
+        index += 1
+    return "".join(out)
+
+
+class GitIgnore:
+    """Rules of one `.gitignore`, matched against paths relative to its dir.
+
+    Covers the usual syntax: comments, `!` negation, trailing `/` for
+    directories, anchoring by a leading or inner `/`, and `*`/`?`/`[]`/`**`.
+    The last matching rule wins.
+    """
+
+    def __init__(self, lines: Sequence[str]) -> None:
+        self.rules: list[tuple[re.Pattern[str], bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip("\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            line = line.rstrip(" ")
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            body = _gitignore_regex(line.lstrip("/"))
+            regex = re.compile(body if anchored else f"(?:.*/)?{body}")
+            self.rules.append((regex, negate, dir_only))
+
+    @classmethod
+    def load(cls, path: Path) -> "GitIgnore | None":
+        try:
+            lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+        except OSError:
+            return None
+        ignore = cls(lines)
+        return ignore if ignore.rules else None
+
+    def match(self, rel: str, is_dir: bool) -> bool | None:
+        """True ignored, False re-included by `!`, None when no rule matches."""
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(rel):
+                result = not negate
+        return result
+
+
+def _is_ignored(
+    ignores: Sequence[tuple[tuple[str, ...], GitIgnore]],
+    parts: tuple[str, ...],
+    is_dir: bool,
+) -> bool:
+    ignored = False
+    for base, ignore in ignores:
+        verdict = ignore.match("/".join(parts[len(base) :]), is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
+
+
+def walk_files(
+    root: Path,
+    start: Path | None = None,
+    *,
+    gitignore: bool = True,
+) -> Iterator[tuple[tuple[str, ...], os.DirEntry]]:
+    """Yield `(relative parts, DirEntry)` for every scannable file.
+
+    Skipped and ignored directories are pruned before `os.scandir` enters
+    them; type checks come from the directory read (`DirEntry`) and
+    `DirEntry.stat()` is cached for the cache lookup later on. Directory
+    symlinks are not followed.
+    """
+    start = start or root
+    base_parts = start.relative_to(root).parts
+    ignores: list[tuple[tuple[str, ...], GitIgnore]] = []
+    if gitignore:
+        for depth in range(len(base_parts) + 1):
+            ignore = GitIgnore.load(root.joinpath(*base_parts[:depth], ".gitignore"))
+            if ignore is not None:
+                ignores.append((base_parts[:depth], ignore))
+
+    def walk(directory: str, parts: tuple[str, ...], depth_ignores: list) -> Iterator:
+        try:
+            with os.scandir(directory) as iterator:
+                entries = list(iterator)
+        except OSError:
+            return
+        local = depth_ignores
+        if gitignore and parts != base_parts and any(e.name == ".gitignore" for e in entries):
+            ignore = GitIgnore.load(Path(directory, ".gitignore"))
+            if ignore is not None:
+                local = [*depth_ignores, (parts, ignore)]
+        for entry in entries:
+            entry_parts = (*parts, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if _is_skipped_dir(entry_parts) or (
+                        local and _is_ignored(local, entry_parts, True)
+                    ):
+                        continue
+                    yield from walk(entry.path, entry_parts, local)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if entry.name in SKIP_FILES or os.path.splitext(entry.name)[1].lower() in SKIP_EXT:
+                continue
+            if local and _is_ignored(local, entry_parts, False):
+                continue
+            yield entry_parts, entry
+
+    if _is_skipped_dir(base_parts) and base_parts:
+        return
+    yield from walk(str(start), base_parts, ignores)
+
+
+# Uma unica varredura: todos os padroes viram grupos nomeados de uma so
+# alternancia, testada com `match` em cada posicao candidata, entao hits
+# que comecam dentro de outro match tambem aparecem (como N `finditer`).
+# Os padroes comecam por caracteres distintos: no maximo um grupo casa por
+# posicao. Todo hit contem um caractere de `_ANCHOR_CHARS`, raro em texto
+# limpo; so as posicoes ate `_ANCHOR_LOOKBACK` antes de cada ancora sao
+# candidatas, e a busca das ancoras e um unico charset rodando em C.
+_C1_GROUP = "c1"
+_FFFD_GROUP = "fffd"
+_ANCHOR_CHARS = "\u00c3\u00e2\u00ef\ufffd" + "".join(map(chr, range(0x80, 0xA0)))
+_ANCHOR = re.compile(f"[{re.escape(_ANCHOR_CHARS)}]")
+_ANCHOR_BYTES = re.compile(
+    b"|".join(re.escape(char.encode("utf-8")) for char in _ANCHOR_CHARS[:4])
+    + rb"|\xc2[\x80-\x9f]"
+)
+_ANCHOR_LOOKBACK = max(
+    min(index for index, char in enumerate(alternative) if char in _ANCHOR_CHARS)
+    for pattern, _desc in MOJIBAKE_PATTERNS
+    for alternative in pattern.split("|")
+)
+_MATCHER = re.compile(
+    "|".join(
+        [f"(?P<p{index}>{pattern})" for index, (pattern, _desc) in enumerate(MOJIBAKE_PATTERNS)]
+        + [rf"(?P<{_FFFD_GROUP}>\ufffd)", rf"(?P<{_C1_GROUP}>[\x80-\x9f])"]
+    )
+)
+
 
-    if raw.startswith(b"\xef\xbb\xbf"):
+def _iter_hits(text: str) -> Iterator[tuple[str, int, int]]:
+    """`(group, start, end)` for every position where a pattern starts."""
+    match_at = _MATCHER.match
+    checked = 0
+    for anchor in _ANCHOR.finditer(text):
+        position = anchor.start()
+        for start in range(max(checked, position - _ANCHOR_LOOKBACK), position + 1):
+            match = match_at(text, start)
+            if match is not None:
+                yield match.lastgroup, start, match.end()
+        checked = position + 1
+
+
+class _LineIndex:
+    """Offset tables built lazily, only for files that have hits."""
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._lines: list[str] | None = None
+        self._newlines: list[int] | None = None
+        self._line_starts: list[int] | None = None
+
+    @property
+    def lines(self) -> list[str]:
+        if self._lines is None:
+            self._lines = self._text.splitlines()
+        return self._lines
+
+    def newline_count_before(self, offset: int) -> int:
+        """`text[:offset].count("\\n")` via bisect."""
+        if self._newlines is None:
+            text = self._text
+            newlines: list[int] = []
+            index = text.find("\n")
+            while index != -1:
+                newlines.append(index)
+                index = text.find("\n", index + 1)
+            self._newlines = newlines
+        return bisect_left(self._newlines, offset)
+
+    def splitline_at(self, offset: int) -> int | None:
+        """Index in `lines` holding `offset`, None if it is a line break."""
+        if self._line_starts is None:
+            starts = [0]
+            for chunk in self._text.splitlines(keepends=True):
+                starts.append(starts[-1] + len(chunk))
+            self._line_starts = starts
+        index = bisect_right(self._line_starts, offset) - 1
+        if offset >= self._line_starts[index] + len(self.lines[index]):
+            return None
+        return index
+
+
+# hit = (inicio, fim, numero da linha, texto da linha); inicio/fim so
+# precisam ser comparaveis dentro do mesmo grupo.
+_Hit = tuple[int, int, int, str]
+
+
+def _hit_issues(
+    hits: dict[str, list[_Hit]],
+) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """Issues before `mixed_eol` and the `c1_control` ones that go after it."""
+
+    def per_line(group: str) -> list[tuple[int, str]]:
+        found: list[tuple[int, str]] = []
+        for _start, _end, line_no, line in hits.get(group, ()):
+            if not found or found[-1][0] != line_no:
+                found.append((line_no, line))
+        return found
+
+    issues = [
+        ("unicode_replacement", f"line {line_no}: {line[:120]}")
+        for line_no, line in per_line(_FFFD_GROUP)
+    ]
+    for pattern_index, (_pattern, desc) in enumerate(MOJIBAKE_PATTERNS):
+        # Sem sobreposicao dentro do mesmo padrao, como `re.finditer`.
+        last_end = 0
+        for start, end, line_no, line in hits.get(f"p{pattern_index}", ()):
+            if start < last_end:
+                continue
+            last_end = end
+            issues.append(("mojibake", f"{desc} line {line_no}: {line.strip()[:100]}"))
+    c1_issues = [
+        ("c1_control", f"line {line_no}: {line[:80]}")
+        for line_no, line in per_line(_C1_GROUP)
+    ]
+    return issues, c1_issues
+
+
+def _text_issues(text: str) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """Replacement-char, mojibake and C1 issues of decoded `text`."""
+    index: _LineIndex | None = None
+    hits: dict[str, list[_Hit]] = {}
+    for group, start, end in _iter_hits(text):
+        index = index or _LineIndex(text)
+        lines = index.lines
+        if group in (_FFFD_GROUP, _C1_GROUP):
+            line = index.splitline_at(start)
+            if line is None:
+                continue
+            line_no, line_text = line + 1, lines[line]
+        else:
+            line_no = index.newline_count_before(start) + 1
+            line_text = lines[line_no - 1] if line_no <= len(lines) else ""
+        hits.setdefault(group, []).append((start, end, line_no, line_text))
+    return _hit_issues(hits)
+
+
+def scan_bytes(raw: bytes) -> list[tuple[str, str]]:
+    issues: list[tuple[str, str]] = []
+    if raw.startswith(UTF8_BOM):
         issues.append(("utf8_bom", "UTF-8 BOM at start of file"))
 
     try:
@@ -103,60 +454,482 @@ def scan_file(path: Path) -> list[tuple[str, str]]:
         issues.append(("invalid_utf8", str(exc)))
         return issues
 
-    lines = text.splitlines()
-    if "\ufffd" in text:
-        for i, line in enumerate(lines, 1):
-            if "\ufffd" in line:
-                issues.append(("unicode_replacement", f"line {i}: {line[:120]}"))
-
-    for pattern, desc in MOJIBAKE_PATTERNS:
-        for match in re.finditer(pattern, text):
-            line_no = text[: match.start()].count("\n") + 1
-            snippet = lines[line_no - 1].strip()[:100] if line_no <= len(lines) else ""
-            issues.append(("mojibake", f"{desc} line {line_no}: {snippet}"))
+    text_issues, c1_issues = _text_issues(text)
+    issues.extend(text_issues)
 
     if b"\r\n" in raw:
-        lone_lf = raw.replace(b"\r\n", b"").count(b"\n")
+        lone_lf = raw.count(b"\n") - raw.count(b"\r\n")
         if lone_lf > 0:
             issues.append(("mixed_eol", f"CRLF + {lone_lf} lone LF byte(s)"))
 
-    for i, line in enumerate(lines, 1):
-        if re.search(r"[\x80-\x9f]", line):
-            issues.append(("c1_control", f"line {i}: {line[:80]}"))
+    issues.extend(c1_issues)
+    return issues
+
+
+def looks_binary(head: bytes) -> bool:
+    """Content sniff on the first `SNIFF_BYTES`: NUL or too many control bytes.
+
+    UTF-16/32 text (BOM) is not binary: it must still fail as invalid UTF-8.
+    """
+    if not head or head.startswith(_UTF16_BOMS):
+        return False
+    if b"\0" in head:
+        return True
+    return len(head.translate(None, _TEXT_BYTES)) / len(head) > BINARY_CONTROL_RATIO
+
+
+def _iter_chunks(mapped: mmap.mmap, size: int) -> Iterator[tuple[int, bytes]]:
+    for offset in range(0, size, CHUNK_BYTES):
+        yield offset, mapped[offset : offset + CHUNK_BYTES]
+
+
+def _utf8_error(mapped: mmap.mmap, size: int) -> str | None:
+    """Same message as `bytes.decode`, validating chunk by chunk."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for offset, chunk in _iter_chunks(mapped, size):
+        try:
+            decoder.decode(chunk, final=offset + len(chunk) >= size)
+        except UnicodeDecodeError as exc:
+            # Posicoes do erro sao relativas ao chunk + bytes pendentes.
+            pending = len(exc.object) - len(chunk)
+            start = offset - pending + exc.start
+            end = offset - pending + exc.end
+            if end - start == 1:
+                return (
+                    f"'utf-8' codec can't decode byte 0x{exc.object[exc.start]:02x} "
+                    f"in position {start}: {exc.reason}"
+                )
+            return f"'utf-8' codec can't decode bytes in position {start}-{end - 1}: {exc.reason}"
+    return None
+
+
+def _scan_mapped(mapped: mmap.mmap, size: int) -> list[tuple[str, str]]:
+    """`scan_bytes` for large files without materialising them.
+
+    The anchor characters of every hit are searched as UTF-8 byte
+    sequences straight on the map; only the lines holding one are decoded
+    and matched. Lines here are `\\n`-delimited (CRLF stripped).
+    """
+    issues: list[tuple[str, str]] = []
+    if mapped[:3] == UTF8_BOM:
+        issues.append(("utf8_bom", "UTF-8 BOM at start of file"))
+    error = _utf8_error(mapped, size)
+    if error is not None:
+        issues.append(("invalid_utf8", error))
+        return issues
+
+    hits: dict[str, list[_Hit]] = {}
+    line_no = 1
+    counted_to = 0
+    position = 0
+    while True:
+        anchor = _ANCHOR_BYTES.search(mapped, position)
+        if anchor is None:
+            break
+        line_start = mapped.rfind(b"\n", 0, anchor.start()) + 1
+        line_end = mapped.find(b"\n", anchor.end())
+        line_end = size if line_end == -1 else line_end
+        for offset in range(counted_to, line_start, CHUNK_BYTES):
+            line_no += mapped[offset : min(offset + CHUNK_BYTES, line_start)].count(b"\n")
+        counted_to = line_start
+        line = mapped[line_start:line_end].decode("utf-8")
+        if line.endswith("\r"):
+            line = line[:-1]
+        for group, start, end in _iter_hits(line):
+            if group == _C1_GROUP and line[start] == "\x85":
+                # NEL quebra linha em `str.splitlines`, como no caminho em memoria.
+                continue
+            hits.setdefault(group, []).append((line_start + start, line_start + end, line_no, line))
+        position = line_end + 1
+    text_issues, c1_issues = _hit_issues(hits)
+    issues.extend(text_issues)
 
+    crlf = lf = 0
+    previous_cr = False
+    for _offset, chunk in _iter_chunks(mapped, size):
+        lf += chunk.count(b"\n")
+        crlf += chunk.count(b"\r\n") + (previous_cr and chunk.startswith(b"\n"))
+        previous_cr = chunk.endswith(b"\r")
+    if crlf and lf - crlf > 0:
+        issues.append(("mixed_eol", f"CRLF + {lf - crlf} lone LF byte(s)"))
+
+    issues.extend(c1_issues)
     return issues
 
 
-def main() -> int:
-    all_issues: dict[str, list[tuple[str, str]]] = {}
-    scanned = 0
+def _scan_open_file(handle: BinaryIO, size: int) -> list[tuple[str, str]]:
+    head = handle.read(SNIFF_BYTES)
+    if looks_binary(head):
+        return []
+    if size < max(MMAP_THRESHOLD, 1):
+        return scan_bytes(head + handle.read())
+    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return _scan_mapped(mapped, len(mapped))
+
+
+def scan_file(path: Path) -> list[tuple[str, str]]:
+    """Issues of one file; binaries (by content) yield none.
+
+    Files from `MMAP_THRESHOLD` up are scanned through `mmap`, so peak
+    memory does not grow with the file size.
+    """
+    try:
+        with path.open("rb") as handle:
+            return _scan_open_file(handle, os.fstat(handle.fileno()).st_size)
+    except OSError as exc:
+        return [("read_error", str(exc))]
+
+
+def _scanner_fingerprint() -> str:
+    """Hash of this script: editing the rules invalidates cached results."""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+@dataclass
+class ScanCache:
+    """Issue lists per relative path, with the fingerprint they were made for.
+
+    `entries[rel]` = {"size", "mtime_ns", "sha256", "issues"}.
+    """
+
+    entries: dict[str, dict] = field(default_factory=dict)
+    hits: int = 0
+
+    def lookup(self, rel: str, stat: os.stat_result) -> list[tuple[str, str]] | None:
+        entry = self.entries.get(rel)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return None
+        self.hits += 1
+        return [tuple(issue) for issue in entry["issues"]]
+
+    def digest(self, rel: str, stat: os.stat_result) -> str | None:
+        """Content hash to compare against when only the mtime moved."""
+        entry = self.entries.get(rel)
+        if entry is None or entry["size"] != stat.st_size:
+            return None
+        return entry["sha256"]
+
+    def store(
+        self,
+        rel: str,
+        stat: os.stat_result,
+        digest: str,
+        issues: list[tuple[str, str]],
+    ) -> None:
+        self.entries[rel] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "issues": [list(issue) for issue in issues],
+        }
+
+    def retain(self, rels: set[str]) -> None:
+        self.entries = {rel: entry for rel, entry in self.entries.items() if rel in rels}
+
+
+def load_scan_cache(path: Path) -> ScanCache:
+    """Cached results, or an empty cache when missing, unreadable or stale."""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return ScanCache()
+    if (
+        not isinstance(payload, dict)
+        or payload.get("schema_version") != CACHE_SCHEMA_VERSION
+        or payload.get("scanner") != _scanner_fingerprint()
+        or not isinstance(payload.get("files"), dict)
+    ):
+        return ScanCache()
+    return ScanCache(entries=payload["files"])
+
+
+def save_scan_cache(path: Path, cache: ScanCache) -> None:
+    payload = {
+        "schema_version": CACHE_SCHEMA_VERSION,
+        "scanner": _scanner_fingerprint(),
+        "files": cache.entries,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _scan_with_digest(
+    job: tuple[Path, str | None],
+) -> tuple[str, list[tuple[str, str]] | None]:
+    """`(sha256, issues)`; issues is None when the hash matches the cache."""
+    path, cached_digest = job
+    try:
+        with path.open("rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size < MMAP_THRESHOLD:
+                raw = handle.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                if digest == cached_digest:
+                    return digest, None
+                head = raw[:SNIFF_BYTES]
+                return digest, [] if looks_binary(head) else scan_bytes(raw)
+            hasher = hashlib.sha256()
+            for chunk in iter(lambda: handle.read(CHUNK_BYTES), b""):
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+            if digest == cached_digest:
+                return digest, None
+            handle.seek(0)
+            return digest, _scan_open_file(handle, size)
+    except OSError as exc:
+        return "", [("read_error", str(exc))]
 
-    for path in ROOT.rglob("*"):
-        if not path.is_file() or not should_scan(path):
+
+def collect_entries(
+    root: Path,
+    start: Path | None = None,
+    *,
+    gitignore: bool = True,
+) -> list[os.DirEntry]:
+    """`walk_files` entries sorted by relative path."""
+    found = sorted(
+        walk_files(root, start, gitignore=gitignore), key=lambda item: "/".join(item[0]),
+    )
+    return [entry for _parts, entry in found]
+
+
+def collect_paths(root: Path, *, gitignore: bool = True) -> list[Path]:
+    """Files under `root` that pass `should_scan`, sorted by relative path."""
+    return [Path(entry.path) for entry in collect_entries(root, gitignore=gitignore)]
+
+
+def _git_lines(root: Path, *args: str) -> list[str]:
+    try:
+        completed = subprocess.run(
+            ["git", *args],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            check=False,
+        )
+    except FileNotFoundError as exc:
+        raise RuntimeError(f"git not available: {exc}") from None
+    if completed.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {completed.stderr.strip()}")
+    return [line for line in completed.stdout.split("\0" if "-z" in args else "\n") if line]
+
+
+def staged_paths(root: Path) -> list[str]:
+    """Files added/copied/modified/renamed in the index (like the icon hook)."""
+    return _git_lines(root, "diff", "--cached", "--name-only", "--diff-filter=ACMRT", "-z")
+
+
+def changed_since_paths(root: Path, ref: str) -> list[str]:
+    """Files changed between the merge-base with `ref` and the working tree."""
+    (base,) = _git_lines(root, "merge-base", ref, "HEAD")
+    return _git_lines(root, "diff", "--name-only", "--diff-filter=ACMRT", "-z", base)
+
+
+def select_paths(
+    root: Path,
+    candidates: Sequence[str],
+    *,
+    gitignore: bool = True,
+) -> list[Path]:
+    """Existing scannable files among `candidates` (directories expanded)."""
+    selected: set[Path] = set()
+    for candidate in candidates:
+        path = Path(candidate)
+        path = (path if path.is_absolute() else root / path).resolve()
+        try:
+            rel = path.relative_to(root)
+        except ValueError:
+            raise RuntimeError(f"{candidate} is outside {root}") from None
+        if path.is_dir():
+            selected.update(Path(entry.path) for _parts, entry in walk_files(root, path, gitignore=gitignore))
+        elif path.is_file() and should_scan(rel):
+            selected.add(path)
+    return sorted(selected, key=lambda path: path.relative_to(root).as_posix())
+
+
+def iter_scan_results(
+    items: Sequence[Path | os.DirEntry],
+    *,
+    jobs: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    cache: ScanCache | None = None,
+    root: Path | None = None,
+) -> Iterator[tuple[Path, list[tuple[str, str]]]]:
+    """Yield `(path, issues)` in the order of `items`.
+
+    With `jobs > 1` the files go to a process pool in chunks of
+    `batch_size`; `Executor.map` keeps input order, so results stream back
+    deterministically while later batches are still being scanned. With a
+    `cache` (keys relative to `root`) files whose size and mtime match are
+    answered without reading them, and the rest only re-scanned when their
+    SHA-256 changed. `DirEntry` items (from `walk_files`) reuse the stat of
+    the directory read instead of issuing a new one.
+    """
+    paths = [item if isinstance(item, Path) else Path(item.path) for item in items]
+    if cache is None:
+        if jobs <= 1 or len(paths) <= batch_size:
+            for path in paths:
+                yield path, scan_file(path)
+            return
+        workers = min(jobs, -(-len(paths) // batch_size))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from zip(paths, executor.map(scan_file, paths, chunksize=batch_size))
+        return
+
+    root = root or ROOT
+    # (path, rel, stat, issues do cache ou None = precisa de worker)
+    plan: list[tuple[Path, str, os.stat_result | None, list[tuple[str, str]] | None]] = []
+    jobs_args: list[tuple[Path, str | None]] = []
+    for item, path in zip(items, paths):
+        rel = path.relative_to(root).as_posix()
+        try:
+            stat = item.stat()
+        except OSError as exc:
+            plan.append((path, rel, None, [("read_error", str(exc))]))
             continue
-        scanned += 1
-        issues = scan_file(path)
-        if issues:
-            rel = path.relative_to(ROOT).as_posix()
-            all_issues[rel] = issues
-
-    print(f"Scanned {scanned} files under {ROOT}")
-    print(f"Issues in {len(all_issues)} file(s)\n")
-
-    for fp in sorted(all_issues):
-        print(f"=== {fp} ===")
-        for kind, msg in all_issues[fp][:8]:
+        cached = cache.lookup(rel, stat)
+        plan.append((path, rel, stat, cached))
+        if cached is None:
+            jobs_args.append((path, cache.digest(rel, stat)))
+
+    if jobs <= 1 or len(jobs_args) <= batch_size:
+        executor = None
+        scanned: Iterator = map(_scan_with_digest, jobs_args)
+    else:
+        workers = min(jobs, -(-len(jobs_args) // batch_size))
+        executor = ProcessPoolExecutor(max_workers=workers)
+        scanned = executor.map(_scan_with_digest, jobs_args, chunksize=batch_size)
+    try:
+        for path, rel, stat, issues in plan:
+            if issues is None:
+                digest, issues = next(scanned)
+                if issues is None:
+                    cache.hits += 1
+                    issues = [tuple(issue) for issue in cache.entries[rel]["issues"]]
+                if digest and stat is not None:
+                    cache.store(rel, stat, digest, issues)
+            yield path, issues
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=ROOT,
+        help="Directory to scan (default: repository root)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: CPU count; 1 scans sequentially)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Files sent to a worker per batch (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Also scan files matched by .gitignore (SKIP_DIRS still apply).",
+    )
+    parser.add_argument(
+        "--cache",
+        default=os.environ.get("SCAN_ENCODING_CACHE", DEFAULT_CACHE_PATH),
+        help=(
+            "Per-file result cache, relative to --root "
+            f"(default: $SCAN_ENCODING_CACHE or {DEFAULT_CACHE_PATH})"
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the result cache.",
+    )
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument(
+        "--staged",
+        action="store_true",
+        help="Scan only files staged in git (working-tree copy).",
+    )
+    selection.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Scan only files changed since the merge-base with REF (e.g. origin/main).",
+    )
+    selection.add_argument(
+        "--paths",
+        nargs="+",
+        metavar="PATH",
+        help="Scan only these files/directories.",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be >= 1")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    root = args.root.resolve()
+    try:
+        if args.staged:
+            paths = select_paths(root, staged_paths(root))
+        elif args.changed_since:
+            paths = select_paths(root, changed_since_paths(root, args.changed_since))
+        elif args.paths:
+            paths = select_paths(root, args.paths, gitignore=not args.no_gitignore)
+        else:
+            paths = collect_entries(root, gitignore=not args.no_gitignore)
+    except RuntimeError as error:
+        print(f"ERROR: {error}", file=sys.stderr)
+        return 1
+
+    cache_path = root / args.cache if args.cache and not args.no_cache else None
+    cache = load_scan_cache(cache_path) if cache_path is not None else None
+
+    print(f"Scanned {len(paths)} files under {root}\n")
+
+    counter: Counter[str] = Counter()
+    files_with_issues = 0
+    for path, issues in iter_scan_results(
+        paths, jobs=args.jobs, batch_size=args.batch_size, cache=cache, root=root,
+    ):
+        if not issues:
+            continue
+        files_with_issues += 1
+        counter.update(kind for kind, _ in issues)
+        print(f"=== {path.relative_to(root).as_posix()} ===")
+        for kind, msg in issues[:MAX_ISSUES_SHOWN]:
             print(f"  [{kind}] {msg}")
-        extra = len(all_issues[fp]) - 8
+        extra = len(issues) - MAX_ISSUES_SHOWN
         if extra > 0:
             print(f"  ... +{extra} more")
         print()
 
-    counter: Counter[str] = Counter()
-    for issues in all_issues.values():
-        for kind, _ in issues:
-            counter[kind] += 1
+    if cache is not None:
+        if not (args.staged or args.changed_since or args.paths):
+            # Varredura completa: descarta arquivos removidos/ignorados.
+            cache.retain({Path(path).relative_to(root).as_posix() for path in paths})
+        try:
+            save_scan_cache(cache_path, cache)
+        except OSError as error:
+            print(f"WARNING: could not write {cache_path}: {error}", file=sys.stderr)
+        print(f"Reused cached results for {cache.hits} of {len(paths)} file(s)")
 
+    print(f"Issues in {files_with_issues} file(s)")
     if counter:
         print("Summary:")
         for kind, count in counter.most_common():
@@ -164,7 +937,7 @@ def main() -> int:
     else:
         print("No encoding issues detected.")
 
-    return 1 if any(k in counter for k in ("invalid_utf8", "mojibake", "unicode_replacement")) else 0
+    return 1 if any(kind in counter for kind in FAILING_KINDS) else 0
 
 
 if __name__ == "__main__":
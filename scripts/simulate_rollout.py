@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""Predict staged-rollout cohorts for `scripts/appcast_policy.json`.
+
+Clients decide whether they take a release with `rolloutPercentage` via
+`AppUpdateDecisionEngine.passesRollout`
+(lib/application/services/auto_update/app_update_decision_engine.dart):
+
+    FNV-1a 32-bit of utf8("{targetVersion}:{machineId.trim()}") % 100 < pct
+
+with `pct` null or >= 100 letting everyone in, `pct <= 0` nobody, and a
+missing/empty machine id always passing. This tool reproduces that rule
+bit for bit over a population of machine ids (a file or N synthetic
+Windows `MachineGuid`s) and reports, per rolled-out version, the cohort
+size and how uniform the 100 hash buckets are. Given an installed-version
+distribution it also replays `AppUpdateDecisionEngine.evaluate` (newest
+release first, skipping versions not newer than the installed one and
+those filtered out by `min_supported_app_version`) to show which update
+every group of machines would actually get.
+
+Hashing is batched and vectorised with the standard library only: each
+batch of ids is packed into one big integer with a 64-bit lane per id, so
+FNV-1a runs as a handful of C-level XOR/multiply/AND operations per byte
+column instead of a Python loop per id.
+
+Usage:
+    python scripts/simulate_rollout.py
+    python scripts/simulate_rollout.py --synthetic 2000000 --rollout 3.5.0=10
+    python scripts/simulate_rollout.py --machine-ids ids.txt --installed 3.4.0=70,3.3.0=30
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from sync_appcast_from_releases import (  # noqa: E402
+    DEFAULT_POLICY_PATH,
+    AppcastPolicy,
+    _normalize_version,
+    _rollout_percentage,
+    load_policy,
+)
+
+FNV_OFFSET = 0x811C9DC5
+FNV_PRIME = 0x01000193
+FNV_MASK = 0xFFFFFFFF
+BUCKETS = 100
+# Bucket reservado para id vazio: passa sempre que pct > 0, igual ao Dart.
+EMPTY_ID_BUCKET = BUCKETS
+DEFAULT_SYNTHETIC_IDS = 1_000_000
+DEFAULT_BATCH_SIZE = 1 << 16
+# Um lane de 64 bits por id: hash (32 bits) * FNV_PRIME (25 bits) nao
+# transborda para o lane vizinho.
+_LANE_BYTES = 8
+_LANE_ONE = b"\x01" + bytes(_LANE_BYTES - 1)
+_SEMVER_PATTERN = re.compile(
+    r"^(\d+)\.(\d+)\.(\d+)(?:-([0-9A-Za-z.-]+))?(?:\+([0-9A-Za-z.-]+))?$"
+)
+
+
+@dataclass(frozen=True)
+class VersionReach:
+    version: str
+    rollout_percentage: int | None
+    machines: int
+    in_cohort: int
+    empty_ids: int
+    histogram: tuple[int, ...]
+    chi_square: float
+    p_value: float
+
+    @property
+    def reach(self) -> float:
+        return self.in_cohort / self.machines if self.machines else 0.0
+
+    @property
+    def max_bucket_deviation(self) -> float:
+        """Largest relative distance of a bucket from the uniform count."""
+        total = sum(self.histogram)
+        if not total:
+            return 0.0
+        expected = total / BUCKETS
+        return max(abs(count - expected) for count in self.histogram) / expected
+
+
+@dataclass(frozen=True)
+class UpdateOutcome:
+    installed_version: str
+    machines: int
+    # versao alvo -> maquinas que recebem essa versao
+    targets: dict[str, int]
+    # Maquinas que atualizariam sem `min_supported_app_version`.
+    blocked_by_min_supported: int
+
+    @property
+    def not_updated(self) -> int:
+        return self.machines - sum(self.targets.values())
+
+
+def fnv1a32(key: str) -> int:
+    """Scalar FNV-1a 32-bit, the reference for the batched implementation."""
+    value = FNV_OFFSET
+    for byte in key.encode("utf-8"):
+        value = ((value ^ byte) * FNV_PRIME) & FNV_MASK
+    return value
+
+
+def passes_rollout(pct: int | None, target_version: str, machine_id: str | None) -> bool:
+    """Python twin of `AppUpdateDecisionEngine.passesRollout`."""
+    if pct is None or pct >= 100:
+        return True
+    if pct <= 0:
+        return False
+    machine = (machine_id or "").strip()
+    if not machine:
+        return True
+    return fnv1a32(f"{target_version}:{machine}") % BUCKETS < pct
+
+
+def _lane_columns(joined: bytes, count: int, width: int) -> list[int]:
+    """Byte column `j` of `count` ids of `width` bytes, one lane per id."""
+    lanes = bytearray(count * _LANE_BYTES)
+    columns: list[int] = []
+    for index in range(width):
+        lanes[0::_LANE_BYTES] = joined[index::width]
+        columns.append(int.from_bytes(lanes, "little"))
+    return columns
+
+
+def _hash_buckets(state: int, columns: list[int], count: int) -> bytes:
+    ones = int.from_bytes(_LANE_ONE * count, "little")
+    mask = ones * FNV_MASK
+    value = state * ones
+    for column in columns:
+        value = ((value ^ column) * FNV_PRIME) & mask
+    lanes = memoryview(value.to_bytes(count * _LANE_BYTES, "little")).cast("Q")
+    return bytes([lane % BUCKETS for lane in lanes])
+
+
+def _groups_by_width(machine_ids: Sequence[str]) -> list[tuple[list[int] | None, bytes, int]]:
+    """Split ids into same-byte-length groups: (indices or None, joined, width)."""
+    if not machine_ids:
+        return []
+    width = len(machine_ids[0])
+    joined = "".join(machine_ids).encode("utf-8")
+    if width and len(joined) == width * len(machine_ids) and all(
+        len(machine) == width for machine in machine_ids
+    ):
+        # Caminho comum: todos ASCII e do mesmo tamanho (MachineGuid).
+        return [(None, joined, width)]
+
+    by_width: dict[int, tuple[list[int], list[bytes]]] = {}
+    for index, machine in enumerate(machine_ids):
+        encoded = machine.encode("utf-8")
+        indices, parts = by_width.setdefault(len(encoded), ([], []))
+        indices.append(index)
+        parts.append(encoded)
+    return [
+        (indices, b"".join(parts), width)
+        for width, (indices, parts) in sorted(by_width.items())
+    ]
+
+
+def rollout_buckets(
+    versions: Sequence[str],
+    machine_ids: Sequence[str],
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict[str, bytes]:
+    """`hash("{version}:{id}") % 100` for every (version, machine) pair.
+
+    Returns one `bytes` per version with a bucket per machine, in the
+    order of `machine_ids` (already trimmed). Empty ids get
+    `EMPTY_ID_BUCKET`. Ids are processed in batches of `batch_size`; the
+    byte columns of a batch are packed once and reused for every version.
+    """
+    # O prefixo "{version}:" e comum a todas as chaves: hash parcial unico.
+    states = {version: fnv1a32(f"{version}:") for version in versions}
+    results = {version: bytearray(len(machine_ids)) for version in versions}
+    for indices, joined, width in _groups_by_width(machine_ids):
+        count = len(joined) // width if width else len(indices or ())
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            if width:
+                columns = _lane_columns(
+                    joined[start * width : (start + size) * width], size, width,
+                )
+            for version in versions:
+                buckets = (
+                    _hash_buckets(states[version], columns, size)
+                    if width
+                    else bytes([EMPTY_ID_BUCKET]) * size
+                )
+                if indices is None:
+                    results[version][start : start + size] = buckets
+                else:
+                    target = results[version]
+                    for index, bucket in zip(indices[start : start + size], buckets):
+                        target[index] = bucket
+    return {version: bytes(buckets) for version, buckets in results.items()}
+
+
+def cohort_mask(buckets: bytes, pct: int | None) -> int:
+    """Machines in the cohort as an int with one 0x01 byte lane per machine."""
+    if pct is None or pct >= 100:
+        table = bytes([1]) * 256
+    elif pct <= 0:
+        table = bytes(256)
+    else:
+        table = bytes(
+            1 if bucket < pct or bucket == EMPTY_ID_BUCKET else 0
+            for bucket in range(256)
+        )
+    return int.from_bytes(buckets.translate(table), "little")
+
+
+def _uniformity(histogram: Sequence[int]) -> tuple[float, float]:
+    """Pearson chi-square against uniform buckets and its p-value (df=99)."""
+    total = sum(histogram)
+    if not total:
+        return 0.0, 1.0
+    expected = total / len(histogram)
+    chi_square = sum((count - expected) ** 2 for count in histogram) / expected
+    # Aproximacao de Wilson-Hilferty; sem scipy no ambiente.
+    dof = len(histogram) - 1
+    z = ((chi_square / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return chi_square, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def version_reach(version: str, pct: int | None, buckets: bytes) -> VersionReach:
+    histogram = tuple(buckets.count(bucket) for bucket in range(BUCKETS))
+    empty_ids = buckets.count(EMPTY_ID_BUCKET)
+    chi_square, p_value = _uniformity(histogram)
+    return VersionReach(
+        version=version,
+        rollout_percentage=pct,
+        machines=len(buckets),
+        in_cohort=cohort_mask(buckets, pct).bit_count(),
+        empty_ids=empty_ids,
+        histogram=histogram,
+        chi_square=chi_square,
+        p_value=p_value,
+    )
+
+
+def _version_key(version: str) -> tuple:
+    """Semver ordering as in pub_semver (build metadata ignored)."""
+    match = _SEMVER_PATTERN.match(version)
+    if match is None:
+        raise RuntimeError(f"Invalid semantic version: {version!r}")
+    major, minor, patch, prerelease = match.group(1, 2, 3, 4)
+    if prerelease is None:
+        pre_key: tuple = (1,)
+    else:
+        pre_key = (
+            0,
+            tuple(
+                (0, int(part), "") if part.isdigit() else (1, 0, part)
+                for part in prerelease.split(".")
+            ),
+        )
+    return (int(major), int(minor), int(patch), pre_key)
+
+
+def simulate_updates(
+    releases: Sequence[str],
+    policy: AppcastPolicy,
+    buckets: dict[str, bytes],
+    installed: Sequence[tuple[str, int, int]],
+) -> list[UpdateOutcome]:
+    """Replay `AppUpdateDecisionEngine.evaluate` for each installed group.
+
+    `installed` holds `(version, start, stop)` slices of the machine list.
+    Every group walks `releases` newest first and takes the first one that
+    is newer, satisfies `min_supported_app_version` and passes rollout.
+    """
+    ordered = sorted(releases, key=_version_key, reverse=True)
+    masks = {
+        version: cohort_mask(buckets[version], _rollout_percentage(policy, version))
+        for version in ordered
+    }
+    min_supported = policy.min_supported_app_version
+    outcomes: list[UpdateOutcome] = []
+    for installed_version, start, stop in installed:
+        machines = stop - start
+        installed_key = _version_key(installed_version)
+        # Mascaras tem um byte por maquina; recorta o slice do grupo.
+        group_bits = machines * 8
+        pending = int.from_bytes(b"\x01" * machines, "little")
+        targets: dict[str, int] = {}
+        for version in ordered:
+            if _version_key(version) <= installed_key:
+                continue
+            taken = pending & (masks[version] >> (start * 8)) & ((1 << group_bits) - 1)
+            if taken:
+                targets[version] = taken.bit_count()
+                pending ^= taken
+        blocked = 0
+        if min_supported is not None and installed_key < _version_key(min_supported):
+            # minSupportedAppVersion vale para todo enclosure do feed.
+            blocked, targets = sum(targets.values()), {}
+        outcomes.append(
+            UpdateOutcome(
+                installed_version=installed_version,
+                machines=machines,
+                targets=targets,
+                blocked_by_min_supported=blocked,
+            )
+        )
+    return outcomes
+
+
+def synthetic_machine_ids(count: int, seed: int) -> list[str]:
+    """Lowercase `MachineGuid`-shaped ids (what the Windows client sends)."""
+    raw = random.Random(seed).randbytes(16 * count).hex()
+    return [
+        f"{raw[i:i + 8]}-{raw[i + 8:i + 12]}-{raw[i + 12:i + 16]}-"
+        f"{raw[i + 16:i + 20]}-{raw[i + 20:i + 32]}"
+        for i in range(0, 32 * count, 32)
+    ]
+
+
+def load_machine_ids(path: Path) -> tuple[list[str], list[str | None]]:
+    """Read `machine_id[,installed_version]` lines; `-` reads stdin."""
+    handle = sys.stdin if str(path) == "-" else path.open(encoding="utf-8")
+    machine_ids: list[str] = []
+    installed: list[str | None] = []
+    try:
+        for line in handle:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            machine, _, version = line.rstrip("\r\n").partition(",")
+            machine_ids.append(machine.strip())
+            installed.append(_normalize_version(version.strip()) if version.strip() else None)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return machine_ids, installed
+
+
+def _parse_assignments(raw: str, option: str) -> dict[str, float]:
+    out: dict[str, float] = {}
+    for item in raw.split(","):
+        if not item.strip():
+            continue
+        version, sep, value = item.partition("=")
+        try:
+            if not sep:
+                raise ValueError
+            out[_normalize_version(version.strip())] = float(value)
+        except ValueError:
+            raise RuntimeError(f"{option} expects VERSION=NUMBER[,...], got {item!r}") from None
+    return out
+
+
+def allocate_installed(
+    count: int,
+    distribution: dict[str, float],
+) -> list[tuple[str, int, int]]:
+    """Contiguous `(version, start, stop)` slices proportional to the weights.
+
+    Uses largest remainder so the slices add up to `count` exactly. The
+    ids are random, so contiguous slices are unbiased samples.
+    """
+    total = sum(distribution.values())
+    if total <= 0:
+        raise RuntimeError("--installed weights must add up to more than zero")
+    shares = [(version, count * weight / total) for version, weight in distribution.items()]
+    sizes = {version: int(share) for version, share in shares}
+    leftover = count - sum(sizes.values())
+    for version, share in sorted(shares, key=lambda item: item[1] - int(item[1]), reverse=True)[
+        :leftover
+    ]:
+        sizes[version] += 1
+    slices: list[tuple[str, int, int]] = []
+    start = 0
+    for version, _weight in shares:
+        slices.append((version, start, start + sizes[version]))
+        start += sizes[version]
+    return slices
+
+
+def _group_by_installed(
+    machine_ids: list[str],
+    installed: list[str | None],
+) -> tuple[list[str], list[tuple[str, int, int]]]:
+    """Reorder ids so each installed version is one contiguous slice.
+
+    Ids without a version go last: they still count for cohort reach but
+    stay out of the update replay.
+    """
+    groups: dict[str, list[str]] = {}
+    unknown: list[str] = []
+    for machine, version in zip(machine_ids, installed):
+        if version is None:
+            unknown.append(machine)
+        else:
+            groups.setdefault(version, []).append(machine)
+    ordered: list[str] = []
+    slices: list[tuple[str, int, int]] = []
+    for version, members in groups.items():
+        slices.append((version, len(ordered), len(ordered) + len(members)))
+        ordered.extend(members)
+    ordered.extend(unknown)
+    return ordered, slices
+
+
+def _apply_overrides(policy: AppcastPolicy, args: argparse.Namespace) -> AppcastPolicy:
+    rollout = dict(policy.rollout_percentages)
+    for version, pct in _parse_assignments(",".join(args.rollout), "--rollout").items():
+        rollout[version] = int(pct)
+    min_supported = policy.min_supported_app_version
+    if args.min_supported is not None:
+        min_supported = (
+            None if args.min_supported.lower() == "none"
+            else _normalize_version(args.min_supported.strip())
+        )
+    return AppcastPolicy(
+        blocked_versions=policy.blocked_versions,
+        min_supported_app_version=min_supported,
+        rollout_percentages=rollout,
+        min_publication_age_minutes=policy.min_publication_age_minutes,
+    )
+
+
+def _print_report(
+    reaches: list[VersionReach],
+    outcomes: list[UpdateOutcome] | None,
+    min_supported: str | None,
+) -> None:
+    for reach in reaches:
+        pct = "-" if reach.rollout_percentage is None else f"{reach.rollout_percentage}%"
+        print(
+            f"{reach.version:<12} rollout={pct:<5} cohort={reach.in_cohort}/"
+            f"{reach.machines} ({reach.reach:.2%})  buckets: chi2={reach.chi_square:.1f} "
+            f"p={reach.p_value:.3f} max_dev={reach.max_bucket_deviation:.1%}"
+            + (f"  empty_ids={reach.empty_ids}" if reach.empty_ids else "")
+        )
+    if outcomes is None:
+        return
+    print(f"\nmin_supported_app_version: {min_supported or '-'}")
+    for outcome in outcomes:
+        parts = [f"{version}={count}" for version, count in outcome.targets.items()]
+        if outcome.blocked_by_min_supported:
+            parts.append(f"blocked_by_min_supported={outcome.blocked_by_min_supported}")
+        parts.append(f"stays={outcome.not_updated}")
+        print(f"installed {outcome.installed_version:<12} n={outcome.machines:<9} " + " ".join(parts))
+
+
+def _report_json(
+    reaches: list[VersionReach],
+    outcomes: list[UpdateOutcome] | None,
+    policy: AppcastPolicy,
+) -> dict:
+    return {
+        "min_supported_app_version": policy.min_supported_app_version,
+        "versions": [
+            {
+                "version": reach.version,
+                "rollout_percentage": reach.rollout_percentage,
+                "machines": reach.machines,
+                "in_cohort": reach.in_cohort,
+                "reach": reach.reach,
+                "empty_ids": reach.empty_ids,
+                "chi_square": reach.chi_square,
+                "p_value": reach.p_value,
+                "max_bucket_deviation": reach.max_bucket_deviation,
+                "histogram": list(reach.histogram),
+            }
+            for reach in reaches
+        ],
+        "installed": None if outcomes is None else [
+            {
+                "installed_version": outcome.installed_version,
+                "machines": outcome.machines,
+                "targets": outcome.targets,
+                "blocked_by_min_supported": outcome.blocked_by_min_supported,
+                "not_updated": outcome.not_updated,
+            }
+            for outcome in outcomes
+        ],
+    }
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--policy",
+        default=os.environ.get("APPCAST_POLICY_PATH", DEFAULT_POLICY_PATH),
+        help=f"Appcast policy JSON (default: {DEFAULT_POLICY_PATH})",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--machine-ids",
+        help="File with one `machine_id[,installed_version]` per line ('-' = stdin)",
+    )
+    source.add_argument(
+        "--synthetic",
+        type=int,
+        default=DEFAULT_SYNTHETIC_IDS,
+        help=f"Number of random MachineGuid ids (default: {DEFAULT_SYNTHETIC_IDS})",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --synthetic")
+    parser.add_argument(
+        "--versions",
+        default="",
+        help=(
+            "Comma-separated extra feed versions without rollout (e.g. the "
+            "current stable); policy rollout versions are always included"
+        ),
+    )
+    parser.add_argument(
+        "--rollout",
+        action="append",
+        default=[],
+        metavar="VERSION=PCT",
+        help="Override/add a rollout percentage without editing the policy",
+    )
+    parser.add_argument(
+        "--min-supported",
+        help="Override min_supported_app_version ('none' clears it)",
+    )
+    parser.add_argument(
+        "--installed",
+        default="",
+        help=(
+            "Installed-version distribution VERSION=WEIGHT,... for the update "
+            "replay (ignored when --machine-ids carries a version column)"
+        ),
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    if args.synthetic < 0:
+        parser.error("--synthetic must be >= 0")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be >= 1")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    try:
+        policy = _apply_overrides(load_policy(Path(args.policy)), args)
+        if args.machine_ids:
+            machine_ids, installed_column = load_machine_ids(Path(args.machine_ids))
+        else:
+            machine_ids = synthetic_machine_ids(args.synthetic, args.seed)
+            installed_column = []
+
+        extra = [
+            _normalize_version(version.strip())
+            for version in args.versions.split(",")
+            if version.strip()
+        ]
+        versions = sorted(
+            {*policy.rollout_percentages, *extra} - policy.blocked_versions,
+            key=_version_key,
+            reverse=True,
+        )
+        if not versions:
+            raise RuntimeError(
+                "No versions to simulate: add rollout_percentages to the policy, "
+                "--rollout or --versions"
+            )
+        installed_slices: list[tuple[str, int, int]] | None = None
+        if any(version is not None for version in installed_column):
+            machine_ids, installed_slices = _group_by_installed(
+                machine_ids, installed_column,
+            )
+        elif args.installed:
+            installed_slices = allocate_installed(
+                len(machine_ids), _parse_assignments(args.installed, "--installed"),
+            )
+        machine_ids = [machine.strip() for machine in machine_ids]
+
+        started = time.perf_counter()
+        buckets = rollout_buckets(versions, machine_ids, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        reaches = [
+            version_reach(version, _rollout_percentage(policy, version), buckets[version])
+            for version in versions
+        ]
+        outcomes = (
+            simulate_updates(versions, policy, buckets, installed_slices)
+            if installed_slices is not None
+            else None
+        )
+    except (OSError, RuntimeError) as error:
+        print(f"ERROR: {error}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(_report_json(reaches, outcomes, policy), indent=2))
+        return 0
+    print(
+        f"Hashed {len(machine_ids)} machine id(s) x {len(versions)} version(s) "
+        f"in {elapsed:.2f}s"
+    )
+    _print_report(reaches, outcomes, policy.min_supported_app_version)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,26 +1,79 @@
 #!/usr/bin/env python3
-"""Rebuild appcast.xml from published GitHub releases."""
+"""Rebuild appcast.xml from published GitHub releases.
+
+The releases listing is fetched page by page (`Link: rel="next"`) with
+conditional requests: `ETag`/`Last-Modified` of every page are kept in
+`<cache-dir>/releases_http.json`. When GitHub answers `304 Not Modified`
+for every page and nothing else that feeds the feed changed (policy,
+releases held by `min_publication_age_minutes`), the rebuild is skipped.
+
+Installers and their `.sha256` sidecars are immutable once uploaded, so
+resolved `ReleaseAsset` records are kept in `<cache-dir>/release_assets.json`
+keyed by GitHub asset id + `updated_at`; only new or re-uploaded assets
+hit the network. With `--verify-assets` every installer is also
+stream-downloaded and hashed against its sidecar and the API `size`; the
+computed digests go to `<cache-dir>/verified_digests.json` so each
+immutable installer is hashed only once. All cache files are safe to
+delete at any time.
+"""
 
 from __future__ import annotations
 
+import argparse
 import fnmatch
+import gzip
+import hashlib
+import io
 import json
 import os
 import re
 import sys
-import urllib.request
+import tempfile
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import release_http  # noqa: E402
+from release_http import (  # noqa: E402
+    DEFAULT_BACKOFF_SECONDS,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_WAIT_SECONDS,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT_SECONDS,
+    HttpResponse,
+    ReleaseHttpClient,
+)
+
 SPARKLE_NS = "http://www.andymatuschak.org/xml-namespaces/sparkle"
 DEFAULT_REPO = "cesar-carlos/backup_database"
+DEFAULT_API_BASE = "https://api.github.com"
 DEFAULT_CHANNEL_TITLE = "Backup Database Updates"
 DEFAULT_CHANNEL_DESCRIPTION = "Backup Database updates feed"
 DEFAULT_POLICY_PATH = "scripts/appcast_policy.json"
+DEFAULT_CACHE_DIR = ".appcast_cache"
 INSTALLER_PATTERN = "BackupDatabase-Setup-*.exe"
 CHECKSUM_SUFFIX = ".sha256"
+RELEASES_PER_PAGE = 100
+HTTP_CACHE_FILENAME = "releases_http.json"
+HTTP_CACHE_SCHEMA_VERSION = 1
+ASSET_CACHE_FILENAME = "release_assets.json"
+ASSET_CACHE_SCHEMA_VERSION = 1
+VERIFIED_CACHE_FILENAME = "verified_digests.json"
+VERIFIED_CACHE_SCHEMA_VERSION = 1
+DEFAULT_VERIFY_WORKERS = 2
+DEFAULT_SIDECAR_WORKERS = 8
+# Exit code de `--exit-code` quando o feed mudou (1 e erro, 2 e uso
+# invalido pelo argparse).
+EXIT_FEED_CHANGED = 3
+DEFAULT_ARCHIVE_FILENAME = "appcast-archive.xml"
+FEED_VARIANTS = ("gz", "json", "sha256")
+APPCAST_JSON_SCHEMA_VERSION = 1
 
 
 @dataclass(frozen=True)
@@ -37,6 +90,7 @@ class PublishedRelease:
     published_at: str
     body: str
     asset: ReleaseAsset
+    html_url: str = ""
 
 
 @dataclass(frozen=True)
@@ -47,8 +101,99 @@ class AppcastPolicy:
     min_publication_age_minutes: dict[str, int]
 
 
+@dataclass(frozen=True)
+class ReleasesFetch:
+    releases: list[dict]
+    # True quando todas as paginas responderam 304 (payload veio do cache).
+    not_modified: bool
+
+
+@dataclass(frozen=True)
+class InstallerCandidate:
+    tag_name: str
+    name: str
+    url: str
+    size: int
+    sidecar: dict
+    # `<installer id>@<updated_at>+<sidecar id>@<updated_at>`; None quando
+    # a API nao trouxe ids/updated_at (sem cache para esse asset).
+    cache_key: str | None = None
+    # So o instalador: o digest verificado nao depende do sidecar.
+    installer_key: str | None = None
+
+
+@dataclass(frozen=True)
+class SidecarFetchOptions:
+    workers: int = DEFAULT_SIDECAR_WORKERS
+    timeout: float = DEFAULT_TIMEOUT_SECONDS
+    retries: int = DEFAULT_RETRIES
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS
+    max_rate_limit_wait: float = DEFAULT_MAX_WAIT_SECONDS
+
+
+@dataclass(frozen=True)
+class AppcastDiff:
+    added: tuple[str, ...]
+    removed: tuple[str, ...]
+    modified: tuple[str, ...]
+    # Cabecalho do channel ou ordem dos itens mudou.
+    layout_changed: bool
+
+    @property
+    def changed_items(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.modified)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.changed_items == 0 and not self.layout_changed
+
+    @staticmethod
+    def combine(diffs: list["AppcastDiff"]) -> "AppcastDiff":
+        return AppcastDiff(
+            added=tuple(v for diff in diffs for v in diff.added),
+            removed=tuple(v for diff in diffs for v in diff.removed),
+            modified=tuple(v for diff in diffs for v in diff.modified),
+            layout_changed=any(diff.layout_changed for diff in diffs),
+        )
+
+
+@dataclass
+class AssetCache:
+    """Resolved `ReleaseAsset` records keyed by `InstallerCandidate.cache_key`."""
+
+    entries: dict[str, dict] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+
+@dataclass
+class VerifiedDigestCache:
+    """Digests computed from downloaded installers, keyed by installer id@updated_at."""
+
+    entries: dict[str, dict] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+
+@dataclass(frozen=True)
+class VerifyOptions:
+    workers: int = DEFAULT_VERIFY_WORKERS
+    cache: VerifiedDigestCache | None = None
+
+
+@dataclass
+class HttpCache:
+    """On-disk validators of the releases listing, keyed by page URL."""
+
+    pages: dict[str, dict] = field(default_factory=dict)
+    last_build: dict | None = None
+
+
 def _build_api_url(repo: str) -> str:
-    return f"https://api.github.com/repos/{repo}/releases"
+    # GITHUB_API_URL ja vem definido no Actions (GHES) e permite apontar
+    # para um stand-in local em testes.
+    base = os.environ.get("GITHUB_API_URL", DEFAULT_API_BASE).rstrip("/")
+    return f"{base}/repos/{repo}/releases"
 
 
 def _build_repo_releases_link(repo: str) -> str:
@@ -66,19 +211,236 @@ def _build_headers() -> dict[str, str]:
     return headers
 
 
-def _get_json(url: str) -> object:
-    request = urllib.request.Request(url, headers=_build_headers())
-    with urllib.request.urlopen(request) as response:
-        return json.loads(response.read().decode("utf-8"))
+def build_http_client(options: SidecarFetchOptions | None = None) -> ReleaseHttpClient:
+    options = options or SidecarFetchOptions()
+    return ReleaseHttpClient(
+        headers=_build_headers(),
+        timeout=options.timeout,
+        retries=options.retries,
+        backoff_seconds=options.backoff_seconds,
+        max_wait_seconds=options.max_rate_limit_wait,
+    )
+
+
+def _get_conditional(
+    client: ReleaseHttpClient,
+    url: str,
+    cached: dict | None,
+) -> HttpResponse:
+    """GET `url` sending the validators from `cached`; 304 is not an error."""
+    headers: dict[str, str] = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    return client.get(url, headers)
+
+
+def _next_page_url(link_header: str | None) -> str | None:
+    if not link_header:
+        return None
+    for part in link_header.split(","):
+        match = re.match(r'\s*<([^>]+)>\s*;(.*)$', part)
+        if match and re.search(r'rel="?next"?', match.group(2)):
+            return match.group(1)
+    return None
+
 
+def http_cache_path(cache_dir: Path) -> Path:
+    return cache_dir / HTTP_CACHE_FILENAME
 
-def fetch_releases(repo: str) -> list[dict]:
-    payload = _get_json(_build_api_url(repo))
-    if not isinstance(payload, list):
-        raise RuntimeError("GitHub API did not return a releases list")
+
+def _load_cache_payload(path: Path, schema_version: int) -> dict | None:
+    """Cache file contents, or None when missing, unreadable or another schema."""
+    if not path.is_file():
+        return None
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("schema_version") != schema_version:
+        return None
     return payload
 
 
+def _save_cache_payload(path: Path, schema_version: int, payload: dict) -> None:
+    _atomic_write_bytes(
+        path,
+        json.dumps(
+            {"schema_version": schema_version, **payload},
+            ensure_ascii=False,
+            indent=2,
+            sort_keys=True,
+        ).encode("utf-8"),
+    )
+
+
+def load_http_cache(path: Path) -> HttpCache:
+    """Load the validators cache; anything unreadable is an empty cache."""
+    payload = _load_cache_payload(path, HTTP_CACHE_SCHEMA_VERSION)
+    if payload is None:
+        return HttpCache()
+    pages = payload.get("pages")
+    last_build = payload.get("last_build")
+    return HttpCache(
+        pages=pages if isinstance(pages, dict) else {},
+        last_build=last_build if isinstance(last_build, dict) else None,
+    )
+
+
+def write_files_atomically(files: list[tuple[Path, bytes]]) -> None:
+    """Stage every file in a temp sibling, then `os.replace` them in order.
+
+    Nothing is swapped in until every temp file was written, so a failure
+    halfway (disk full, permissions) leaves all targets untouched.
+    """
+    staged: list[tuple[str, Path]] = []
+    try:
+        for path, data in files:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(
+                prefix=f".{path.name}.", suffix=".tmp", dir=path.parent,
+            )
+            staged.append((tmp_name, path))
+            with os.fdopen(fd, "wb") as output:
+                output.write(data)
+        while staged:
+            tmp_name, path = staged[0]
+            os.replace(tmp_name, path)
+            staged.pop(0)
+    finally:
+        for tmp_name, _ in staged:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write `data` next to `path` and swap it in with `os.replace`."""
+    write_files_atomically([(path, data)])
+
+
+def save_http_cache(path: Path, cache: HttpCache) -> None:
+    _save_cache_payload(
+        path,
+        HTTP_CACHE_SCHEMA_VERSION,
+        {"pages": cache.pages, "last_build": cache.last_build},
+    )
+
+
+def asset_cache_path(cache_dir: Path) -> Path:
+    return cache_dir / ASSET_CACHE_FILENAME
+
+
+def load_asset_cache(path: Path) -> AssetCache:
+    """Load cached asset records; unreadable or other-schema files are dropped."""
+    payload = _load_cache_payload(path, ASSET_CACHE_SCHEMA_VERSION)
+    if payload is None or not isinstance(payload.get("assets"), dict):
+        return AssetCache()
+    return AssetCache(entries=payload["assets"])
+
+
+def save_asset_cache(path: Path, cache: AssetCache) -> None:
+    _save_cache_payload(path, ASSET_CACHE_SCHEMA_VERSION, {"assets": cache.entries})
+
+
+def verified_cache_path(cache_dir: Path) -> Path:
+    return cache_dir / VERIFIED_CACHE_FILENAME
+
+
+def load_verified_cache(path: Path) -> VerifiedDigestCache:
+    payload = _load_cache_payload(path, VERIFIED_CACHE_SCHEMA_VERSION)
+    if payload is None or not isinstance(payload.get("installers"), dict):
+        return VerifiedDigestCache()
+    return VerifiedDigestCache(entries=payload["installers"])
+
+
+def save_verified_cache(path: Path, cache: VerifiedDigestCache) -> None:
+    _save_cache_payload(
+        path, VERIFIED_CACHE_SCHEMA_VERSION, {"installers": cache.entries},
+    )
+
+
+def _cached_release_asset(
+    candidate: InstallerCandidate,
+    cache: AssetCache,
+) -> ReleaseAsset | None:
+    if candidate.cache_key is None:
+        return None
+    entry = cache.entries.get(candidate.cache_key)
+    if not isinstance(entry, dict):
+        return None
+    sha256 = entry.get("sha256")
+    if (
+        entry.get("name") != candidate.name
+        or entry.get("url") != candidate.url
+        or entry.get("size") != candidate.size
+        or not isinstance(sha256, str)
+        or not re.fullmatch(r"[0-9a-f]{64}", sha256)
+    ):
+        return None
+    return ReleaseAsset(
+        name=candidate.name,
+        url=candidate.url,
+        size=candidate.size,
+        sha256=sha256,
+    )
+
+
+def fetch_releases(
+    repo: str,
+    cache: HttpCache | None = None,
+    client: ReleaseHttpClient | None = None,
+) -> ReleasesFetch:
+    """Fetch every page of the releases listing.
+
+    With a `cache`, each page is requested conditionally and a 304 reuses
+    the stored body. `cache.pages` is replaced by the pages seen in this
+    run so entries from an older pagination layout do not linger.
+    """
+    if client is None:
+        with build_http_client() as owned_client:
+            return fetch_releases(repo, cache, owned_client)
+
+    url: str | None = f"{_build_api_url(repo)}?per_page={RELEASES_PER_PAGE}"
+    releases: list[dict] = []
+    seen_pages: dict[str, dict] = {}
+    not_modified = True
+
+    while url:
+        if url in seen_pages:
+            raise RuntimeError(f"GitHub API pagination loops back to {url}")
+
+        cached = cache.pages.get(url) if cache is not None else None
+        response = _get_conditional(client, url, cached)
+        if response.status == 304:
+            if cached is None:
+                raise RuntimeError(f"GitHub API answered 304 without a cached page: {url}")
+            payload = cached.get("body")
+            entry = cached
+        else:
+            not_modified = False
+            payload = response.json()
+            entry = {
+                "etag": response.header("ETag"),
+                "last_modified": response.header("Last-Modified"),
+                "next": _next_page_url(response.header("Link")),
+                "body": payload,
+            }
+
+        if not isinstance(payload, list):
+            raise RuntimeError("GitHub API did not return a releases list")
+        releases.extend(payload)
+        seen_pages[url] = entry
+        url = entry.get("next")
+
+    if cache is not None:
+        cache.pages = seen_pages
+    return ReleasesFetch(releases=releases, not_modified=not_modified)
+
+
 def _normalize_version(tag_name: str) -> str:
     return tag_name[1:] if tag_name.startswith("v") else tag_name
 
@@ -179,18 +541,21 @@ def _sha256_from_sidecar_content(content: str, installer_name: str) -> str | Non
     return None
 
 
-def _read_checksum_sidecar(asset: dict, installer_name: str) -> str | None:
+def _read_checksum_sidecar(
+    asset: dict,
+    installer_name: str,
+    client: ReleaseHttpClient,
+) -> str | None:
     url = asset.get("browser_download_url")
     if not isinstance(url, str):
         return None
 
-    request = urllib.request.Request(url, headers=_build_headers())
-    with urllib.request.urlopen(request) as response:
-        content = response.read().decode("utf-8", errors="replace")
+    content = client.get(url).text()
     return _sha256_from_sidecar_content(content, installer_name)
 
 
-def _select_installer_asset(release: dict) -> ReleaseAsset:
+def _locate_installer(release: dict) -> InstallerCandidate:
+    """Pick installer + sidecar assets from metadata only (no network)."""
     assets = release.get("assets", [])
     exe_assets = [asset for asset in assets if asset.get("name", "").endswith(".exe")]
     matching_pattern = [
@@ -233,20 +598,226 @@ def _select_installer_asset(release: dict) -> ReleaseAsset:
             f"{release.get('tag_name')}: missing required checksum sidecar for {name}"
         )
 
-    sha256 = _read_checksum_sidecar(checksum_assets[0], name)
+    return InstallerCandidate(
+        tag_name=str(release.get("tag_name")),
+        name=name,
+        url=url,
+        size=size,
+        sidecar=checksum_assets[0],
+        cache_key=_asset_cache_key(selected, checksum_assets[0]),
+        installer_key=_asset_key(selected),
+    )
+
+
+def _asset_key(asset: dict) -> str | None:
+    asset_id = asset.get("id")
+    updated_at = asset.get("updated_at")
+    if not isinstance(asset_id, int) or not isinstance(updated_at, str):
+        return None
+    return f"{asset_id}@{updated_at}"
+
+
+def _asset_cache_key(installer: dict, sidecar: dict) -> str | None:
+    installer_key = _asset_key(installer)
+    sidecar_key = _asset_key(sidecar)
+    if installer_key is None or sidecar_key is None:
+        return None
+    return f"{installer_key}+{sidecar_key}"
+
+
+def _resolve_candidate(
+    candidate: InstallerCandidate,
+    client: ReleaseHttpClient,
+) -> ReleaseAsset:
+    try:
+        sha256 = _read_checksum_sidecar(candidate.sidecar, candidate.name, client)
+    except Exception as error:
+        raise RuntimeError(
+            f"{candidate.tag_name}: failed to download checksum sidecar for "
+            f"{candidate.name}: {error}"
+        ) from error
     if sha256 is None:
         raise RuntimeError(
-            f"{release.get('tag_name')}: invalid checksum sidecar for {name}"
+            f"{candidate.tag_name}: invalid checksum sidecar for {candidate.name}"
         )
 
     return ReleaseAsset(
-        name=name,
-        url=url,
-        size=size,
+        name=candidate.name,
+        url=candidate.url,
+        size=candidate.size,
         sha256=sha256,
     )
 
 
+def resolve_release_assets(
+    candidates: list[InstallerCandidate],
+    options: SidecarFetchOptions | None = None,
+    cache: AssetCache | None = None,
+    client: ReleaseHttpClient | None = None,
+) -> list[ReleaseAsset]:
+    """Download every checksum sidecar on a bounded thread pool.
+
+    Results keep the order of `candidates`. The first failure cancels the
+    downloads still queued and is re-raised, so a broken release aborts
+    the sync just like the serial loop did. With a `cache`, candidates
+    whose key is already known skip the download, and `cache.entries` is
+    replaced by the records of this run (stale assets are pruned).
+    """
+    options = options or SidecarFetchOptions()
+    if client is None:
+        with build_http_client(options) as owned_client:
+            return resolve_release_assets(candidates, options, cache, owned_client)
+
+    results: list[ReleaseAsset | None] = [None] * len(candidates)
+    pending: list[int] = []
+    for index, candidate in enumerate(candidates):
+        cached = _cached_release_asset(candidate, cache) if cache is not None else None
+        if cached is None:
+            pending.append(index)
+        else:
+            results[index] = cached
+
+    if pending:
+        workers = max(1, min(options.workers, len(pending)))
+        executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="appcast-sidecar",
+        )
+        try:
+            futures = {
+                executor.submit(_resolve_candidate, candidates[index], client): index
+                for index in pending
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    assets = [asset for asset in results if asset is not None]
+    if cache is not None:
+        cache.hits = len(candidates) - len(pending)
+        cache.misses = len(pending)
+        cache.entries = {
+            candidate.cache_key: {
+                "name": asset.name,
+                "url": asset.url,
+                "size": asset.size,
+                "sha256": asset.sha256,
+            }
+            for candidate, asset in zip(candidates, assets)
+            if candidate.cache_key is not None
+        }
+    return assets
+
+
+class _Sha256Sink:
+    """`DownloadSink` that hashes the stream instead of keeping it."""
+
+    def __init__(self) -> None:
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self.size += len(chunk)
+
+    def restart(self) -> None:
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def _hash_installer(
+    candidate: InstallerCandidate,
+    client: ReleaseHttpClient,
+) -> dict:
+    sink = _Sha256Sink()
+    try:
+        client.download(candidate.url, sink, chunk_size=DEFAULT_CHUNK_SIZE)
+    except Exception as error:
+        raise RuntimeError(
+            f"{candidate.tag_name}: failed to download installer {candidate.name}: {error}"
+        ) from error
+    return {"sha256": sink.hexdigest(), "size": sink.size}
+
+
+def _check_installer_digest(
+    candidate: InstallerCandidate,
+    asset: ReleaseAsset,
+    verified: dict,
+) -> None:
+    if verified.get("size") != asset.size:
+        raise RuntimeError(
+            f"{candidate.tag_name}: installer {candidate.name} has "
+            f"{verified.get('size')} bytes but the API reports {asset.size}"
+        )
+    if verified.get("sha256") != asset.sha256:
+        raise RuntimeError(
+            f"{candidate.tag_name}: installer {candidate.name} sha256 "
+            f"{verified.get('sha256')} does not match its checksum sidecar "
+            f"({asset.sha256})"
+        )
+
+
+def verify_release_assets(
+    candidates: list[InstallerCandidate],
+    assets: list[ReleaseAsset],
+    client: ReleaseHttpClient,
+    options: VerifyOptions | None = None,
+) -> None:
+    """Stream-hash every installer and compare with sidecar and API size.
+
+    Downloads run on a bounded pool and are hashed in fixed-size chunks,
+    so memory stays flat regardless of installer size. Installers whose
+    key is in `options.cache` are not downloaded again; the cache keeps
+    the computed digest (even on mismatch) for the installers seen here,
+    and `main` saves it on failure too.
+    """
+    options = options or VerifyOptions()
+    cache = options.cache
+    verified: list[dict | None] = [None] * len(candidates)
+    pending: list[int] = []
+    for index, candidate in enumerate(candidates):
+        entry = (
+            cache.entries.get(candidate.installer_key)
+            if cache is not None and candidate.installer_key is not None
+            else None
+        )
+        if isinstance(entry, dict):
+            verified[index] = entry
+            _check_installer_digest(candidate, assets[index], entry)
+        else:
+            pending.append(index)
+
+    if pending:
+        workers = max(1, min(options.workers, len(pending)))
+        executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="appcast-verify",
+        )
+        try:
+            futures = {
+                executor.submit(_hash_installer, candidates[index], client): index
+                for index in pending
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                verified[index] = future.result()
+                if cache is not None and candidates[index].installer_key is not None:
+                    cache.entries[candidates[index].installer_key] = verified[index]
+                _check_installer_digest(candidates[index], assets[index], verified[index])
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    if cache is not None:
+        cache.hits = len(candidates) - len(pending)
+        cache.misses = len(pending)
+        keys = {c.installer_key for c in candidates if c.installer_key is not None}
+        cache.entries = {
+            key: value for key, value in cache.entries.items() if key in keys
+        }
+
+
 def _is_too_young(published_at: str, min_age_minutes: int) -> bool:
     if min_age_minutes <= 0 or not published_at:
         return False
@@ -258,9 +829,13 @@ def _is_too_young(published_at: str, min_age_minutes: int) -> bool:
     return age.total_seconds() < min_age_minutes * 60
 
 
-def build_published_releases(repo: str, policy: AppcastPolicy) -> list[PublishedRelease]:
-    releases = fetch_releases(repo)
-    by_version: dict[str, PublishedRelease] = {}
+def _partition_releases(
+    releases: list[dict],
+    policy: AppcastPolicy,
+) -> tuple[list[tuple[str, dict]], list[str]]:
+    """Split raw releases into `(version, release)` candidates and held versions."""
+    candidates: list[tuple[str, dict]] = []
+    held: list[str] = []
 
     for release in releases:
         if release.get("draft") or release.get("prerelease"):
@@ -276,19 +851,52 @@ def build_published_releases(repo: str, policy: AppcastPolicy) -> list[Published
         published_at_raw = release.get("published_at") or ""
         min_age = policy.min_publication_age_minutes.get(version, 0)
         if _is_too_young(published_at_raw, min_age):
-            print(
-                f"INFO: holding {version} from appcast (too young; "
-                f"min_publication_age_minutes={min_age})",
-                file=sys.stderr,
-            )
+            held.append(version)
             continue
 
-        asset = _select_installer_asset(release)
+        candidates.append((version, release))
+
+    return candidates, held
+
+
+def select_published_releases(
+    releases: list[dict],
+    policy: AppcastPolicy,
+    options: SidecarFetchOptions | None = None,
+    asset_cache: AssetCache | None = None,
+    client: ReleaseHttpClient | None = None,
+    verify: VerifyOptions | None = None,
+) -> list[PublishedRelease]:
+    if client is None:
+        with build_http_client(options) as owned_client:
+            return select_published_releases(
+                releases, policy, options, asset_cache, owned_client, verify,
+            )
+
+    candidates, held = _partition_releases(releases, policy)
+    for version in held:
+        min_age = policy.min_publication_age_minutes.get(version, 0)
+        print(
+            f"INFO: holding {version} from appcast (too young; "
+            f"min_publication_age_minutes={min_age})",
+            file=sys.stderr,
+        )
+
+    # Valida todos os metadados antes de abrir qualquer conexao: release
+    # sem sidecar falha sem gastar downloads.
+    installers = [_locate_installer(release) for _, release in candidates]
+    assets = resolve_release_assets(installers, options, asset_cache, client)
+    if verify is not None:
+        verify_release_assets(installers, assets, client, verify)
+
+    by_version: dict[str, PublishedRelease] = {}
+    for (version, release), asset in zip(candidates, assets):
         published_release = PublishedRelease(
             version=version,
-            published_at=published_at_raw,
+            published_at=release.get("published_at") or "",
             body=(release.get("body") or "").strip(),
             asset=asset,
+            html_url=release.get("html_url") or "",
         )
 
         existing = by_version.get(version)
@@ -305,15 +913,99 @@ def build_published_releases(repo: str, policy: AppcastPolicy) -> list[Published
     return ordered
 
 
+def build_published_releases(
+    repo: str,
+    policy: AppcastPolicy,
+    options: SidecarFetchOptions | None = None,
+) -> list[PublishedRelease]:
+    with build_http_client(options) as client:
+        fetched = fetch_releases(repo, client=client)
+        return select_published_releases(
+            fetched.releases, policy, options, client=client,
+        )
+
+
+def _build_fingerprint(
+    releases: list[dict],
+    policy: AppcastPolicy,
+    layout: dict | None = None,
+) -> dict:
+    """Inputs besides the GitHub payload that change the rendered feed.
+
+    Includes the source of this script and `release_http`, so a change in
+    how the feed is rendered rebuilds it even when GitHub answers 304.
+    """
+    _, held = _partition_releases(releases, policy)
+    policy_payload = json.dumps(
+        {
+            "blocked_versions": sorted(policy.blocked_versions),
+            "min_supported_app_version": policy.min_supported_app_version,
+            "rollout_percentages": policy.rollout_percentages,
+            "min_publication_age_minutes": policy.min_publication_age_minutes,
+        },
+        sort_keys=True,
+    )
+    code = hashlib.sha256()
+    for source in (Path(__file__), Path(release_http.__file__)):
+        code.update(source.read_bytes())
+    return {
+        "policy_sha256": hashlib.sha256(policy_payload.encode("utf-8")).hexdigest(),
+        "code_sha256": code.hexdigest(),
+        "held_versions": sorted(held),
+        "layout": layout or {},
+    }
+
+
+def _output_digests(paths: list[Path]) -> dict[str, str] | None:
+    """sha256 of every output on disk, or None when one is missing."""
+    digests: dict[str, str] = {}
+    for path in paths:
+        try:
+            digests[str(path)] = hashlib.sha256(path.read_bytes()).hexdigest()
+        except OSError:
+            return None
+    return digests
+
+
 def _format_pub_date(published_at: str) -> str:
     parsed = datetime.fromisoformat(published_at.replace("Z", "+00:00"))
     return parsed.strftime("%a, %d %b %Y %H:%M:%S +0000")
 
 
+def _truncate_notes(body: str, limit: int, link: str) -> str:
+    """Cap `body` at `limit` chars (preferring a line break) and link the page."""
+    if len(body) <= limit:
+        return body
+    cut = body[:limit]
+    newline = cut.rfind("\n")
+    if newline >= limit // 2:
+        cut = cut[:newline]
+    return f"{cut.rstrip()}\n\n...\n\nNotas completas: {link}"
+
+
+def _rollout_percentage(policy: AppcastPolicy, version: str) -> int | None:
+    rollout = policy.rollout_percentages.get(version)
+    if rollout is None:
+        return None
+    return max(0, min(100, rollout))
+
+
+def split_releases(
+    releases: list[PublishedRelease],
+    max_items: int | None,
+) -> tuple[list[PublishedRelease], list[PublishedRelease]]:
+    """Most recent `max_items` go to the main feed, the rest to the archive."""
+    if max_items is None:
+        return releases, []
+    return releases[:max_items], releases[max_items:]
+
+
 def render_appcast(
     repo: str,
     releases: list[PublishedRelease],
     policy: AppcastPolicy,
+    *,
+    description_limit: int | None = None,
 ) -> ET.ElementTree:
     ET.register_namespace("sparkle", SPARKLE_NS)
 
@@ -329,9 +1021,14 @@ def render_appcast(
         item = ET.SubElement(channel, "item")
         ET.SubElement(item, "title").text = f"Version {release.version}"
         ET.SubElement(item, "pubDate").text = _format_pub_date(release.published_at)
-        ET.SubElement(item, "description").text = (
-            release.body or "Automatic update via GitHub Release."
-        )
+        notes = release.body or "Automatic update via GitHub Release."
+        if description_limit is not None:
+            notes = _truncate_notes(
+                notes,
+                description_limit,
+                release.html_url or _build_repo_releases_link(repo),
+            )
+        ET.SubElement(item, "description").text = notes
 
         enclosure = ET.SubElement(item, "enclosure")
         enclosure.set("url", release.asset.url)
@@ -349,11 +1046,10 @@ def render_appcast(
                 f"{{{SPARKLE_NS}}}minSupportedAppVersion",
                 policy.min_supported_app_version,
             )
-        rollout = policy.rollout_percentages.get(release.version)
+        rollout = _rollout_percentage(policy, release.version)
         if rollout is not None:
-            clamped = max(0, min(100, rollout))
             enclosure.set(
-                f"{{{SPARKLE_NS}}}rolloutPercentage", str(clamped),
+                f"{{{SPARKLE_NS}}}rolloutPercentage", str(rollout),
             )
 
     tree = ET.ElementTree(root)
@@ -361,31 +1057,477 @@ def render_appcast(
     return tree
 
 
+def serialize_appcast(tree: ET.ElementTree) -> bytes:
+    output = io.BytesIO()
+    output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+    tree.write(output, encoding="utf-8", xml_declaration=False)
+    return output.getvalue()
+
+
 def write_appcast(path: Path, tree: ET.ElementTree) -> None:
-    with path.open("wb") as output:
-        output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
-        tree.write(output, encoding="utf-8", xml_declaration=False)
+    """Write the feed atomically: readers never see a half-written file."""
+    _atomic_write_bytes(path, serialize_appcast(tree))
+
+
+def render_appcast_json(
+    releases: list[PublishedRelease],
+    policy: AppcastPolicy,
+) -> bytes:
+    """Minimal JSON twin of the feed: only what the update decision needs."""
+    payload = {
+        "schema_version": APPCAST_JSON_SCHEMA_VERSION,
+        "items": [
+            {
+                "version": release.version,
+                "url": release.asset.url,
+                "length": release.asset.size,
+                "sha256": release.asset.sha256,
+                "minSupportedAppVersion": policy.min_supported_app_version,
+                "rolloutPercentage": _rollout_percentage(policy, release.version),
+            }
+            for release in releases
+        ],
+    }
+    return (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def feed_variant_path(xml_path: Path, variant: str) -> Path:
+    if variant == "json":
+        return xml_path.with_suffix(".json")
+    return xml_path.with_name(f"{xml_path.name}.{variant}")
+
+
+def build_feed_variants(
+    xml_path: Path,
+    xml_bytes: bytes,
+    releases: list[PublishedRelease],
+    policy: AppcastPolicy,
+    variants: tuple[str, ...],
+) -> list[tuple[Path, bytes]]:
+    """Sidecar files of `xml_path`, all derived from the same render.
+
+    `xml_bytes` must be exactly what is (or will be) served as `xml_path`,
+    otherwise `.gz` and `.sha256` would describe a different document.
+    The hash file comes last so `write_files_atomically` swaps it in
+    after the documents it describes.
+    """
+    files: list[tuple[Path, bytes]] = []
+    if "gz" in variants:
+        # mtime=0 deixa o .gz deterministico (sem diff quando o XML nao muda).
+        files.append(
+            (
+                feed_variant_path(xml_path, "gz"),
+                gzip.compress(xml_bytes, compresslevel=9, mtime=0),
+            )
+        )
+    if "json" in variants:
+        files.append(
+            (feed_variant_path(xml_path, "json"), render_appcast_json(releases, policy))
+        )
+    if "sha256" in variants:
+        digest = hashlib.sha256(xml_bytes).hexdigest()
+        files.append(
+            (
+                feed_variant_path(xml_path, "sha256"),
+                f"{digest}  {xml_path.name}\n".encode("utf-8"),
+            )
+        )
+    return files
+
+
+def appcast_size_report(tree: ET.ElementTree) -> list[tuple[str, int]]:
+    """Serialized UTF-8 bytes of every `<item>`, keyed by version."""
+    channel = tree.getroot().find("channel")
+    if channel is None:
+        return []
+    report: list[tuple[str, int]] = []
+    for item in channel.findall("item"):
+        enclosure = item.find("enclosure")
+        version = (
+            enclosure.get(f"{{{SPARKLE_NS}}}version", "")
+            if enclosure is not None
+            else ""
+        )
+        report.append((version, len(ET.tostring(item, encoding="utf-8"))))
+    return report
+
+
+def _print_size_report(path: Path, tree: ET.ElementTree) -> None:
+    items = appcast_size_report(tree)
+    total = len(serialize_appcast(tree))
+    print(f"Feed size report ({path}):")
+    for version, size in items:
+        print(f"  {version:<16} {size:>10,} B")
+    print(
+        f"  {'total':<16} {total:>10,} B "
+        f"({len(items)} item(s), {sum(size for _, size in items):,} B in items)"
+    )
+
+
+def _feed_signature(root: ET.Element) -> tuple[dict, list[tuple[str, dict]]]:
+    """Reduce a feed to `(channel header, [(version, item fields)])`."""
+    channel = root.find("channel")
+    if channel is None:
+        return {}, []
+
+    header = {
+        tag: (channel.findtext(tag) or "")
+        for tag in ("title", "link", "description")
+    }
+    items: list[tuple[str, dict]] = []
+    for item in channel.findall("item"):
+        enclosure = item.find("enclosure")
+        attrs = dict(enclosure.attrib) if enclosure is not None else {}
+        version = attrs.get(f"{{{SPARKLE_NS}}}version", "")
+        items.append(
+            (
+                version,
+                {
+                    "title": item.findtext("title") or "",
+                    "pubDate": item.findtext("pubDate") or "",
+                    "description": item.findtext("description") or "",
+                    "enclosure": attrs,
+                },
+            )
+        )
+    return header, items
+
+
+def diff_appcast(path: Path, tree: ET.ElementTree) -> AppcastDiff:
+    """Compare the feed on disk with `tree` item by item (keyed by version).
+
+    A missing or unparsable file counts as every item being added.
+    """
+    new_header, new_items = _feed_signature(tree.getroot())
+    old_header: dict = {}
+    old_items: list[tuple[str, dict]] = []
+    if path.is_file():
+        try:
+            old_header, old_items = _feed_signature(ET.parse(path).getroot())
+        except ET.ParseError:
+            old_header, old_items = {}, []
+
+    old_by_version = dict(old_items)
+    new_by_version = dict(new_items)
+    return AppcastDiff(
+        added=tuple(v for v, _ in new_items if v not in old_by_version),
+        removed=tuple(v for v, _ in old_items if v not in new_by_version),
+        modified=tuple(
+            v
+            for v, fields in new_items
+            if v in old_by_version and old_by_version[v] != fields
+        ),
+        layout_changed=(
+            old_header != new_header
+            or [v for v, _ in old_items] != [v for v, _ in new_items]
+        ),
+    )
 
 
-def main() -> int:
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("APPCAST_CACHE_DIR", DEFAULT_CACHE_DIR),
+        help=(
+            "Directory holding the HTTP validators and release asset caches "
+            f"(default: $APPCAST_CACHE_DIR or {DEFAULT_CACHE_DIR}). "
+            "Pass an empty string to disable both."
+        ),
+    )
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write any cache (same as --cache-dir '').",
+    )
+    cache_mode.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached entries, fetch everything again and rewrite the caches.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Diff the computed items against the existing feed and skip the "
+            "write when nothing changed."
+        ),
+    )
+    parser.add_argument(
+        "--exit-code",
+        action="store_true",
+        help=(
+            f"With --incremental: exit with {EXIT_FEED_CHANGED} when the feed "
+            "changed and 0 when it is unchanged (like `git diff --exit-code`)."
+        ),
+    )
+    parser.add_argument(
+        "--max-description-chars",
+        type=int,
+        default=None,
+        help=(
+            "Cap each <description> at N chars and append a link to the "
+            "release page (default: full release notes)."
+        ),
+    )
+    parser.add_argument(
+        "--max-items",
+        type=int,
+        default=None,
+        help=(
+            "Keep only the K most recent releases in the main feed; older "
+            "items go to --archive-output."
+        ),
+    )
+    parser.add_argument(
+        "--archive-output",
+        default="",
+        help=(
+            "Archive feed written when --max-items is set "
+            f"(default: {DEFAULT_ARCHIVE_FILENAME} next to the main feed)."
+        ),
+    )
+    parser.add_argument(
+        "--size-report",
+        action="store_true",
+        help="Print per-item and total serialized bytes of every feed.",
+    )
+    parser.add_argument(
+        "--variants",
+        default="",
+        help=(
+            "Comma-separated extra outputs of the main feed: "
+            f"{', '.join(FEED_VARIANTS)} (appcast.xml.gz, appcast.json, "
+            "appcast.xml.sha256). Written together with the XML."
+        ),
+    )
+    parser.add_argument(
+        "--sidecar-workers",
+        type=int,
+        default=DEFAULT_SIDECAR_WORKERS,
+        help=f"Parallel checksum sidecar downloads (default: {DEFAULT_SIDECAR_WORKERS})",
+    )
+    parser.add_argument(
+        "--verify-assets",
+        action="store_true",
+        help=(
+            "Download every installer (streamed, hashed in 1 MiB chunks) and "
+            "fail unless it matches its checksum sidecar and the API size"
+        ),
+    )
+    parser.add_argument(
+        "--verify-workers",
+        type=int,
+        default=DEFAULT_VERIFY_WORKERS,
+        help=f"Parallel installer downloads for --verify-assets (default: {DEFAULT_VERIFY_WORKERS})",
+    )
+    parser.add_argument(
+        "--http-timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_SECONDS,
+        help=f"Per-request timeout in seconds (default: {DEFAULT_TIMEOUT_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=(
+            "Retries with exponential backoff on 5xx / connection reset / "
+            f"rate limiting (default: {DEFAULT_RETRIES})"
+        ),
+    )
+    parser.add_argument(
+        "--max-rate-limit-wait",
+        type=float,
+        default=DEFAULT_MAX_WAIT_SECONDS,
+        help=(
+            "Longest wait in seconds for a GitHub rate-limit window to reset "
+            f"before failing (default: {DEFAULT_MAX_WAIT_SECONDS:g})"
+        ),
+    )
+    args = parser.parse_args(argv)
+    if args.sidecar_workers < 1:
+        parser.error("--sidecar-workers must be >= 1")
+    if args.verify_workers < 1:
+        parser.error("--verify-workers must be >= 1")
+    if args.retries < 0:
+        parser.error("--retries must be >= 0")
+    args.variants = tuple(
+        variant.strip() for variant in args.variants.split(",") if variant.strip()
+    )
+    unknown = sorted(set(args.variants) - set(FEED_VARIANTS))
+    if unknown:
+        parser.error(f"unknown --variants value(s): {', '.join(unknown)}")
+    if args.exit_code and not args.incremental:
+        parser.error("--exit-code needs --incremental")
+    if args.max_items is not None and args.max_items < 1:
+        parser.error("--max-items must be >= 1")
+    if args.max_description_chars is not None and args.max_description_chars < 1:
+        parser.error("--max-description-chars must be >= 1")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
     repo = os.environ.get("APPCAST_REPO", DEFAULT_REPO)
     output_path = Path(os.environ.get("APPCAST_OUTPUT", "appcast.xml"))
     policy_path = Path(os.environ.get("APPCAST_POLICY_PATH", DEFAULT_POLICY_PATH))
+    archive_path = (
+        Path(args.archive_output)
+        if args.archive_output
+        else output_path.with_name(DEFAULT_ARCHIVE_FILENAME)
+    )
+    cache_dir = Path(args.cache_dir) if args.cache_dir and not args.no_cache else None
+    sidecar_options = SidecarFetchOptions(
+        workers=args.sidecar_workers,
+        timeout=args.http_timeout,
+        retries=args.retries,
+        max_rate_limit_wait=args.max_rate_limit_wait,
+    )
+    layout = {
+        "max_items": args.max_items,
+        "max_description_chars": args.max_description_chars,
+        "variants": sorted(args.variants),
+        "verify_assets": args.verify_assets,
+    }
+    expected_outputs = [output_path]
+    if args.max_items is not None:
+        expected_outputs.append(archive_path)
+    variant_outputs = [
+        feed_variant_path(output_path, variant) for variant in args.variants
+    ]
 
+    http_cache: HttpCache | None = None
+    asset_cache: AssetCache | None = None
+    verified_cache: VerifiedDigestCache | None = None
+    verify: VerifyOptions | None = None
+    client = build_http_client(sidecar_options)
     try:
         policy = load_policy(policy_path)
-        releases = build_published_releases(repo, policy)
-        tree = render_appcast(repo, releases, policy)
-        write_appcast(output_path, tree)
+        if cache_dir is not None:
+            if args.refresh:
+                http_cache, asset_cache = HttpCache(), AssetCache()
+                verified_cache = VerifiedDigestCache()
+            else:
+                http_cache = load_http_cache(http_cache_path(cache_dir))
+                asset_cache = load_asset_cache(asset_cache_path(cache_dir))
+                verified_cache = load_verified_cache(verified_cache_path(cache_dir))
+        verify = (
+            VerifyOptions(workers=args.verify_workers, cache=verified_cache)
+            if args.verify_assets
+            else None
+        )
+
+        fetched = fetch_releases(repo, http_cache, client)
+        fingerprint = _build_fingerprint(fetched.releases, policy, layout)
+        outputs = [*expected_outputs, *variant_outputs]
+        # Saidas editadas a mao ou revertidas nao batem com o ultimo build.
+        if (
+            http_cache is not None
+            and fetched.not_modified
+            and http_cache.last_build is not None
+            and http_cache.last_build.get("outputs") is not None
+            and http_cache.last_build
+            == {**fingerprint, "outputs": _output_digests(outputs)}
+        ):
+            print(f"OK: {output_path} unchanged (GitHub releases not modified)")
+            return 0
+
+        releases = select_published_releases(
+            fetched.releases, policy, sidecar_options, asset_cache, client, verify,
+        )
+        current, archived = split_releases(releases, args.max_items)
+        feeds = [
+            (
+                path,
+                render_appcast(
+                    repo,
+                    items,
+                    policy,
+                    description_limit=args.max_description_chars,
+                ),
+            )
+            for path, items in zip(expected_outputs, (current, archived))
+        ]
+
+        diffs: list[AppcastDiff] = []
+        for index, (path, tree) in enumerate(feeds):
+            feed_diff = diff_appcast(path, tree) if args.incremental else None
+            files: list[tuple[Path, bytes]] = []
+            if feed_diff is not None and feed_diff.is_empty:
+                xml_bytes = path.read_bytes()
+            else:
+                xml_bytes = serialize_appcast(tree)
+                files.append((path, xml_bytes))
+            if index == 0 and args.variants:
+                files.extend(
+                    (variant_path, data)
+                    for variant_path, data in build_feed_variants(
+                        path, xml_bytes, current, policy, args.variants,
+                    )
+                    if not args.incremental
+                    or not variant_path.is_file()
+                    or variant_path.read_bytes() != data
+                )
+            write_files_atomically(files)
+            if feed_diff is not None:
+                diffs.append(feed_diff)
+            if args.size_report:
+                _print_size_report(path, tree)
+        diff = AppcastDiff.combine(diffs) if args.incremental else None
+
+        if cache_dir is not None and http_cache is not None and asset_cache is not None:
+            http_cache.last_build = {**fingerprint, "outputs": _output_digests(outputs)}
+            save_http_cache(http_cache_path(cache_dir), http_cache)
+            save_asset_cache(asset_cache_path(cache_dir), asset_cache)
+            if verify is not None and verified_cache is not None:
+                save_verified_cache(verified_cache_path(cache_dir), verified_cache)
     except Exception as error:
         print(f"ERROR: {error}", file=sys.stderr)
+        if cache_dir is not None and verify is not None and verified_cache is not None:
+            # Digests ja calculados (inclusive o divergente) evitam baixar de novo.
+            try:
+                save_verified_cache(verified_cache_path(cache_dir), verified_cache)
+            except OSError:
+                pass
         return 1
+    finally:
+        client.close()
+
+    details = ""
+    if asset_cache is not None:
+        details = (
+            f", sidecars cached={asset_cache.hits} fetched={asset_cache.misses}"
+        )
+    if verify is not None:
+        if verified_cache is not None:
+            details += (
+                f", installers verified={verified_cache.misses} "
+                f"cached={verified_cache.hits}"
+            )
+        else:
+            details += f", installers verified={len(releases)}"
+    if archived or args.max_items is not None:
+        details += f", archived={len(archived)} in {archive_path}"
+    if diff is not None and diff.is_empty:
+        print(
+            f"OK: {output_path} unchanged ({len(releases)} release item(s) "
+            f"compared{details})"
+        )
+        return 0
 
+    change_note = ""
+    if diff is not None:
+        change_note = (
+            f"; {diff.changed_items} item(s) changed: added={len(diff.added)} "
+            f"removed={len(diff.removed)} modified={len(diff.modified)}"
+        )
     print(
-        f"OK: rebuilt {output_path} with {len(releases)} release item(s) "
-        f"(blocked={len(policy.blocked_versions)})"
+        f"OK: rebuilt {output_path} with {len(current)} release item(s) "
+        f"(blocked={len(policy.blocked_versions)}{details}){change_note}"
     )
-    return 0
+    return EXIT_FEED_CHANGED if args.exit_code else 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""Unit tests for `scripts/coverage.py`.
+
+The script is loaded by path as `coverage_script` so it never collides
+with the `coverage` package. Synthetic lcov only; no Flutter needed.
+Invoke directly (`python test/scripts/test_coverage.py`) or via
+`python -m unittest test.scripts.test_coverage`.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import sqlite3
+import stat
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from typing import Sequence
+from unittest import mock
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+
+
+def _load_script():
+    spec = importlib.util.spec_from_file_location("coverage_script", SCRIPTS_DIR / "coverage.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+cov = _load_script()
+
+LCOV = """TN:
+SF:lib/a.dart
+DA:1,1
+DA:2,0
+DA:3,4
+LF:3
+LH:2
+end_of_record
+SF:lib/a.g.dart
+DA:1,0
+end_of_record
+SF:/repo/test/helpers/fake.dart
+DA:1,1
+end_of_record
+SF:lib/b.dart\r
+DA:1,0,abc\r
+DA:2,2,def\r
+DA:bad\r
+end_of_record\r
+"""
+
+
+class FilterLcovTest(unittest.TestCase):
+    def test_filter_streams_kept_records_and_summarises_in_one_pass(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "lcov.info"
+            target = Path(tmp) / "lcov.filtered.info"
+            source.write_bytes(LCOV.encode("utf-8"))
+            summary = cov.filter_lcov(source, target)
+            written = target.read_text(encoding="utf-8")
+
+        self.assertEqual(
+            written,
+            "SF:lib/a.dart\nDA:1,1\nDA:2,0\nDA:3,4\nLF:3\nLH:2\nend_of_record\n"
+            "SF:lib/b.dart\nDA:1,0,abc\nDA:2,2,def\nDA:bad\nend_of_record\n",
+        )
+        self.assertEqual(
+            [(item.path, item.lines_found, item.lines_hit) for item in summary.files],
+            [("lib/a.dart", 3, 2), ("lib/b.dart", 2, 1)],
+        )
+        self.assertEqual((summary.lines_found, summary.lines_hit), (5, 3))
+        self.assertEqual(summary.percent, 60.0)
+        self.assertEqual(summary.files[0].percent, 66.67)
+
+    def test_lcov_coverage_reads_without_filtering(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "lcov.info"
+            source.write_text(LCOV, encoding="utf-8")
+            self.assertEqual(cov.lcov_summary(source).lines_found, 7)
+            self.assertEqual(cov.lcov_coverage(source), round(4 * 100 / 7, 2))
+            empty = Path(tmp) / "empty.info"
+            empty.write_text("TN:\n", encoding="utf-8")
+            self.assertEqual(cov.lcov_coverage(empty), 0.0)
+
+
+SHARD_A = """SF:/repo/lib/a.dart
+FN:3,Foo.bar
+FNDA:1,Foo.bar
+BRDA:4,0,0,1
+BRDA:4,0,1,-
+DA:3,1
+DA:4,0
+end_of_record
+"""
+SHARD_B = """SF:/repo/lib/b.dart
+DA:1,1
+end_of_record
+SF:/repo/lib/a.dart
+FN:3,Foo.bar
+FNDA:2,Foo.bar
+BRDA:4,0,0,-
+BRDA:4,0,1,3
+DA:4,2
+DA:5,0
+end_of_record
+"""
+
+# `flutter` falso: grava um registro lcov e eventos JSON por arquivo de teste.
+FAKE_FLUTTER = textwrap.dedent(
+    """\
+    #!{python}
+    import json, os, sys
+    args = sys.argv[1:]
+    if args[:2] == ["pub", "get"]:
+        sys.exit(0)
+    lcov = next(a.split("=", 1)[1] for a in args if a.startswith("--coverage-path="))
+    report = next(a.split(":", 1)[1] for a in args if a.startswith("--file-reporter=json:"))
+    files = [a for a in args if a.endswith("_test.dart")]
+    with open(lcov, "w") as out:
+        lib = os.path.join(os.getcwd(), "lib")
+        out.write(f"SF:{{lib}}/shared.dart\\nDA:1,1\\nend_of_record\\n")
+        for f in files:
+            name = f.split("/")[-1].replace("_test", "")
+            out.write(f"SF:{{lib}}/{{name}}\\nDA:1,1\\nDA:2,0\\nend_of_record\\n")
+    with open(report, "w") as out:
+        for i, f in enumerate(files):
+            out.write(json.dumps({{"type": "suite", "suite": {{"id": i, "path": f}}}}) + "\\n")
+            out.write(json.dumps({{"type": "testStart", "test": {{"id": i, "suiteID": i}}, "time": 0}}) + "\\n")
+            out.write(json.dumps({{"type": "testDone", "testID": i, "time": 1500}}) + "\\n")
+    sys.exit(0)
+    """
+)
+
+
+def _fake_project(root: Path, names: Sequence[str]) -> Path:
+    """Test files under `root/test/unit` and a fake `flutter`; returns its dir."""
+    bin_dir = root / "bin"
+    bin_dir.mkdir()
+    flutter = bin_dir / "flutter"
+    flutter.write_text(FAKE_FLUTTER.format(python=sys.executable), encoding="utf-8")
+    flutter.chmod(flutter.stat().st_mode | stat.S_IEXEC)
+    for name in names:
+        test_file = root / "test" / "unit" / f"{name}_test.dart"
+        test_file.parent.mkdir(parents=True, exist_ok=True)
+        test_file.write_text("void main() {}\n", encoding="utf-8")
+    return bin_dir
+
+
+def _run_main(root: Path, bin_dir: Path, argv: list[str]) -> int:
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        with mock.patch.dict(
+            os.environ, {"PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"},
+        ), mock.patch("sys.stdout"):
+            return cov.main(argv)
+    finally:
+        os.chdir(cwd)
+
+
+class ShardedRunTest(unittest.TestCase):
+    def test_merge_sums_hits_per_line_branch_and_function(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            first = Path(tmp) / "a.info"
+            second = Path(tmp) / "b.info"
+            merged = Path(tmp) / "merged.info"
+            first.write_text(SHARD_A, encoding="utf-8")
+            second.write_text(SHARD_B, encoding="utf-8")
+            cov.merge_lcov([first, second], merged)
+            text = merged.read_text(encoding="utf-8")
+            summary = cov.lcov_summary(merged)
+        self.assertEqual(
+            text,
+            "SF:/repo/lib/a.dart\nFN:3,Foo.bar\nFNDA:3,Foo.bar\nFNF:1\nFNH:1\n"
+            "BRDA:4,0,0,1\nBRDA:4,0,1,3\nBRF:2\nBRH:2\n"
+            "DA:3,1\nDA:4,2\nDA:5,0\nLF:3\nLH:2\nend_of_record\n"
+            "SF:/repo/lib/b.dart\nDA:1,1\nLF:1\nLH:1\nend_of_record\n",
+        )
+        self.assertEqual((summary.lines_found, summary.lines_hit), (4, 3))
+
+    def test_partition_is_longest_processing_time_first(self) -> None:
+        durations = {"a": 10.0, "b": 7.0, "c": 6.0, "d": 4.0, "e": 3.0}
+        buckets = cov.partition_by_duration(list(durations), durations, 2)
+        loads = sorted(sum(durations[name] for name in bucket) for bucket in buckets)
+        self.assertEqual(loads, [14.0, 16.0])
+        self.assertEqual(sorted(map(len, buckets)), [2, 3])
+        # Sem historico para "f": pesa a media dos conhecidos.
+        buckets = cov.partition_by_duration(["a", "f"], {"a": 2.0}, 4)
+        self.assertEqual(sorted(map(len, buckets)), [1, 1])
+
+    def test_sharded_run_merges_lcov_and_records_durations(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            bin_dir = _fake_project(root, ("one", "two", "three"))
+            code = _run_main(root, bin_dir, ["--shards", "2"])
+            merged = cov.lcov_summary(root / "coverage" / "lcov.info")
+            durations = cov.load_durations(root / cov.DURATIONS_PATH)
+
+        self.assertEqual(code, 0)
+        by_path = {item.path: item for item in merged.files}
+        lib = root.resolve() / "lib"
+        self.assertEqual(by_path[f"{lib}/shared.dart"].lines_found, 1)
+        self.assertEqual(
+            sorted(by_path),
+            [f"{lib}/{name}.dart" for name in ("one", "shared", "three", "two")],
+        )
+        self.assertEqual(durations["test/unit/one_test.dart"], 1.5)
+
+
+class TestImpactTest(unittest.TestCase):
+    INDEX = {
+        "commit": None,
+        "tests": {
+            "test/unit/a_test.dart": ["lib/a.dart", "lib/shared.dart"],
+            "test/unit/b_test.dart": ["lib/b.dart", "lib/shared.dart"],
+        },
+    }
+
+    def test_affected_tests_maps_sources_and_falls_back(self) -> None:
+        with mock.patch.object(Path, "is_file", return_value=True):
+            self.assertEqual(
+                cov.affected_tests(["lib/a.dart", "docs/x.md"], self.INDEX),
+                (["test/unit/a_test.dart"], ""),
+            )
+            self.assertEqual(
+                cov.affected_tests(["lib/shared.dart", "test/unit/c_test.dart"], self.INDEX)[0],
+                ["test/unit/a_test.dart", "test/unit/b_test.dart", "test/unit/c_test.dart"],
+            )
+            self.assertEqual(cov.affected_tests(["scripts/x.py"], self.INDEX), ([], ""))
+        for changed in (["lib/new.dart"], ["test/helpers/fake.dart"], ["pubspec.yaml"]):
+            targets, reason = cov.affected_tests(changed, self.INDEX)
+            self.assertIsNone(targets, changed)
+            self.assertIn(changed[0], reason)
+        self.assertIsNone(cov.affected_tests(["lib/a.dart"], None)[0])
+
+    def test_per_file_run_builds_index_used_by_affected_since(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            bin_dir = _fake_project(root, ("one", "two"))
+            (root / "lib").mkdir()
+            (root / "lib" / "one.dart").write_text("// one\n", encoding="utf-8")
+            (root / ".gitignore").write_text("bin/\nbuild/\ncoverage/\n", encoding="utf-8")
+
+            def git(*args: str) -> None:
+                subprocess.run(
+                    ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                    cwd=root, check=True, capture_output=True,
+                )
+
+            git("init", "-q")
+            git("add", ".")
+            git("commit", "-qm", "base")
+
+            self.assertEqual(_run_main(root, bin_dir, ["--per-file", "--shards", "2"]), 0)
+            index = cov.load_impact_index(root / cov.IMPACT_INDEX_PATH)
+            self.assertEqual(
+                index["tests"]["test/unit/one_test.dart"], ["lib/one.dart", "lib/shared.dart"],
+            )
+            self.assertIsNotNone(index["commit"])
+
+            (root / "lib" / "one.dart").write_text("// changed\n", encoding="utf-8")
+            cwd = os.getcwd()
+            os.chdir(root)
+            try:
+                with mock.patch("sys.stdout"):
+                    targets = cov.resolve_affected_targets("HEAD")
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(targets, ["test/unit/one_test.dart"])
+
+
+DIFF = """diff --git a/lib/a.dart b/lib/a.dart
+--- a/lib/a.dart
++++ b/lib/a.dart
+@@ -2,0 +3,2 @@ class A {
++  x();
++  y();
+@@ -10 +12 @@ void f() {
+-  old();
++  new();
+@@ -20,3 +22,0 @@
+-gone
+diff --git a/lib/removed.dart b/lib/removed.dart
+--- a/lib/removed.dart
++++ /dev/null
+@@ -1,2 +0,0 @@
+-a
+-b
+diff --git a/lib/b.dart b/lib/b.dart
+--- a/lib/b.dart
++++ b/lib/b.dart
+@@ -1,0 +1,3 @@
++class B {}
+"""
+
+
+class DiffCoverageTest(unittest.TestCase):
+    def test_hunks_become_merged_new_side_ranges(self) -> None:
+        ranges = cov.parse_diff_ranges(DIFF.splitlines(keepends=True))
+        self.assertEqual(sorted(ranges), ["lib/a.dart", "lib/b.dart"])
+        self.assertEqual(list(ranges["lib/a.dart"]), [3, 4, 12])
+        # Linha adicionada comecando com "++ " nao e cabecalho de arquivo.
+        tricky = (
+            "--- a/lib/c.dart\n+++ b/lib/c.dart\n@@ -1,0 +2,2 @@\n+++ counter;\n+x\n"
+            "@@ -5 +11 @@\n-a\n+b\n"
+        )
+        self.assertEqual(list(cov.parse_diff_ranges(tricky.splitlines())["lib/c.dart"]), [2, 3, 11])
+        merged = cov.LineRanges([(10, 12), (1, 2), (3, 5), (11, 11), (20, 20)])
+        self.assertEqual((merged.starts, merged.ends), ([1, 10, 20], [5, 12, 20]))
+        self.assertEqual([n for n in range(22) if n in merged], [1, 2, 3, 4, 5, 10, 11, 12, 20])
+
+    def test_intersects_da_records_and_counts_unloaded_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "lib").mkdir()
+            (root / "lib" / "c.dart").write_text(
+                "class C {\n\n  // nota\n  void run() {}\n}\n", encoding="utf-8",
+            )
+            lcov = root / "lcov.info"
+            lcov.write_text(
+                f"SF:{root.resolve()}/lib/a.dart\nDA:3,1\nDA:4,0\nDA:5,0\nDA:12,2\nend_of_record\n"
+                "SF:lib/b.dart\nDA:7,0\nend_of_record\n",
+                encoding="utf-8",
+            )
+            changed = cov.parse_diff_ranges(DIFF.splitlines())
+            changed["lib/c.dart"] = cov.LineRanges([(1, 4)])
+            items = cov.diff_coverage(lcov, changed, root)
+
+        by_path = {item.path: item for item in items}
+        self.assertEqual((by_path["lib/a.dart"].covered, by_path["lib/a.dart"].uncovered), ([3, 12], [4]))
+        self.assertEqual((by_path["lib/b.dart"].covered, by_path["lib/b.dart"].uncovered), ([], []))
+        self.assertFalse(by_path["lib/c.dart"].in_report)
+        self.assertEqual(by_path["lib/c.dart"].uncovered, [1, 4])
+        with mock.patch("sys.stdout"):
+            self.assertEqual(cov.report_diff_coverage(items), 40.0)
+            self.assertIsNone(cov.report_diff_coverage(items[1:2]))
+        self.assertEqual(cov._format_lines([1, 2, 3, 7, 9, 10]), "1-3, 7, 9-10")
+
+    def test_filter_only_gates_on_diff_coverage(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "lib").mkdir()
+            (root / "lib" / "a.dart").write_text("a\nb\n", encoding="utf-8")
+
+            def git(*args: str) -> None:
+                subprocess.run(
+                    ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                    cwd=root, check=True, capture_output=True,
+                )
+
+            git("init", "-q")
+            git("add", ".")
+            git("commit", "-qm", "base")
+            (root / "lib" / "a.dart").write_text("a\nb\nc\nd\n", encoding="utf-8")
+            (root / "coverage").mkdir()
+            (root / "coverage" / "lcov.info").write_text(
+                "SF:lib/a.dart\nDA:1,1\nDA:2,1\nDA:3,1\nDA:4,0\nend_of_record\n",
+                encoding="utf-8",
+            )
+            argv = ["--filter-only", "--diff-base", "HEAD", "--fail-under-diff"]
+            self.assertEqual(_run_main(root, root, [*argv, "50"]), 0)
+            self.assertEqual(_run_main(root, root, [*argv, "60"]), 1)
+
+
+def _summary(**files: tuple[int, int]) -> "cov.LcovSummary":
+    return cov.LcovSummary(
+        [cov.FileCoverage(f"lib/{name}.dart", found, hit) for name, (found, hit) in files.items()],
+    )
+
+
+class HistoryTest(unittest.TestCase):
+    def test_flags_coverage_drops_and_slow_tests_against_median_baseline(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Path(tmp) / "history.sqlite3"
+            for seconds in (2.0, 2.5, 9.0, 3.0):
+                cov.record_run(
+                    db,
+                    _summary(a=(10, 9), b=(10, 5)),
+                    {"test/a_test.dart": seconds, "test/fast_test.dart": 0.1},
+                    full_suite=True,
+                    commit="c0",
+                    root=Path(tmp),
+                )
+            self.assertEqual(cov.find_regressions(db), [])
+
+            # Execucao parcial: a cobertura nao entra no baseline, os tempos sim.
+            cov.record_run(
+                db, _summary(a=(10, 1)), {"test/a_test.dart": 5.0, "test/fast_test.dart": 0.5},
+                full_suite=False, commit="c1", root=Path(tmp),
+            )
+            self.assertEqual(
+                cov.find_regressions(db),
+                [cov.Regression("duration", "test/a_test.dart", 2.75, 5.0)],
+            )
+
+            cov.record_run(
+                db, _summary(a=(10, 7), b=(10, 5)), {"test/a_test.dart": 2.0},
+                full_suite=True, commit="c2", root=Path(tmp),
+            )
+            self.assertEqual(
+                cov.find_regressions(db, window=3),
+                [cov.Regression("coverage", "lib/a.dart", 90.0, 70.0)],
+            )
+            self.assertEqual(cov.find_regressions(db, coverage_drop=25.0), [])
+            self.assertEqual(cov.find_regressions(Path(tmp) / "missing.sqlite3"), [])
+
+    def test_runs_are_recorded_and_queried_from_main(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            bin_dir = _fake_project(root, ("one", "two"))
+            self.assertEqual(_run_main(root, bin_dir, []), 0)
+            self.assertEqual(_run_main(root, bin_dir, ["--test-targets", "test/unit/one_test.dart"]), 0)
+            self.assertEqual(_run_main(root, bin_dir, ["--regressions"]), 0)
+            # lcov pronto: parcial por padrao, baseline so com --full-suite.
+            self.assertEqual(_run_main(root, bin_dir, ["--filter-only"]), 0)
+            self.assertEqual(_run_main(root, bin_dir, ["--filter-only", "--full-suite"]), 0)
+
+            connection = sqlite3.connect(root / cov.HISTORY_PATH)
+            try:
+                runs = connection.execute("SELECT full_suite FROM runs ORDER BY id").fetchall()
+                files = connection.execute(
+                    "SELECT path FROM file_coverage WHERE run_id = 1 ORDER BY path",
+                ).fetchall()
+                seconds = connection.execute(
+                    "SELECT path, seconds FROM test_durations WHERE run_id = 2",
+                ).fetchall()
+            finally:
+                connection.close()
+        self.assertEqual(runs, [(1,), (0,), (0,), (1,)])
+        self.assertEqual(files, [("lib/shared.dart",)])
+        self.assertEqual(seconds, [("test/unit/one_test.dart", 1.5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""Unit tests for `scripts/ftp_metrics.py` and its wrapper.
+
+Expected values follow `lib/scripts/ftp_metrics_parser.dart` and
+`scripts/parse_ftp_metrics.dart` (Dart `DateTime`, `toStringAsFixed`,
+`JsonEncoder.withIndent`); no Dart SDK needed.
+Invoke directly (`python test/scripts/test_ftp_metrics.py`) or via
+`python -m unittest test.scripts.test_ftp_metrics`.
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import ftp_metrics as fm  # noqa: E402
+import run_parse_ftp_metrics as wrapper  # noqa: E402
+
+LOG = (
+    "[2026-03-01T10:00:00.123456] [INFO] Upload FTP concluído: /backups/db.zip "
+    "(SHA-256: abc123, hash 120ms)\n"
+    "[2026-03-01T10:05:00+03:00] [ WARN ] Retomando upload de /backups/db.zip "
+    "a partir do byte 1048576\r\n"
+    "[2026-03-01T10:06:00] [INFO] REST STREAM não suportado, fallback para upload completo\r"
+    '[2026-03-01T10:07:00] [ERROR] Upload FTP falhou: Connection reset, "retry" later\n'
+    "2026-03-01 plain line Erro de integridade: SIZE retornou -1\n"
+    "[2026-13-32T25:61:00] [INFO] upload ftp CONCLUÍDO:   /x.zip \u3000 \n"
+    "[2026-03-01T10:08:00.5] [INFO] Upload FTP concluído: /big.zip "
+    "(SHA-256: ff, hash 99999999999999999999ms)\n"
+    "[2026-03-01T10:09:00] [INFO] unrelated\n"
+    "[2026-03-01T10:09:0x] [INFO] Upload FTP concluído: /y\n"
+)
+
+EXPECTED_EVENTS = [
+    {
+        "timestamp": "2026-03-01T10:00:00.123456", "type": "success",
+        "remotePath": "/backups/db.zip", "hashDurationMs": 120,
+        "resumeOffset": None, "errorMessage": None,
+    },
+    {
+        "timestamp": "2026-03-01T07:05:00.000Z", "type": "resume", "remotePath": None,
+        "hashDurationMs": None, "resumeOffset": 1048576, "errorMessage": None,
+    },
+    {
+        "timestamp": "2026-03-01T10:06:00.000", "type": "fallback", "remotePath": None,
+        "hashDurationMs": None, "resumeOffset": None, "errorMessage": None,
+    },
+    {
+        "timestamp": "2026-03-01T10:07:00.000", "type": "error", "remotePath": None,
+        "hashDurationMs": None, "resumeOffset": None,
+        "errorMessage": 'Upload FTP falhou: Connection reset, "retry" later',
+    },
+    {
+        "timestamp": None, "type": "integrity", "remotePath": None, "hashDurationMs": None,
+        "resumeOffset": None,
+        "errorMessage": "2026-03-01 plain line Erro de integridade: SIZE retornou -1",
+    },
+    {
+        "timestamp": "2027-02-02T02:01:00.000", "type": "success", "remotePath": "/x.zip",
+        "hashDurationMs": None, "resumeOffset": None, "errorMessage": None,
+    },
+    {
+        "timestamp": "2026-03-01T10:08:00.500", "type": "success", "remotePath": "/big.zip",
+        "hashDurationMs": None, "resumeOffset": None, "errorMessage": None,
+    },
+    {
+        "timestamp": None, "type": "success", "remotePath": "/y",
+        "hashDurationMs": None, "resumeOffset": None, "errorMessage": None,
+    },
+]
+
+EXPECTED_SUMMARY = """
+=== Métricas FTP ===
+
+Sucessos:     4
+Erros:        1
+Retomadas:    1
+Fallbacks:    1
+Integridade:  1
+
+Taxa de sucesso:  80.0%
+Taxa de erro:    20.0%
+% com retomada:  25.0%
+
+Hash SHA-256 (amostra): média 120ms, max 120ms
+
+"""
+
+
+def _run(paths: list[Path], export: str | None, export_dir: Path) -> str:
+    out = io.StringIO()
+    code = fm.run_metrics(paths, export, export_dir, out=out)
+    assert code == 0, out.getvalue()
+    return out.getvalue()
+
+
+class FtpMetricsTest(unittest.TestCase):
+    def test_summary_and_exports_match_the_dart_output(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            log = root / "app.log"
+            log.write_bytes(LOG.encode("utf-8"))
+            self.assertEqual(_run([log], None, root), EXPECTED_SUMMARY)
+            self.assertEqual(
+                _run([log], "csv", root),
+                EXPECTED_SUMMARY + "\nExportado para: ftp_metrics_export.csv\n",
+            )
+            _run([log], "json", root)
+            csv_text = (root / "ftp_metrics_export.csv").read_bytes().decode("utf-8")
+            json_text = (root / "ftp_metrics_export.json").read_bytes().decode("utf-8")
+
+        self.assertEqual(
+            csv_text.splitlines(keepends=True)[:5],
+            [
+                fm.CSV_HEADER,
+                "2026-03-01T10:00:00.123456,success,/backups/db.zip,120,,\n",
+                "2026-03-01T07:05:00.000Z,resume,,,1048576,\n",
+                "2026-03-01T10:06:00.000,fallback,,,,\n",
+                '2026-03-01T10:07:00.000,error,,,,"Upload FTP falhou: Connection reset, '
+                '""retry"" later"\n',
+            ],
+        )
+        self.assertEqual(len(csv_text.splitlines()), 1 + len(EXPECTED_EVENTS))
+        document = {
+            "summary": {
+                "successCount": 4,
+                "errorCount": 1,
+                "resumeCount": 1,
+                "fallbackCount": 1,
+                "integrityErrorCount": 1,
+                "hashDurationsMs": [120],
+            },
+            "events": EXPECTED_EVENTS,
+        }
+        # JsonEncoder.withIndent('  ') == json.dumps(indent=2) sem escapar nao-ASCII.
+        self.assertEqual(json_text, json.dumps(document, indent=2, ensure_ascii=False))
+
+    def test_empty_input_and_gzip_rotation_stream_the_same_events(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            empty = root / "empty.log"
+            empty.write_text("nada\n", encoding="utf-8")
+            _run([empty], "json", root)
+            self.assertEqual(
+                json.loads((root / "ftp_metrics_export.json").read_text(encoding="utf-8")),
+                {
+                    "summary": {
+                        "successCount": 0, "errorCount": 0, "resumeCount": 0,
+                        "fallbackCount": 0, "integrityErrorCount": 0, "hashDurationsMs": [],
+                    },
+                    "events": [],
+                },
+            )
+            self.assertIn("Taxa de sucesso:  -%", _run([empty], None, root))
+
+            plain = root / "app.log"
+            plain.write_text(LOG * 3, encoding="utf-8")
+            rotated = root / "app.log.1.gz"
+            with gzip.open(rotated, "wt", encoding="utf-8", newline="") as handle:
+                handle.write(LOG * 2)
+            (root / "current.log").write_text(LOG, encoding="utf-8")
+            _run([plain], "csv", root)
+            expected = (root / "ftp_metrics_export.csv").read_text(encoding="utf-8")
+
+            paths = wrapper.resolve_log_paths(str(root))
+            self.assertEqual(
+                [Path(path).name for path in paths],
+                ["app.log", "app.log.1.gz", "current.log", "empty.log"],
+            )
+            _run([rotated, root / "current.log"], "csv", root)
+            self.assertEqual((root / "ftp_metrics_export.csv").read_text(encoding="utf-8"), expected)
+
+    def test_dart_string_and_number_semantics(self) -> None:
+        self.assertEqual(fm._to_fixed(0.25, 1), "0.3")
+        self.assertEqual(fm._to_fixed(100.0, 1), "100.0")
+        self.assertEqual(fm._to_fixed(2 / 3 * 100, 1), "66.7")
+        self.assertIsNone(fm.parse_dart_datetime("2026-03-01T10:00:+"))
+        self.assertEqual(
+            fm.parse_dart_datetime("2026-03-01T00:30:00.1234567-0130").iso8601(),
+            "2026-03-01T02:00:00.123456Z",
+        )
+        self.assertEqual(fm.parse_dart_datetime("2026-03-01T1000").iso8601(), "2026-03-01T10:00:00.000")
+
+        emoji = "\U0001F600"
+        message = "Erro no upload FTP " + "x" * 179 + emoji
+        self.assertEqual(fm._utf16_truncate(message), message)
+        longer = message + "y" * 10
+        truncated = fm._utf16_truncate("z" + longer)
+        self.assertEqual(truncated[-4:], "\ud83d...")
+        self.assertEqual(fm._csv_field(truncated)[-4:], "\ufffd...")
+        self.assertIn('\\ud83d..."', fm._json_dumps({"errorMessage": truncated}))
+
+        event = fm.parse_line(f"[2026-03-01T10:00:00] [ERROR] {'z' + longer}")
+        self.assertEqual(event.error_message, truncated)
+        self.assertIsNone(fm.parse_line("[2026-03-01T10:00:00] [INFO]   "))
+        # Sem a flag `u` do JavaScript, "\u017f" nao casa com "s".
+        self.assertIsNone(fm.parse_line("\u017fize retornou -1"))
+
+    def test_block_reader_matches_a_line_by_line_parse(self) -> None:
+        raw = (LOG * 4).encode("utf-8") + b"Erro no upload FTP \xc3(\r\rsize retornou -1"
+        reference = [
+            event
+            for event in (
+                fm.parse_line(line.rstrip("\n"))
+                for line in io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8", errors="replace")
+            )
+            if event is not None
+        ]
+        self.assertEqual(len(reference), 4 * len(EXPECTED_EVENTS) + 2)
+        for block in (1, 5, 64, fm.READ_BLOCK):
+            with mock.patch.object(fm, "READ_BLOCK", block):
+                events = list(fm.iter_events(fm.iter_candidate_lines(io.BytesIO(raw))))
+            self.assertEqual(events, reference, block)
+
+    def test_parallel_partials_reduce_to_the_sequential_output(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            paths = []
+            for index, body in enumerate([LOG, "sem eventos\n", LOG * 3, "", LOG[:300]]):
+                path = root / f"app_{index}.log"
+                path.write_text(body, encoding="utf-8")
+                paths.append(path)
+            outputs = {}
+            for jobs in (1, 3):
+                for export in ("csv", "json"):
+                    printed = io.StringIO()
+                    self.assertEqual(fm.run_metrics(paths, export, root, out=printed, jobs=jobs), 0)
+                    exported = (root / fm.EXPORT_NAMES[export]).read_text(encoding="utf-8")
+                    outputs[jobs, export] = (printed.getvalue(), exported)
+            json.loads(outputs[3, "json"][1])
+            self.assertEqual(outputs[3, "csv"], outputs[1, "csv"])
+            self.assertEqual(outputs[3, "json"], outputs[1, "json"])
+            self.assertEqual(list(root.glob("*.tmp")), [])
+
+        merged = fm.FtpMetricsSummary()
+        first = fm.FtpMetricsSummary(success_count=2, hash_count=1, hash_total=5, hash_max=5)
+        second = fm.FtpMetricsSummary(error_count=1, hash_count=2, hash_total=30, hash_max=20)
+        for partial in (first, fm.FtpMetricsSummary(), second):
+            merged.merge(partial)
+        self.assertEqual(
+            merged,
+            fm.FtpMetricsSummary(
+                success_count=2, error_count=1, hash_count=3, hash_total=35, hash_max=20,
+            ),
+        )
+
+
+class IncrementalTest(unittest.TestCase):
+    def test_checkpoint_reads_only_appended_bytes_across_rotations(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            checkpoint = root / "cache" / "checkpoint.json"
+            log = root / "app.log"
+
+            def update(*paths: Path) -> fm.IncrementalResult:
+                entries = fm.load_checkpoint(checkpoint)
+                result = fm.update_all(list(paths), entries)
+                fm.save_checkpoint(checkpoint, result.entries)
+                self.assertEqual(result.total, _merged(list(paths)), [p.name for p in paths])
+                return result
+
+            # Linha final sem terminador: conta no total, nao no offset.
+            log.write_text(LOG + "Erro no upload FTP parcial", encoding="utf-8")
+            first = update(log)
+            self.assertEqual(first.entries[0].offset, len(LOG.encode("utf-8")))
+            self.assertEqual(first.entries[0].tail.error_count, 1)
+
+            self.assertEqual((update(log).read, update(log).skipped), (0, 1))
+
+            with log.open("a", encoding="utf-8") as handle:
+                handle.write(" completa\n" + LOG)
+            grown = update(log)
+            self.assertEqual(grown.read, 1)
+            self.assertEqual(grown.delta.error_count, 2)
+
+            # Rotacao por rename: o antigo continua de onde parou, o novo comeca do zero.
+            rotated = root / "app.log.1"
+            log.rename(rotated)
+            log.write_text(LOG, encoding="utf-8")
+            result = update(rotated, log)
+            self.assertEqual(result.delta, _merged([log]))
+
+            # gzip do rotacionado: cabecalho igual, nada recontado.
+            with rotated.open("rb") as source, gzip.open(root / "app.log.1.gz", "wb") as target:
+                target.write(source.read())
+            rotated.unlink()
+            result = update(root / "app.log.1.gz", log)
+            self.assertEqual(fm._event_count(result.delta), 0)
+
+            # Truncado e reescrito: recomeca.
+            log.write_text("Erro de integridade\n", encoding="utf-8")
+            result = update(root / "app.log.1.gz", log)
+            self.assertEqual(result.delta.integrity_error_count, 1)
+            self.assertEqual(result.skipped, 1)
+
+    def test_incremental_export_and_follow_ticks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            log = root / "app.log"
+            log.write_text(LOG, encoding="utf-8")
+            checkpoint = root / "checkpoint.json"
+            printed = io.StringIO()
+            args = (lambda: [log], checkpoint, "csv", root, printed)
+            self.assertEqual(fm.run_incremental(*args), 0)
+            self.assertEqual(
+                (root / "ftp_metrics_export.csv").read_text(encoding="utf-8").count("\n"),
+                1 + len(EXPECTED_EVENTS),
+            )
+            with log.open("a", encoding="utf-8") as handle:
+                handle.write("Erro no upload FTP\n")
+            self.assertEqual(fm.run_incremental(*args), 0)
+            self.assertEqual(
+                (root / "ftp_metrics_export.csv").read_text(encoding="utf-8").splitlines()[1:],
+                [",error,,,,Erro no upload FTP"],
+            )
+            self.assertIn("Erros:        2", printed.getvalue())
+            self.assertIn("1 evento(s) novo(s)", printed.getvalue())
+
+            ticks = io.StringIO()
+            fm.run_incremental(
+                lambda: [log], None, out=ticks, follow=True, interval=0, max_ticks=2,
+            )
+            lines = ticks.getvalue().splitlines()
+            self.assertEqual(len(lines), 2)
+            self.assertIn("+4 sucesso(s), +2 erro(s)", lines[0])
+            self.assertIn("+0 sucesso(s), +0 erro(s)", lines[1])
+
+            # O wrapper ancora o checkpoint relativo na raiz, como as exportacoes.
+            with mock.patch.object(wrapper, "run_incremental", return_value=0) as run:
+                wrapper.main(["--log-path", str(log), "--checkpoint"])
+                wrapper.main(["--log-path", str(log), "--checkpoint", str(checkpoint)])
+            self.assertEqual(
+                [call.args[1] for call in run.call_args_list],
+                [wrapper.PROJECT_ROOT / fm.DEFAULT_CHECKPOINT, checkpoint],
+            )
+
+
+def _day_log(days: int) -> str:
+    """One success per hour, noise in between, mixed line terminators."""
+    lines = []
+    for hour in range(days * 24):
+        stamp = f"2026-03-{1 + hour // 24:02d}T{hour % 24:02d}:00:00.000"
+        terminator = ("\n", "\r\n", "\r")[hour % 3]
+        lines.append(f"[{stamp}] [DEBUG] heartbeat{terminator}")
+        lines.append(f"[{stamp}] [INFO] Upload FTP concluído: /h{hour}.zip (SHA-256: a, hash {hour}ms)\n")
+        lines.append("    at stack frame\n")
+    return "".join(lines)
+
+
+class TimeWindowTest(unittest.TestCase):
+    def test_seek_reads_only_the_window_and_matches_the_dart_filter(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / "app.log"
+            log.write_text(_day_log(5), encoding="utf-8")
+            with gzip.open(Path(tmp) / "app.log.1.gz", "wt", encoding="utf-8") as handle:
+                handle.write(_day_log(5))
+            window = fm.TimeWindow.parse("2026-03-03", "2026-03-03T23:59:59.999")
+            full = fm._consume(fm.iter_lines([log]), None, None, window).summary
+            self.assertEqual(full.success_count, 24)
+            self.assertEqual((full.hash_total, full.hash_max), (sum(range(48, 72)), 71))
+            for path in (log, Path(tmp) / "app.log.1.gz"):
+                self.assertEqual(fm.aggregate(path, None, None, window).summary, full)
+
+            data = log.read_bytes()
+            with log.open("rb") as handle:
+                start, end = fm.window_range(handle, len(data), window)
+            self.assertTrue(data[start:].startswith(b"[2026-03-03T00:00:00.000] [DEBUG]"))
+            self.assertTrue(data[end:].startswith(b"[2026-03-04T00:00:00.000] [DEBUG]"))
+            self.assertLess(end - start, len(data) // 4)
+
+            # Linhas de evento sem data fora da janela: .log e .log.gz contam igual.
+            content = (
+                "Erro de integridade antes de tudo\n"
+                + _day_log(2)
+                + "Erro no upload FTP sem data\n"
+                + _day_log(4)[len(_day_log(2)):]
+            )
+            log.write_text(content, encoding="utf-8")
+            with gzip.open(Path(tmp) / "app.log.1.gz", "wt", encoding="utf-8") as handle:
+                handle.write(content)
+            for bounds in (("2026-03-03", None), ("2026-03-01", "2026-03-02T12:00"), (None, "2026-03-02")):
+                window = fm.TimeWindow.parse(*bounds)
+                plain = fm.aggregate(log, None, None, window).summary
+                with mock.patch.object(fm, "READ_BLOCK", 64):
+                    packed = fm.aggregate(Path(tmp) / "app.log.1.gz", None, None, window).summary
+                self.assertEqual(packed, plain, bounds)
+            self.assertEqual(
+                fm.aggregate(log, None, None, fm.TimeWindow.parse("2026-03-03", None)).summary.error_count,
+                0,
+            )
+
+            # Offset explicito compara o instante, e a janela vazia nao le nada.
+            utc = fm.TimeWindow.parse("2026-03-01T07:05:00Z", None)
+            self.assertTrue(utc.admits(fm.parse_dart_datetime("2026-03-01T10:05:00+03:00")))
+            self.assertFalse(utc.admits(fm.parse_dart_datetime("2026-03-01T10:04:59+03:00")))
+            self.assertTrue(utc.admits(None))
+            empty = fm.TimeWindow.parse("2026-03-09", None)
+            self.assertEqual(fm.aggregate(log, None, None, empty).summary, fm.FtpMetricsSummary())
+
+    def test_files_outside_the_window_are_skipped_and_flags_reach_both_engines(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / "old.log"
+            log.write_text(_day_log(1), encoding="utf-8")
+            old = fm.parse_dart_datetime("2026-03-02").instant() / 1e6
+            os.utime(log, (old, old))
+            with mock.patch.object(fm, "open_log") as open_log:
+                later = fm.TimeWindow.parse("2026-03-05", None)
+                self.assertEqual(fm.aggregate(log, None, None, later).summary.success_count, 0)
+            open_log.assert_not_called()
+            earlier = fm.TimeWindow.parse(None, "2026-02-28")
+            self.assertEqual(list(fm.iter_window_lines(log, earlier)), [])
+
+            with mock.patch("sys.stderr", io.StringIO()), self.assertRaises(SystemExit):
+                wrapper.main(["--log-path", str(log), "--since", "ontem"])
+            with mock.patch.object(wrapper.subprocess, "run") as run:
+                run.return_value.returncode = 0
+                wrapper.main(["--log-path", str(log), "--engine", "dart", "--until", "2026-03-01"])
+            self.assertEqual(run.call_args.args[0][-3:], ["--until", "2026-03-01", str(log)])
+            printed = io.StringIO()
+            with mock.patch("sys.stdout", printed):
+                wrapper.main(["--log-path", str(log), "-j", "1", "--since", "2026-03-01T23:00"])
+            self.assertIn("Sucessos:     1\n", printed.getvalue())
+
+
+def _upload_log(start: int, count: int) -> str:
+    lines = []
+    for index in range(start, start + count):
+        stamp = f"[2026-03-01T{10 + index % 2:02d}:{index % 60:02d}:00]"
+        folder = "/a" if index % 3 else "/b"
+        lines.append(
+            f"{stamp} [INFO] Upload FTP concluído: {folder}/f{index}.zip "
+            f"(SHA-256: ab, hash {index + 1}ms)\n"
+            f"{stamp} [INFO] Upload FTP concluído com sucesso: {folder}/f{index}.zip "
+            f"({index + 1}.00 MB em {index % 5}s)\n"
+        )
+    lines.append("[2026-03-01T11:59:00+00:00] [ERROR] Upload FTP falhou: timeout\n")
+    return "".join(lines)
+
+
+class PercentileTest(unittest.TestCase):
+    def test_sketch_quantiles_stay_within_the_relative_error_and_merge_exactly(self) -> None:
+        values = [(index * 7919) % 10007 / 3 for index in range(5000)]
+        whole = fm.QuantileSketch()
+        parts = [fm.QuantileSketch() for _ in range(3)]
+        for index, value in enumerate(values):
+            whole.add(value)
+            parts[index % 3].add(value)
+        ordered = sorted(values)
+        for q in (0.0, *fm.QUANTILES, 1.0):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertLessEqual(abs(whole.quantile(q) - exact), exact * fm.SKETCH_ACCURACY, q)
+        merged = fm.QuantileSketch()
+        for part in reversed(parts):
+            merged.merge(part)
+        self.assertEqual(merged, whole)
+        self.assertIsNone(fm.QuantileSketch().quantile(0.5))
+        self.assertLess(len(whole.buckets), 1000)
+
+    def test_bucket_exports_and_percentiles_do_not_depend_on_jobs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            paths = [root / "a.log", root / "b.log"]
+            paths[0].write_text(_upload_log(0, 40), encoding="utf-8")
+            paths[1].write_text(_upload_log(40, 40), encoding="utf-8")
+            outputs = []
+            for jobs in (1, 2):
+                printed = io.StringIO()
+                for fmt in ("csv", "json", "sqlite"):
+                    fm.run_metrics(paths, None, root, printed, jobs=jobs, percentiles=True, buckets=fmt)
+                outputs.append(
+                    (
+                        printed.getvalue(),
+                        (root / "ftp_metrics_buckets.csv").read_text(encoding="utf-8"),
+                        (root / "ftp_metrics_buckets.json").read_text(encoding="utf-8"),
+                    )
+                )
+                with sqlite3.connect(root / "ftp_metrics_buckets.sqlite3") as db:
+                    rows = db.execute(
+                        "SELECT hour, remote_dir, success_count, error_count, upload_count "
+                        "FROM buckets ORDER BY hour, remote_dir",
+                    ).fetchall()
+                db.close()
+                self.assertEqual(
+                    rows,
+                    [
+                        ("2026-03-01T10:00:00.000", "*", 40, 0, 40),
+                        ("2026-03-01T10:00:00.000", "/a", 26, None, 26),
+                        ("2026-03-01T10:00:00.000", "/b", 14, None, 14),
+                        ("2026-03-01T11:00:00.000", "*", 40, 0, 40),
+                        ("2026-03-01T11:00:00.000", "/a", 27, None, 27),
+                        ("2026-03-01T11:00:00.000", "/b", 13, None, 13),
+                        ("2026-03-01T11:00:00.000Z", "*", 0, 2, 0),
+                    ],
+                )
+            self.assertEqual(outputs[0], outputs[1])
+            printed, csv_text, json_text = outputs[0]
+            self.assertIn("Sucessos:     80\n", printed)
+            self.assertIn("  Hash SHA-256: 40 / 72 / 79 ms (n=80)", printed)
+            self.assertIn("(n=64)", printed)  # uploads de 0s ficam fora da vazao
+            self.assertTrue(csv_text.startswith(",".join(fm.BUCKET_COLUMNS) + "\n"))
+            self.assertEqual(len(json.loads(json_text)["buckets"]), 7)
+
+            with mock.patch("sys.stderr", io.StringIO()), self.assertRaises(SystemExit):
+                wrapper.main(["--log-path", tmp, "--engine", "dart", "--percentiles"])
+
+
+def _merged(paths: list[Path]) -> "fm.FtpMetricsSummary":
+    total = fm.FtpMetricsSummary()
+    for partial in fm.aggregate_all(paths):
+        total.merge(partial.summary)
+    return total
+
+
+if __name__ == "__main__":
+    unittest.main()
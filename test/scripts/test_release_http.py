@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Unit tests for `scripts/release_http.py`.
+
+A local `http.server` emits the same rate-limit headers as api.github.com;
+sleeping and the clock are injected so the tests never actually wait.
+Invoke directly (`python test/scripts/test_release_http.py`) or via
+`python -m unittest test.scripts.test_release_http`.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import release_http  # noqa: E402
+
+NOW = 1_800_000_000.0
+
+
+class _Server:
+    """Keep-alive server answering from a queue of scripted responses."""
+
+    def __init__(self) -> None:
+        # Cada item: (status, headers, body). Fila vazia = 200 "ok".
+        self.script: list[tuple[int, dict[str, str], bytes]] = []
+        self.requests: list[dict[str, str]] = []
+        self.client_ports: set[int] = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *_args) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802
+                server.requests.append(dict(self.headers.items()))
+                server.client_ports.add(self.client_address[1])
+                status, headers, body = (
+                    server.script.pop(0) if server.script else (200, {}, b"ok")
+                )
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value.replace("{base}", server.base_url))
+                if "Content-Length" in headers:
+                    # Corpo truncado de proposito: fecha a conexao no meio.
+                    self.close_connection = True
+                else:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def __enter__(self) -> "_Server":
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class ReleaseHttpClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sleeps: list[float] = []
+        self.now = NOW
+
+    def _client(self, **kwargs) -> release_http.ReleaseHttpClient:
+        def fake_sleep(seconds: float) -> None:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        client = release_http.ReleaseHttpClient(
+            headers={"User-Agent": "test"},
+            backoff_seconds=0.25,
+            sleep=fake_sleep,
+            clock=lambda: self.now,
+            **kwargs,
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def test_reuses_keep_alive_connection(self) -> None:
+        with _Server() as server:
+            client = self._client()
+            for _ in range(3):
+                self.assertEqual(client.get(f"{server.base_url}/x").body, b"ok")
+        self.assertEqual(client.connection_count, 1)
+        self.assertEqual(len(server.client_ports), 1)
+
+    def test_honours_retry_after_on_secondary_rate_limit(self) -> None:
+        with _Server() as server:
+            server.script.append((429, {"Retry-After": "7"}, b"slow down"))
+            response = self._client().get(f"{server.base_url}/x")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.sleeps, [7.0])
+
+    def test_defers_requests_when_quota_is_exhausted(self) -> None:
+        reset = int(NOW + 30)
+        with _Server() as server:
+            server.script.append(
+                (200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}, b"a"),
+            )
+            client = self._client()
+            client.get(f"{server.base_url}/x")
+            host = server.base_url.removeprefix("http://")
+            self.assertEqual(client.quota(host), (0, float(reset)))
+            client.get(f"{server.base_url}/x")
+        self.assertEqual(self.sleeps, [31.0])
+        self.assertEqual(len(server.requests), 2)
+
+    def test_primary_rate_limit_403_waits_for_reset(self) -> None:
+        reset = int(NOW + 10)
+        with _Server() as server:
+            server.script.append(
+                (403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}, b""),
+            )
+            response = self._client().get(f"{server.base_url}/x")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.sleeps, [11.0])
+
+    def test_rate_limit_beyond_max_wait_raises(self) -> None:
+        with _Server() as server:
+            server.script.append((429, {"Retry-After": "3600"}, b""))
+            with self.assertRaises(release_http.RateLimitError):
+                self._client(max_wait_seconds=60).get(f"{server.base_url}/x")
+
+    def test_plain_403_is_not_retried(self) -> None:
+        with _Server() as server:
+            server.script.append((403, {}, b"forbidden"))
+            with self.assertRaises(release_http.HttpError) as ctx:
+                self._client().get(f"{server.base_url}/x")
+        self.assertEqual(ctx.exception.status, 403)
+        self.assertEqual(self.sleeps, [])
+
+    def test_retries_5xx_with_exponential_backoff(self) -> None:
+        with _Server() as server:
+            server.script.extend([(502, {}, b""), (503, {}, b"")])
+            response = self._client(retries=2).get(f"{server.base_url}/x")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.sleeps, [0.25, 0.5])
+
+    def test_returns_304_without_raising(self) -> None:
+        with _Server() as server:
+            server.script.append((304, {"ETag": '"abc"'}, b""))
+            response = self._client().get(
+                f"{server.base_url}/x", {"If-None-Match": '"abc"'},
+            )
+        self.assertEqual(response.status, 304)
+        self.assertEqual(response.header("etag"), '"abc"')
+
+    def test_cross_host_redirect_drops_authorization(self) -> None:
+        with _Server() as storage, _Server() as api:
+            api.script.append((302, {"Location": f"{storage.base_url}/blob"}, b""))
+            client = self._client()
+            response = client.get(
+                f"{api.base_url}/asset", {"Authorization": "Bearer secret"},
+            )
+        self.assertEqual(response.body, b"ok")
+        self.assertEqual(api.requests[0].get("Authorization"), "Bearer secret")
+        self.assertNotIn("Authorization", storage.requests[0])
+
+    def test_download_resumes_with_range_after_dropped_connection(self) -> None:
+        payload = b"0123456789"
+        received: list[bytes] = []
+
+        class Sink:
+            def write(self, chunk: bytes) -> None:
+                received.append(chunk)
+
+            def restart(self) -> None:
+                received.clear()
+
+        with _Server() as server:
+            server.script.extend([
+                (200, {"Content-Length": "10"}, payload[:4]),
+                (206, {"Content-Range": "bytes 4-9/10"}, payload[4:]),
+            ])
+            size = self._client(retries=2).download(
+                f"{server.base_url}/installer", Sink(), chunk_size=3,
+            )
+        self.assertEqual(size, 10)
+        self.assertEqual(b"".join(received), payload)
+        self.assertNotIn("Range", server.requests[0])
+        self.assertEqual(server.requests[1].get("Range"), "bytes=4-")
+
+    def test_download_restarts_sink_when_range_is_ignored(self) -> None:
+        payload = b"0123456789"
+        received: list[bytes] = []
+        restarts: list[int] = []
+
+        class Sink:
+            def write(self, chunk: bytes) -> None:
+                received.append(chunk)
+
+            def restart(self) -> None:
+                restarts.append(len(received))
+                received.clear()
+
+        with _Server() as server:
+            server.script.extend([
+                (200, {"Content-Length": "10"}, payload[:4]),
+                (200, {}, payload),
+            ])
+            self._client(retries=2).download(f"{server.base_url}/installer", Sink())
+        self.assertEqual(b"".join(received), payload)
+        self.assertEqual(len(restarts), 1)
+
+    def test_parse_retry_after_accepts_http_date(self) -> None:
+        value = "Fri, 15 Jan 2027 08:00:10 GMT"
+        now = release_http.parsedate_to_datetime(value).timestamp() - 10
+        self.assertEqual(release_http._parse_retry_after(value, now), 10.0)
+        self.assertIsNone(release_http._parse_retry_after("soon", now))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Unit tests for `scripts/scan_encoding.py`.
+
+Fixtures build mojibake at runtime (UTF-8 bytes decoded as CP1252) so this
+file itself stays clean for the scanner.
+Invoke directly (`python test/scripts/test_scan_encoding.py`) or via
+`python -m unittest test.scripts.test_scan_encoding`.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import scan_encoding as scan  # noqa: E402
+from bench_scan_encoding import build_corpus, legacy_scan_bytes  # noqa: E402
+
+
+def _mojibake(text: str) -> str:
+    return text.encode("utf-8").decode("cp1252")
+
+
+def _write_tree(root: Path) -> None:
+    (root / "lib").mkdir()
+    (root / "build").mkdir()
+    (root / "lib" / "ok.dart").write_text("// configuração\n", encoding="utf-8")
+    (root / "lib" / "bad.dart").write_text(
+        f"// {_mojibake('versão')}\nfinal a = 1;\n", encoding="utf-8",
+    )
+    (root / "lib" / "latin1.txt").write_bytes("ação\n".encode("latin-1"))
+    (root / "build" / "ignored.dart").write_text(_mojibake("não"), encoding="utf-8")
+    (root / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff")
+    for index in range(20):
+        (root / "lib" / f"gen_{index:02d}.dart").write_text(
+            f"final v{index} = {index};\r\n", encoding="utf-8",
+        )
+
+
+class ScanEncodingTest(unittest.TestCase):
+    def test_collect_paths_is_sorted_and_skips_dirs_and_extensions(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write_tree(root)
+            rels = [path.relative_to(root).as_posix() for path in scan.collect_paths(root)]
+        self.assertEqual(rels, sorted(rels))
+        self.assertIn("lib/bad.dart", rels)
+        self.assertNotIn("build/ignored.dart", rels)
+        self.assertNotIn("image.png", rels)
+
+    def test_walker_prunes_multi_segment_skips_and_honours_gitignore(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            files = [
+                "lib/a.dart",
+                "lib/generated/keep.dart",
+                "lib/generated/skip.g.dart",
+                "logs/app.log",
+                "logs/keep.log",
+                "widgetbook/test/goldens/golden.txt",
+                "widgetbook/test/widget_test.dart",
+                "windows/flutter/ephemeral/x.h",
+                "tools/windows/flutter/ephemeral/y.h",
+                "nested/.gitignore",
+                "nested/out/z.txt",
+                "nested/src/out.txt",
+            ]
+            for rel in files:
+                (root / rel).parent.mkdir(parents=True, exist_ok=True)
+                (root / rel).write_text("x", encoding="utf-8")
+            (root / ".gitignore").write_text(
+                "# comentario\n*.log\n!keep.log\nlib/**/*.g.dart\n", encoding="utf-8",
+            )
+            (root / "nested" / ".gitignore").write_text("out/\n", encoding="utf-8")
+
+            rels = [path.relative_to(root).as_posix() for path in scan.collect_paths(root)]
+            everything = [
+                path.relative_to(root).as_posix()
+                for path in scan.collect_paths(root, gitignore=False)
+            ]
+        self.assertEqual(
+            rels,
+            [
+                ".gitignore",
+                "lib/a.dart",
+                "lib/generated/keep.dart",
+                "logs/keep.log",
+                "nested/.gitignore",
+                "nested/src/out.txt",
+                "tools/windows/flutter/ephemeral/y.h",
+                "widgetbook/test/widget_test.dart",
+            ],
+        )
+        self.assertIn("logs/app.log", everything)
+        self.assertIn("nested/out/z.txt", everything)
+        self.assertNotIn("widgetbook/test/goldens/golden.txt", everything)
+        self.assertFalse(scan.should_scan(Path("widgetbook/test/goldens/golden.txt")))
+        self.assertTrue(scan.should_scan(Path("tools/windows/flutter/ephemeral/y.h")))
+
+    def test_parallel_results_match_sequential_order(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write_tree(root)
+            paths = scan.collect_paths(root)
+            sequential = list(scan.iter_scan_results(paths, jobs=1))
+            parallel = list(scan.iter_scan_results(paths, jobs=3, batch_size=2))
+        self.assertEqual(parallel, sequential)
+        issues = dict(sequential)
+        self.assertEqual(issues[root / "lib" / "ok.dart"], [])
+        self.assertEqual(
+            [kind for kind, _ in issues[root / "lib" / "bad.dart"]],
+            ["mojibake", "mojibake"],
+        )
+        self.assertEqual(issues[root / "lib" / "latin1.txt"][0][0], "invalid_utf8")
+
+    def test_main_exit_code_and_summary_do_not_depend_on_jobs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write_tree(root)
+            outputs = []
+            for jobs in ("1", "2"):
+                stdout = io.StringIO()
+                with redirect_stdout(stdout):
+                    code = scan.main(
+                        ["--root", tmp, "--jobs", jobs, "--batch-size", "4", "--no-cache"],
+                    )
+                self.assertEqual(code, 1)
+                outputs.append(stdout.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn("Issues in 2 file(s)", outputs[0])
+        self.assertIn("  invalid_utf8: 1", outputs[0])
+
+    def test_single_pass_matches_legacy_on_edge_cases(self) -> None:
+        words = _mojibake("operação não versão atualização")
+        samples = [
+            "",
+            "plain ascii\n",
+            f"{words}\n{words}",
+            # PT word overlapping another PT word and literals inside them.
+            _mojibake("aação ção ç ã") * 3,
+            # C1 inside a pattern, NEL/LS/CR as line breaks, U+FFFD.
+            "a\u201d\u00e2\u20ac\x9d\x85x\x9dy\r" + words + "\u2028z\ufffd\n\ufffd",
+            f"\ufeff{words}\r\nline\nmixed\r\n",
+            f"{_mojibake('ç')}\n" * 50 + "trailing" + _mojibake("ã"),
+        ]
+        for sample in samples:
+            raw = sample.encode("utf-8")
+            self.assertEqual(scan.scan_bytes(raw), legacy_scan_bytes(raw), sample)
+        for kind in ("clean", "sparse", "dense"):
+            raw = build_corpus(kind, 64 * 1024, seed=11)
+            self.assertEqual(scan.scan_bytes(raw), legacy_scan_bytes(raw), kind)
+
+    def test_binary_content_is_skipped_but_utf16_still_fails(self) -> None:
+        self.assertTrue(scan.looks_binary(b"MZ\x90\x00\x03"))
+        self.assertTrue(scan.looks_binary(bytes(range(1, 32)) * 4))
+        self.assertFalse(scan.looks_binary("ação\r\n\tx".encode("latin-1")))
+        self.assertFalse(scan.looks_binary("x".encode("utf-16")))
+        with tempfile.TemporaryDirectory() as tmp:
+            blob = Path(tmp) / "data.unknownext"
+            blob.write_bytes(b"\x00\x01\x02" + _mojibake("não").encode("utf-8"))
+            self.assertEqual(scan.scan_file(blob), [])
+            utf16 = Path(tmp) / "notes.txt"
+            utf16.write_bytes("ação".encode("utf-16"))
+            self.assertEqual(scan.scan_file(utf16)[0][0], "invalid_utf8")
+
+    def test_mmap_path_matches_in_memory_scan(self) -> None:
+        words = _mojibake("operação não versão")
+        samples = [
+            build_corpus("sparse", 32 * 1024, seed=2),
+            build_corpus("dense", 16 * 1024, seed=3),
+            f"\ufeff{words}\r\nok\nmixed\r\n\ufffd tail {words}".encode("utf-8"),
+            "a\u00e2\u20ac\x9d\x9dy\r\nz\n".encode("utf-8"),
+            "ok\n".encode("utf-8") * 20 + "ação".encode("latin-1") + b"\n",
+            "x".encode("utf-8") * 30 + b"\xe2\x82",
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "big.log"
+            for raw in samples:
+                path.write_bytes(raw)
+                expected = scan.scan_bytes(raw)
+                # Chunks minusculos forcam CRLF e UTF-8 partidos na fronteira.
+                with mock.patch.object(scan, "MMAP_THRESHOLD", 1), mock.patch.object(
+                    scan, "CHUNK_BYTES", 7,
+                ):
+                    self.assertEqual(scan.scan_file(path), expected)
+
+    def test_cache_reuses_results_by_stat_then_by_content_hash(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write_tree(root)
+            paths = scan.collect_paths(root)
+            cache_path = root / "build" / "cache" / "scan.json"
+
+            cache = scan.ScanCache()
+            first = list(scan.iter_scan_results(paths, cache=cache, root=root))
+            self.assertEqual(cache.hits, 0)
+            scan.save_scan_cache(cache_path, cache)
+
+            bad = root / "lib" / "bad.dart"
+            ok = root / "lib" / "ok.dart"
+            stat = bad.stat()
+            os.utime(bad, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            ok.write_text(f"// {_mojibake('função')}\n", encoding="utf-8")
+
+            cache = scan.load_scan_cache(cache_path)
+            second = dict(
+                scan.iter_scan_results(paths, jobs=2, batch_size=2, cache=cache, root=root),
+            )
+            # Todos menos ok.dart (conteudo mudou) vem do cache.
+            self.assertEqual(cache.hits, len(paths) - 1)
+            self.assertEqual(second[bad], dict(first)[bad])
+            self.assertEqual(second[ok], scan.scan_file(ok))
+            self.assertTrue(second[ok])
+            self.assertEqual(
+                cache.entries["lib/bad.dart"]["mtime_ns"], bad.stat().st_mtime_ns,
+            )
+
+    def test_stale_cache_schema_or_scanner_is_ignored(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = Path(tmp) / "scan.json"
+            cache_path.write_text('{"schema_version": 1, "scanner": "old", "files": {"a": {}}}')
+            self.assertEqual(scan.load_scan_cache(cache_path).entries, {})
+            cache_path.write_text("not json")
+            self.assertEqual(scan.load_scan_cache(cache_path).entries, {})
+
+    def test_main_staged_and_paths_selection(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write_tree(root)
+
+            def git(*args: str) -> None:
+                subprocess.run(
+                    ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                    cwd=root, check=True, capture_output=True,
+                )
+
+            git("init", "-q")
+            git("add", "lib/ok.dart", "lib/gen_00.dart")
+            self.assertEqual(
+                [path.name for path in scan.select_paths(root, scan.staged_paths(root))],
+                ["gen_00.dart", "ok.dart"],
+            )
+            git("commit", "-qm", "base")
+            git("add", "lib/bad.dart")
+
+            stdout = io.StringIO()
+            with redirect_stdout(stdout):
+                code = scan.main(["--root", tmp, "--staged", "--jobs", "1"])
+            self.assertEqual(code, 1)
+            self.assertIn("Scanned 1 files", stdout.getvalue())
+            self.assertIn("=== lib/bad.dart ===", stdout.getvalue())
+
+            stdout = io.StringIO()
+            with redirect_stdout(stdout):
+                code = scan.main(["--root", tmp, "--paths", "lib/ok.dart", "build", "--no-cache"])
+            self.assertEqual(code, 0)
+            self.assertIn("Scanned 1 files", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Unit tests for `scripts/simulate_rollout.py`.
+
+Invoke directly (`python test/scripts/test_simulate_rollout.py`) or via
+`python -m unittest test.scripts.test_simulate_rollout`.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import simulate_rollout as sim  # noqa: E402
+from sync_appcast_from_releases import AppcastPolicy  # noqa: E402
+
+
+def _policy(rollout: dict[str, int], min_supported: str | None = None) -> AppcastPolicy:
+    return AppcastPolicy(
+        blocked_versions=frozenset(),
+        min_supported_app_version=min_supported,
+        rollout_percentages=rollout,
+        min_publication_age_minutes={},
+    )
+
+
+class SimulateRolloutTest(unittest.TestCase):
+    def test_fnv1a32_matches_reference_vectors(self) -> None:
+        self.assertEqual(sim.fnv1a32(""), 0x811C9DC5)
+        self.assertEqual(sim.fnv1a32("a"), 0xE40C292C)
+        self.assertEqual(sim.fnv1a32("foobar"), 0xBF9CF968)
+
+    def test_passes_rollout_mirrors_dart_edge_cases(self) -> None:
+        self.assertTrue(sim.passes_rollout(None, "3.5.0", "m"))
+        self.assertTrue(sim.passes_rollout(100, "3.5.0", "m"))
+        self.assertFalse(sim.passes_rollout(0, "3.5.0", ""))
+        self.assertTrue(sim.passes_rollout(1, "3.5.0", "   "))
+        self.assertTrue(sim.passes_rollout(1, "3.5.0", None))
+
+    def test_batched_buckets_match_scalar_hash(self) -> None:
+        ids = sim.synthetic_machine_ids(300, seed=7)
+        # Tamanhos variados, UTF-8 multibyte e id vazio no meio.
+        ids[5] = "maquina-ção"
+        ids[17] = ""
+        ids[42] = "x"
+        buckets = sim.rollout_buckets(["3.5.0", "10.0.0-beta.1"], ids, batch_size=64)
+        for version, values in buckets.items():
+            self.assertEqual(len(values), len(ids))
+            for machine, bucket in zip(ids, values):
+                expected = (
+                    sim.EMPTY_ID_BUCKET
+                    if not machine
+                    else sim.fnv1a32(f"{version}:{machine}") % 100
+                )
+                self.assertEqual(bucket, expected, machine)
+
+    def test_cohort_mask_agrees_with_passes_rollout(self) -> None:
+        ids = [*sim.synthetic_machine_ids(500, seed=1), ""]
+        buckets = sim.rollout_buckets(["3.5.0"], ids)["3.5.0"]
+        for pct in (None, -5, 0, 1, 25, 99, 100, 150):
+            mask = sim.cohort_mask(buckets, pct).to_bytes(len(ids), "little")
+            expected = bytes(sim.passes_rollout(pct, "3.5.0", machine) for machine in ids)
+            self.assertEqual(mask, expected, pct)
+
+    def test_version_reach_reports_uniform_buckets(self) -> None:
+        ids = sim.synthetic_machine_ids(50_000, seed=3)
+        buckets = sim.rollout_buckets(["3.5.0"], ids)["3.5.0"]
+        reach = sim.version_reach("3.5.0", 25, buckets)
+        self.assertAlmostEqual(reach.reach, 0.25, delta=0.01)
+        self.assertEqual(sum(reach.histogram), 50_000)
+        self.assertGreater(reach.p_value, 0.001)
+
+    def test_simulate_updates_respects_order_and_min_supported(self) -> None:
+        ids = sim.synthetic_machine_ids(2_000, seed=5)
+        policy = _policy({"3.5.0": 30}, min_supported="3.3.0")
+        versions = ["3.4.1", "3.5.0"]
+        buckets = sim.rollout_buckets(versions, ids)
+        slices = sim.allocate_installed(len(ids), {"3.4.0": 2, "3.4.1": 1, "3.2.0": 1})
+        self.assertEqual([s[2] - s[1] for s in slices], [1000, 500, 500])
+        outcomes = {o.installed_version: o for o in sim.simulate_updates(
+            versions, policy, buckets, slices,
+        )}
+
+        in_cohort = [sim.passes_rollout(30, "3.5.0", machine) for machine in ids]
+        first = outcomes["3.4.0"]
+        self.assertEqual(first.targets["3.5.0"], sum(in_cohort[:1000]))
+        self.assertEqual(first.targets["3.4.1"], 1000 - sum(in_cohort[:1000]))
+        self.assertEqual(first.not_updated, 0)
+        # Ja na 3.4.1: so quem esta na coorte da 3.5.0 atualiza.
+        self.assertEqual(outcomes["3.4.1"].targets, {"3.5.0": sum(in_cohort[1000:1500])})
+        blocked = outcomes["3.2.0"]
+        self.assertEqual(blocked.targets, {})
+        self.assertEqual(blocked.blocked_by_min_supported, 500)
+
+    def test_main_reads_machine_ids_with_installed_column(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            policy_path = Path(tmp) / "policy.json"
+            policy_path.write_text(json.dumps({"rollout_percentages": {"v3.5.0": 50}}))
+            ids_path = Path(tmp) / "ids.txt"
+            ids_path.write_text("# id,versao\nmachine-a,3.4.0\nmachine-b,v3.4.0\n\nmachine-c\n")
+            stdout = io.StringIO()
+            with redirect_stdout(stdout):
+                code = sim.main([
+                    "--policy", str(policy_path), "--machine-ids", str(ids_path), "--json",
+                ])
+        self.assertEqual(code, 0)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report["versions"][0]["version"], "3.5.0")
+        self.assertEqual(report["versions"][0]["machines"], 3)
+        expected = sum(
+            sim.passes_rollout(50, "3.5.0", machine) for machine in ("machine-a", "machine-b")
+        )
+        installed = report["installed"][0]
+        self.assertEqual(installed["installed_version"], "3.4.0")
+        self.assertEqual(installed["machines"], 2)
+        self.assertEqual(sum(installed["targets"].values()), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""Unit tests for `scripts/sync_appcast_from_releases.py`.
+
+A local `http.server` stands in for api.github.com (via `GITHUB_API_URL`)
+and for the release asset downloads, so no network access is needed.
+Invoke directly (`python test/scripts/test_sync_appcast_from_releases.py`)
+or via `python -m unittest test.scripts.test_sync_appcast_from_releases`.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import sync_appcast_from_releases as sync  # noqa: E402
+
+REPO = "owner/app"
+
+
+class _FakeGitHub:
+    """Serves a paginated releases listing plus installer/sidecar assets."""
+
+    def __init__(self, releases_count: int, per_page: int) -> None:
+        self.per_page = per_page
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        self.assets: dict[str, bytes] = {}
+        # path -> quantas respostas 503 emitir antes de servir o asset.
+        self.failures: dict[str, int] = {}
+        self.releases: list[dict] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        for index in range(releases_count):
+            self.add_release(f"1.0.{index}", f"2026-01-{index + 1:02d}T00:00:00Z")
+
+    def add_release(self, version: str, published_at: str) -> None:
+        name = f"BackupDatabase-Setup-{version}.exe"
+        installer = f"installer-{version}".encode()
+        digest = hashlib.sha256(installer).hexdigest()
+        self.assets[f"/dl/{name}"] = installer
+        self.assets[f"/dl/{name}.sha256"] = f"{digest}  {name}\n".encode()
+        asset_id = 1000 + len(self.releases) * 2
+        self.releases.insert(
+            0,
+            {
+                "tag_name": f"v{version}",
+                "published_at": published_at,
+                "updated_at": published_at,
+                "body": f"Notes {version}",
+                "assets": [
+                    {
+                        "id": asset_id,
+                        "name": name,
+                        "size": len(installer),
+                        "updated_at": published_at,
+                        "browser_download_url": f"{self.base_url}/dl/{name}",
+                    },
+                    {
+                        "id": asset_id + 1,
+                        "name": f"{name}.sha256",
+                        "size": 0,
+                        "updated_at": published_at,
+                        "browser_download_url": f"{self.base_url}/dl/{name}.sha256",
+                    },
+                ],
+            },
+        )
+
+    def releases_requests(self) -> list[tuple[str, dict[str, str]]]:
+        return [item for item in self.requests if "/releases" in item[0]]
+
+    def _page(self, page: int) -> tuple[bytes, str | None]:
+        start = (page - 1) * self.per_page
+        chunk = self.releases[start : start + self.per_page]
+        link = None
+        if start + self.per_page < len(self.releases):
+            link = (
+                f'<{self.base_url}/repos/{REPO}/releases?per_page=100&page={page + 1}>; '
+                'rel="next"'
+            )
+        return json.dumps(chunk).encode(), link
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_args) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802
+                fake.requests.append((self.path, dict(self.headers.items())))
+                parsed = urlsplit(self.path)
+                if parsed.path == f"/repos/{REPO}/releases":
+                    page = int(parse_qs(parsed.query).get("page", ["1"])[0])
+                    body, link = fake._page(page)
+                    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    if link:
+                        self.send_header("Link", link)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                remaining = fake.failures.get(parsed.path, 0)
+                if remaining > 0:
+                    fake.failures[parsed.path] = remaining - 1
+                    self.send_error(503)
+                    return
+                payload = fake.assets.get(parsed.path)
+                if payload is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def __enter__(self) -> "_FakeGitHub":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class SyncAppcastTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = Path(self._tmp.name)
+        self.output = self.root / "appcast.xml"
+        self.cache_dir = self.root / "cache"
+        self.policy_path = self.root / "appcast_policy.json"
+
+    def _run_main(self, fake: _FakeGitHub, *argv: str) -> tuple[int, str]:
+        env = {
+            "GITHUB_API_URL": fake.base_url,
+            "APPCAST_REPO": REPO,
+            "APPCAST_OUTPUT": str(self.output),
+            "APPCAST_POLICY_PATH": str(self.policy_path),
+        }
+        stdout = io.StringIO()
+        with mock.patch.dict(os.environ, env), redirect_stdout(stdout), \
+                redirect_stderr(io.StringIO()):
+            code = sync.main(["--cache-dir", str(self.cache_dir), *argv])
+        return code, stdout.getvalue()
+
+    def test_next_page_url_parses_link_header(self) -> None:
+        header = (
+            '<https://api.example/x?page=2>; rel="next", '
+            '<https://api.example/x?page=5>; rel="last"'
+        )
+        self.assertEqual(sync._next_page_url(header), "https://api.example/x?page=2")
+        self.assertIsNone(sync._next_page_url('<https://a/x?page=1>; rel="prev"'))
+        self.assertIsNone(sync._next_page_url(None))
+
+    def test_fetch_releases_follows_pagination(self) -> None:
+        with _FakeGitHub(releases_count=5, per_page=2) as fake, \
+                mock.patch.dict(os.environ, {"GITHUB_API_URL": fake.base_url}):
+            fetched = sync.fetch_releases(REPO, sync.HttpCache())
+        self.assertEqual(len(fetched.releases), 5)
+        self.assertFalse(fetched.not_modified)
+        self.assertEqual(len(fake.releases_requests()), 3)
+
+    def test_second_run_short_circuits_on_304(self) -> None:
+        with _FakeGitHub(releases_count=3, per_page=100) as fake:
+            code, out = self._run_main(fake)
+            self.assertEqual(code, 0, out)
+            self.assertIn("rebuilt", out)
+            first_feed = self.output.read_bytes()
+
+            fake.requests.clear()
+            code, out = self._run_main(fake)
+            self.assertEqual(code, 0, out)
+            self.assertIn("unchanged", out)
+            self.assertEqual(len(fake.requests), 1)
+            self.assertIn("If-None-Match", fake.requests[0][1])
+            self.assertEqual(self.output.read_bytes(), first_feed)
+
+    def test_304_still_rebuilds_edited_output_or_changed_script(self) -> None:
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake)[0], 0)
+            first_feed = self.output.read_bytes()
+
+            self.output.write_bytes(first_feed.replace(b"Version 1.0.1", b"Version 9.9.9"))
+            code, out = self._run_main(fake)
+            self.assertEqual(code, 0, out)
+            self.assertIn("rebuilt", out)
+            self.assertEqual(self.output.read_bytes(), first_feed)
+
+            code, out = self._run_main(fake)
+            self.assertIn("unchanged", out)
+
+            # Outro codigo de renderizacao: o fingerprint muda mesmo com 304.
+            patched = self.root / "sync_appcast_from_releases.py"
+            patched.write_bytes(Path(sync.__file__).read_bytes() + b"\n# render v2\n")
+            with mock.patch.object(sync, "__file__", str(patched)):
+                code, out = self._run_main(fake)
+        self.assertEqual(code, 0, out)
+        self.assertIn("rebuilt", out)
+
+    def test_new_release_invalidates_cache(self) -> None:
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake)[0], 0)
+            fake.add_release("2.0.0", "2026-02-01T00:00:00Z")
+            code, out = self._run_main(fake)
+        self.assertEqual(code, 0, out)
+        self.assertIn("3 release item(s)", out)
+        self.assertIn(b"Version 2.0.0", self.output.read_bytes())
+
+    def test_resolve_release_assets_keeps_order_and_retries_5xx(self) -> None:
+        options = sync.SidecarFetchOptions(workers=4, retries=2, backoff_seconds=0)
+        with _FakeGitHub(releases_count=6, per_page=100) as fake:
+            for path in list(fake.assets)[:4]:
+                if path.endswith(".sha256"):
+                    fake.failures[path] = 2
+            candidates = [sync._locate_installer(r) for r in fake.releases]
+            assets = sync.resolve_release_assets(candidates, options)
+        self.assertEqual([a.name for a in assets], [c.name for c in candidates])
+        for asset in assets:
+            installer = fake.assets[f"/dl/{asset.name}"]
+            self.assertEqual(asset.sha256, hashlib.sha256(installer).hexdigest())
+
+    def test_resolve_release_assets_gives_up_after_retries(self) -> None:
+        options = sync.SidecarFetchOptions(workers=2, retries=1, backoff_seconds=0)
+        with _FakeGitHub(releases_count=3, per_page=100) as fake:
+            sidecar = next(p for p in fake.assets if p.endswith(".sha256"))
+            fake.failures[sidecar] = 5
+            candidates = [sync._locate_installer(r) for r in fake.releases]
+            with self.assertRaisesRegex(RuntimeError, "failed to download checksum"):
+                sync.resolve_release_assets(candidates, options)
+
+    def test_asset_cache_skips_known_sidecars(self) -> None:
+        with _FakeGitHub(releases_count=3, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake)[0], 0)
+            fake.add_release("2.0.0", "2026-02-01T00:00:00Z")
+            fake.requests.clear()
+            code, out = self._run_main(fake)
+            sidecar_requests = [p for p, _ in fake.requests if p.endswith(".sha256")]
+        self.assertEqual(code, 0, out)
+        self.assertIn("sidecars cached=3 fetched=1", out)
+        self.assertEqual(sidecar_requests, ["/dl/BackupDatabase-Setup-2.0.0.exe.sha256"])
+
+    def test_reuploaded_asset_misses_cache(self) -> None:
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake)[0], 0)
+            fake.releases[0]["assets"][1]["updated_at"] = "2026-03-01T00:00:00Z"
+            code, out = self._run_main(fake, "--no-cache")
+            self.assertIn("rebuilt", out)
+            code, out = self._run_main(fake)
+        self.assertEqual(code, 0, out)
+        self.assertIn("sidecars cached=1 fetched=1", out)
+
+    def test_asset_cache_with_other_schema_is_ignored(self) -> None:
+        path = self.root / "assets.json"
+        path.write_text(json.dumps({"schema_version": 999, "assets": {}}))
+        self.assertEqual(sync.load_asset_cache(path).entries, {})
+        path.write_text("{not json")
+        self.assertEqual(sync.load_asset_cache(path).entries, {})
+
+    def test_refresh_refetches_everything(self) -> None:
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake)[0], 0)
+            code, out = self._run_main(fake, "--refresh")
+        self.assertEqual(code, 0, out)
+        self.assertIn("sidecars cached=0 fetched=2", out)
+
+    def test_incremental_skips_identical_feed(self) -> None:
+        with _FakeGitHub(releases_count=3, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake)[0], 0)
+            before = self.output.stat().st_mtime_ns
+            code, out = self._run_main(fake, "--no-cache", "--incremental", "--exit-code")
+        self.assertEqual(code, 0, out)
+        self.assertIn("unchanged", out)
+        self.assertEqual(self.output.stat().st_mtime_ns, before)
+
+    def test_incremental_reports_changed_items(self) -> None:
+        with _FakeGitHub(releases_count=3, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake)[0], 0)
+            self.policy_path.write_text(
+                json.dumps({"rollout_percentages": {"1.0.1": 10}}),
+            )
+            fake.add_release("2.0.0", "2026-02-01T00:00:00Z")
+            code, out = self._run_main(fake, "--incremental", "--exit-code")
+        self.assertEqual(code, 3, out)
+        self.assertEqual(sync.EXIT_FEED_CHANGED, 3)
+        self.assertIn("2 item(s) changed: added=1 removed=0 modified=1", out)
+        self.assertIn(b'sparkle:rolloutPercentage="10"', self.output.read_bytes())
+        self.assertEqual(
+            sorted(p.name for p in self.root.iterdir() if p.is_file()),
+            ["appcast.xml", "appcast_policy.json"],
+        )
+
+    def test_exit_code_requires_incremental(self) -> None:
+        with redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit) as ctx:
+            sync._parse_args(["--exit-code"])
+        self.assertEqual(ctx.exception.code, 2)
+        self.assertIn("--exit-code needs --incremental", stderr.getvalue())
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            code, out = self._run_main(fake, "--incremental", "--exit-code")
+            self.assertEqual(code, sync.EXIT_FEED_CHANGED, out)
+            code, out = self._run_main(fake, "--incremental", "--exit-code")
+        # Segunda rodada: 304 e saidas intactas, nada mudou.
+        self.assertEqual(code, 0, out)
+        self.assertIn("unchanged", out)
+
+    def test_diff_appcast_treats_unparsable_feed_as_empty(self) -> None:
+        self.output.write_text("<rss><channel>")
+        release = sync.PublishedRelease(
+            version="1.0.0",
+            published_at="2026-01-01T00:00:00Z",
+            body="",
+            asset=sync.ReleaseAsset(name="a.exe", url="u", size=1, sha256="0" * 64),
+        )
+        tree = sync.render_appcast(REPO, [release], sync._empty_policy())
+        diff = sync.diff_appcast(self.output, tree)
+        self.assertEqual(diff.added, ("1.0.0",))
+        self.assertFalse(diff.is_empty)
+
+    def test_truncate_notes_cuts_at_line_and_links_release(self) -> None:
+        body = "## Highlights\n" + "x" * 40 + "\nsecond line " + "y" * 200
+        notes = sync._truncate_notes(body, 80, "https://example/rel/v1")
+        self.assertTrue(notes.startswith("## Highlights\n" + "x" * 40 + "\n\n..."))
+        self.assertTrue(notes.endswith("Notas completas: https://example/rel/v1"))
+        self.assertEqual(sync._truncate_notes("short", 80, "u"), "short")
+
+    def test_max_items_splits_archive_feed(self) -> None:
+        with _FakeGitHub(releases_count=5, per_page=100) as fake:
+            code, out = self._run_main(
+                fake, "--max-items", "2", "--max-description-chars", "4",
+                "--size-report",
+            )
+        self.assertEqual(code, 0, out)
+        self.assertIn("archived=3", out)
+        self.assertIn("Feed size report", out)
+        main_feed = self.output.read_text(encoding="utf-8")
+        archive = (self.root / sync.DEFAULT_ARCHIVE_FILENAME).read_text(encoding="utf-8")
+        self.assertEqual(main_feed.count("<item>"), 2)
+        self.assertIn("Version 1.0.4", main_feed)
+        self.assertEqual(archive.count("<item>"), 3)
+        self.assertIn("Version 1.0.0", archive)
+        self.assertIn("Notas completas:", main_feed)
+
+    def test_variants_derive_from_written_feed(self) -> None:
+        self.policy_path.write_text(
+            json.dumps({"rollout_percentages": {"1.0.1": 150}}),
+        )
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            code, out = self._run_main(fake, "--variants", "gz,json,sha256")
+        self.assertEqual(code, 0, out)
+        xml_bytes = self.output.read_bytes()
+        self.assertEqual(
+            gzip.decompress((self.root / "appcast.xml.gz").read_bytes()), xml_bytes,
+        )
+        self.assertEqual(
+            (self.root / "appcast.xml.sha256").read_text(),
+            f"{hashlib.sha256(xml_bytes).hexdigest()}  appcast.xml\n",
+        )
+        items = json.loads((self.root / "appcast.json").read_text())["items"]
+        self.assertEqual([item["version"] for item in items], ["1.0.1", "1.0.0"])
+        self.assertEqual(items[0]["rolloutPercentage"], 100)
+        self.assertIsNone(items[1]["rolloutPercentage"])
+        self.assertEqual(
+            set(items[0]),
+            {"version", "url", "length", "sha256", "minSupportedAppVersion",
+             "rolloutPercentage"},
+        )
+
+    def test_incremental_keeps_variants_when_feed_unchanged(self) -> None:
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            self.assertEqual(self._run_main(fake, "--variants", "gz,sha256")[0], 0)
+            gz_path = self.root / "appcast.xml.gz"
+            before = gz_path.stat().st_mtime_ns
+            code, out = self._run_main(
+                fake, "--no-cache", "--incremental", "--variants", "gz,sha256",
+            )
+        self.assertEqual(code, 0, out)
+        self.assertIn("unchanged", out)
+        self.assertEqual(gz_path.stat().st_mtime_ns, before)
+
+    def test_write_files_atomically_leaves_targets_on_failure(self) -> None:
+        target = self.root / "a.txt"
+        target.write_bytes(b"old")
+        blocker = self.root / "blocked"
+        blocker.write_bytes(b"")
+        with self.assertRaises(OSError):
+            sync.write_files_atomically(
+                [(target, b"new"), (blocker / "child.txt", b"x")],
+            )
+        self.assertEqual(target.read_bytes(), b"old")
+        self.assertEqual(sorted(p.name for p in self.root.iterdir()), ["a.txt", "blocked"])
+
+    def test_verify_assets_hashes_installers_once(self) -> None:
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            code, out = self._run_main(fake, "--verify-assets")
+            self.assertEqual(code, 0, out)
+            self.assertIn("installers verified=2 cached=0", out)
+
+            fake.add_release("2.0.0", "2026-02-01T00:00:00Z")
+            fake.requests.clear()
+            code, out = self._run_main(fake, "--verify-assets")
+            installer_requests = [p for p, _ in fake.requests if p.endswith(".exe")]
+        self.assertEqual(code, 0, out)
+        self.assertIn("installers verified=1 cached=2", out)
+        self.assertEqual(installer_requests, ["/dl/BackupDatabase-Setup-2.0.0.exe"])
+        cache = sync.load_verified_cache(sync.verified_cache_path(self.cache_dir))
+        self.assertEqual(len(cache.entries), 3)
+
+    def test_verify_assets_rejects_tampered_installer(self) -> None:
+        with _FakeGitHub(releases_count=2, per_page=100) as fake:
+            # Mesmo tamanho, conteudo diferente: so o sha256 denuncia.
+            fake.assets["/dl/BackupDatabase-Setup-1.0.1.exe"] = b"installer-9.9.9"
+            with mock.patch.dict(os.environ, {"GITHUB_API_URL": fake.base_url}):
+                releases = sync.fetch_releases(REPO).releases
+            with self.assertRaises(RuntimeError) as ctx:
+                sync.select_published_releases(
+                    releases,
+                    sync.AppcastPolicy(frozenset(), None, {}, {}),
+                    verify=sync.VerifyOptions(),
+                )
+        self.assertIn("does not match its checksum sidecar", str(ctx.exception))
+        self.assertIn("v1.0.1", str(ctx.exception))
+
+    def test_verify_assets_rejects_size_mismatch(self) -> None:
+        with _FakeGitHub(releases_count=1, per_page=100) as fake:
+            fake.releases[0]["assets"][0]["size"] += 1
+            code, _ = self._run_main(fake, "--verify-assets")
+            self.assertEqual(code, 1)
+            self.assertFalse(self.output.exists())
+            # O digest divergente fica no cache: a nova tentativa falha sem baixar.
+            fake.requests.clear()
+            code, _ = self._run_main(fake, "--verify-assets")
+            installer_requests = [p for p, _ in fake.requests if p.endswith(".exe")]
+        self.assertEqual(code, 1)
+        self.assertEqual(installer_requests, [])
+        cache = sync.load_verified_cache(sync.verified_cache_path(self.cache_dir))
+        self.assertEqual(len(cache.entries), 1)
+
+    def test_missing_sidecar_fails(self) -> None:
+        with _FakeGitHub(releases_count=1, per_page=100) as fake:
+            fake.releases[0]["assets"].pop()
+            code, _ = self._run_main(fake)
+        self.assertEqual(code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()